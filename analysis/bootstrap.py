@@ -0,0 +1,159 @@
+"""Vectorized bootstrap uncertainty of zone means, e.g. how far a zone's strike rate can be trusted.
+
+Each zone is resampled on its own deliveries (a stratified bootstrap, so zone counts are fixed) and every zone and many
+resamples are drawn at once:
+
+    deliveries are sorted by zone once, so each zone is a contiguous run
+    a block of resamples draws one random index per (resample, delivery) inside that delivery's zone run, gathers the
+    values and sums each zone run with np.add.reduceat - a (resamples, zones) array of means with no Python loop
+    over zones
+
+Blocks are sized to keep memory bounded, and each block has its own seed spawned from the caller's seed, so the result
+is the same whether the blocks run in this process or across a process pool (workers).
+
+    stats = zone_bootstrap(xy, df['batterRuns'], resamples=2000, seed=1)
+    pitch_heatmap(stats=stats, measure='strike_rate', uncertainty='opacity')
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis.zones import zone_edges, zone_index
+
+RESAMPLES = 2000
+CONFIDENCE = 0.95
+
+# Upper bound on resamples x deliveries drawn in one block - about 100MB of working arrays
+BLOCK_ELEMENTS = 2 ** 22
+
+
+def _resample_means(values, starts, counts, resamples, seed):
+    # (resamples, zones) means of a block of bootstrap resamples - values sorted by zone, starts and counts the run of
+    # each zone (all populated)
+    rng = np.random.default_rng(seed)
+    index_type = np.int32 if len(values) < 2 ** 31 else np.int64
+    run_starts = np.repeat(starts, counts).astype(index_type)
+    run_counts = np.repeat(counts, counts).astype(np.float32)
+
+    # Single precision draws are enough to pick a delivery and are much cheaper - float32 rounding can land exactly
+    # on the zone count, so picks are clipped to the last delivery of the run
+    picks = (rng.random((resamples, len(values)), dtype=np.float32) * run_counts).astype(index_type)
+    np.minimum(picks, (run_counts - 1).astype(index_type), out=picks)
+    picks += run_starts
+    return np.add.reduceat(values[picks], starts, axis=1) / counts
+
+
+# The sorted values and zone runs in a pool worker, set once by _init_worker
+_worker_arrays = None
+
+
+def _init_worker(values, starts, counts):
+    # Each worker is sent the deliveries once, rather than with every block
+    global _worker_arrays
+    _worker_arrays = (values, starts, counts)
+
+
+def _resample_blocks(blocks):
+    # Process pool entry point - one worker's contiguous share of the blocks, as (resamples, seed) pairs
+    return np.concatenate([_resample_means(*_worker_arrays, size, seed) for size, seed in blocks])
+
+
+def zone_bootstrap(xy,
+                   values,
+                   x_edges=None,
+                   y_edges=None,
+                   resamples=RESAMPLES,
+                   confidence=CONFIDENCE,
+                   min_balls=1,
+                   seed=None,
+                   workers=None):
+
+    """ Bootstrap standard errors and percentile confidence intervals of every zone mean at once
+
+    ----------
+    xy: A 2d array
+        The x and y coordinates of the delivery pitching locations
+    values: A 1d array
+        The value of each delivery e.g. batterRuns. NaN values are ignored
+    x_edges, y_edges: 1d arrays
+        Bin edges - default to the pitch_heatmap grid
+    resamples: An integer
+        Number of bootstrap resamples
+    confidence: A float
+        Confidence level of the interval, e.g. 0.95
+    min_balls: An integer
+        Zones with fewer deliveries are not resampled - their se and interval are NaN. Pass the heatmap's min_balls to
+        skip zones that won't be shown
+    seed: An integer or numpy.random.SeedSequence
+        For reproducible resamples - the result doesn't depend on workers
+    workers: An integer
+        Split the resample blocks into one contiguous share per worker of a process pool of this many workers - the
+        deliveries are sent to each worker once, when it starts. None or 1 runs in this process
+
+    Returns
+    -------
+    dict laid out as analysis.zones.zone_stats - "x_edges", "y_edges", and (nx, ny) "count", "sum", "mean", "se"
+    (bootstrap standard error), "ci_low" and "ci_high" arrays. Can be passed to pitch_heatmap as stats"""
+
+    x_edges = zone_edges(axis='x') if x_edges is None else np.asarray(x_edges)
+    y_edges = zone_edges(axis='y') if y_edges is None else np.asarray(y_edges)
+    shape = (len(x_edges) - 1, len(y_edges) - 1)
+    n_zones = shape[0] * shape[1]
+
+    values = np.asarray(values, dtype=np.float64)
+    zones = zone_index(xy, x_edges, y_edges)
+
+    keep = (zones >= 0) & ~np.isnan(values)
+    zones = zones[keep]
+    values = values[keep]
+
+    counts = np.bincount(zones, minlength=n_zones)
+    sums = np.bincount(zones, weights=values, minlength=n_zones)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    # Only the resampled zones' deliveries, sorted so each zone is a contiguous run
+    resampled = np.flatnonzero(counts >= max(min_balls, 1))
+    inside = np.isin(zones, resampled)
+    order = np.argsort(zones[inside], kind='stable')
+    sorted_values = values[inside][order]
+    zone_counts = counts[resampled]
+    starts = np.concatenate([[0], np.cumsum(zone_counts)[:-1]]).astype(np.int64)
+
+    se = np.full(n_zones, np.nan)
+    ci_low = np.full(n_zones, np.nan)
+    ci_high = np.full(n_zones, np.nan)
+
+    if len(resampled) and resamples > 0:
+        block = max(1, min(resamples, BLOCK_ELEMENTS // len(sorted_values)))
+        sizes = [min(block, resamples - start) for start in range(0, resamples, block)]
+        seeds = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(len(sizes))
+        blocks = list(zip(sizes, seeds))
+
+        if workers is not None and workers > 1 and len(blocks) > 1:
+            bounds = np.linspace(0, len(blocks), min(workers, len(blocks)) + 1).astype(int)
+            shares = [blocks[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+            with ProcessPoolExecutor(max_workers=len(shares), initializer=_init_worker,
+                                     initargs=(sorted_values, starts, zone_counts)) as pool:
+                boot = np.concatenate(list(pool.map(_resample_blocks, shares)))
+        else:
+            boot = np.concatenate([_resample_means(sorted_values, starts, zone_counts, size, block_seed)
+                                   for size, block_seed in blocks])
+
+        tail = 100 * (1 - confidence) / 2
+        low, high = np.percentile(boot, [tail, 100 - tail], axis=0)
+        ci_low[resampled] = low
+        ci_high[resampled] = high
+        if resamples > 1:
+            se[resampled] = boot.std(axis=0, ddof=1)
+
+    return {'x_edges': x_edges,
+            'y_edges': y_edges,
+            'count': counts.reshape(shape),
+            'sum': sums.reshape(shape),
+            'mean': means.reshape(shape),
+            'se': se.reshape(shape),
+            'ci_low': ci_low.reshape(shape),
+            'ci_high': ci_high.reshape(shape)}
@@ -0,0 +1,371 @@
+"""Materialised aggregate cube of zone statistics, so dashboard slices never touch the raw deliveries.
+
+The cube holds one cell per populated (bowler, batter, handedness, bowling style, match, heatmap zone) combination with
+additive measures only - delivery count, dismissals and the sum and sum of squares of each value column. Any slice or
+roll-up is then a sum over cells, and zone_stats() returns the same layout as analysis.zones.zone_stats, which
+pitch_heatmap accepts directly:
+
+    cube = ZoneCube.from_deliveries(store.pitch_xy, store)
+    cube.save('data/season.cube')
+
+    cube = load_cube('data/season.cube')
+    pitch_heatmap(stats=cube.zone_stats('batterRuns', bowlerId=[4321, 1234], rightHandedBat=False),
+                  measure='strike_rate')
+
+New matches are added with append(), which merges their cells into the existing ones.
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+from analysis.zones import zone_edges, zone_index
+
+CUBE_VERSION = 1
+META_FILE = 'meta.json'
+
+DIMENSIONS = ('bowlerId', 'batterId', 'rightHandedBat', 'bowlingStyle', 'matchId')
+VALUE_COLUMNS = ('batterRuns', 'bowlerRuns')
+
+
+def _encode(values):
+    # Codes and dictionary of a dimension column, with JSON-friendly dictionary values. Values keep their own type, so
+    # filters match them as given - missing values (None or NaN) of an object column share a trailing None entry
+    values = np.asarray(values)
+    if values.dtype != object:
+        dictionary, codes = np.unique(values, return_inverse=True)
+        return codes.astype(np.int32), dictionary.tolist()
+
+    import pandas as pd
+
+    missing = np.asarray(pd.isna(values))
+    dictionary, known = np.unique(values[~missing], return_inverse=True)
+    codes = np.full(len(values), len(dictionary), dtype=np.int32)
+    codes[~missing] = known
+    return codes, dictionary.tolist() + ([None] if missing.any() else [])
+
+
+class ZoneCube:
+    """ Additive zone measures per combination of dimension values.
+
+    Built with ZoneCube.from_deliveries or load_cube rather than directly.
+
+    ----------
+    dimensions: A tuple of strings
+        The dimension column names
+    dictionaries: A dict
+        Per dimension, the list of distinct values - cells refer to them by position
+    codes: A 2d int array
+        (cells, dimensions) dictionary codes of each cell
+    zones: A 1d int array
+        Flat zone index of each cell, see analysis.zones.zone_index
+    measures: A dict
+        Measure name to 1d float array, one value per cell
+    x_edges, y_edges: 1d arrays
+        The zone grid
+    value_columns: A tuple of strings
+        The value columns with _sum and _sumsq measures
+    """
+
+    def __init__(self, dimensions, dictionaries, codes, zones, measures, x_edges, y_edges, value_columns):
+        self.dimensions = tuple(dimensions)
+        self.dictionaries = dictionaries
+        # Column-major, so each dimension's codes are contiguous
+        self.codes = np.asfortranarray(codes)
+        self.zones = zones
+        self.measures = measures
+        self.x_edges = np.asarray(x_edges, dtype=float)
+        self.y_edges = np.asarray(y_edges, dtype=float)
+        self.value_columns = tuple(value_columns)
+
+    def __len__(self):
+        return len(self.zones)
+
+    @property
+    def n_zones(self):
+        return (len(self.x_edges) - 1) * (len(self.y_edges) - 1)
+
+    @classmethod
+    def from_deliveries(cls,
+                        xy,
+                        columns,
+                        dimensions=DIMENSIONS,
+                        value_columns=VALUE_COLUMNS,
+                        x_edges=None,
+                        y_edges=None):
+
+        """ Aggregates deliveries into a cube
+
+        ----------
+        xy: A 2d array
+            The pitching locations in plotting orientation (pitchX flipped) e.g. DeliveryStore.pitch_xy
+        columns: A mapping of column name to 1d array
+            The dimension and value columns and dismissalDetails, e.g. a DeliveryStore or a DataFrame
+        dimensions: A sequence of strings
+            The dimension columns
+        value_columns: A sequence of strings
+            The value columns to keep sums and sums of squares of
+        x_edges, y_edges: 1d arrays
+            The zone grid - defaults to the pitch_heatmap grid
+
+        Deliveries outside the grid, without tracking (NaN co-ordinates) or with a NaN value are left out.
+
+        Returns
+        -------
+        ZoneCube"""
+
+        x_edges = zone_edges(axis='x') if x_edges is None else np.asarray(x_edges)
+        y_edges = zone_edges(axis='y') if y_edges is None else np.asarray(y_edges)
+
+        zones = zone_index(xy, x_edges, y_edges)
+        values = {name: np.asarray(columns[name], dtype=np.float64) for name in value_columns}
+
+        keep = zones >= 0
+        for array in values.values():
+            keep &= ~np.isnan(array)
+
+        if 'dismissalDetails' in _column_names(columns):
+            import pandas as pd
+            dismissed = pd.notna(np.asarray(columns['dismissalDetails'])[keep]).astype(np.float64)
+        else:
+            dismissed = np.zeros(int(keep.sum()))
+
+        dictionaries = {}
+        codes = np.empty((int(keep.sum()), len(dimensions)), dtype=np.int32)
+        for i, name in enumerate(dimensions):
+            codes[:, i], dictionaries[name] = _encode(np.asarray(columns[name])[keep])
+
+        measures = {'count': np.ones(len(codes)),
+                    'dismissals': dismissed}
+        for name, array in values.items():
+            measures[name + '_sum'] = array[keep]
+            measures[name + '_sumsq'] = array[keep] ** 2
+
+        cube = cls(dimensions, dictionaries, codes, zones[keep], measures, x_edges, y_edges, value_columns)
+        return cube._grouped()
+
+    def _grouped(self, codes=None, zones=None, measures=None, dimensions=None):
+        # Sums the measures of cells sharing the same dimension codes and zone, in one bincount per measure
+        codes = self.codes if codes is None else codes
+        zones = self.zones if zones is None else zones
+        measures = self.measures if measures is None else measures
+        dimensions = self.dimensions if dimensions is None else dimensions
+
+        sizes = tuple(len(self.dictionaries[name]) for name in dimensions) + (self.n_zones,)
+        if np.prod(sizes, dtype=float) < 2 ** 62:
+            keys = np.ravel_multi_index(tuple(codes.T) + (zones,), sizes) if len(zones) else np.empty(0, np.int64)
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            unravelled = np.unravel_index(unique_keys, sizes)
+            new_codes = np.column_stack(unravelled[:-1]).astype(np.int32) if dimensions else \
+                np.empty((len(unique_keys), 0), dtype=np.int32)
+            new_zones = unravelled[-1]
+        else:
+            rows, inverse = np.unique(np.column_stack([codes, zones]), axis=0, return_inverse=True)
+            new_codes = rows[:, :-1].astype(np.int32)
+            new_zones = rows[:, -1]
+
+        inverse = inverse.ravel()
+        grouped = {name: np.bincount(inverse, weights=array, minlength=len(new_zones))
+                   for name, array in measures.items()}
+
+        return ZoneCube(dimensions, {name: self.dictionaries[name] for name in dimensions}, new_codes,
+                        new_zones.astype(np.int64), grouped, self.x_edges, self.y_edges, self.value_columns)
+
+    def rollup(self, *dimensions):
+        """ Sums over every dimension not listed, e.g. rollup("bowlerId", "rightHandedBat")
+
+        Returns
+        -------
+        ZoneCube with only the listed dimensions"""
+
+        unknown = set(dimensions) - set(self.dimensions)
+        if unknown:
+            raise KeyError('Not a cube dimension: {0}'.format(', '.join(sorted(unknown))))
+
+        index = [self.dimensions.index(name) for name in dimensions]
+        return self._grouped(codes=self.codes[:, index], dimensions=tuple(dimensions))
+
+    def _wanted_codes(self, name, condition):
+        if name not in self.dimensions:
+            raise KeyError('Not a cube dimension: {0}'.format(name))
+        dictionary = self.dictionaries[name]
+        if isinstance(condition, tuple):
+            # (low, high) inclusive, either can be None - as for SpatialIndex and DeliveryQuery filters
+            lo, hi = condition
+            codes = [code for code, value in enumerate(dictionary)
+                     if value is not None and (lo is None or value >= lo) and (hi is None or value <= hi)]
+            return np.array(codes, dtype=self.codes.dtype)
+
+        wanted = condition if isinstance(condition, (list, set, frozenset, np.ndarray)) else [condition]
+        return np.array(sorted(dictionary.index(value) for value in wanted if value in dictionary), dtype=self.codes.dtype)
+
+    def _cell_rows(self, filters):
+        # Indices of the cells matching every filter. Cells are kept sorted by the codes of the first dimension (the
+        # most significant part of the grouping key), so a filter on it is a binary search rather than a scan
+        rows = None
+        for i, (name, condition) in enumerate(sorted(filters.items(), key=lambda item: item[0] != self.dimensions[0])):
+            wanted = self._wanted_codes(name, condition)
+            if i == 0 and name == self.dimensions[0]:
+                first = self.codes[:, 0]
+                starts = np.searchsorted(first, wanted, side='left')
+                stops = np.searchsorted(first, wanted, side='right')
+                rows = np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)] + [np.empty(0, np.int64)])
+            else:
+                if rows is None:
+                    rows = np.arange(len(self.zones))
+                rows = rows[np.isin(self.codes[rows, self.dimensions.index(name)], wanted)]
+        return np.arange(len(self.zones)) if rows is None else rows
+
+    def slice(self, **filters):
+        """ The cells matching every filter - a dimension value, a list of values or an inclusive (low, high) range
+        per dimension, e.g. matchId=(8970, None)
+
+        Returns
+        -------
+        ZoneCube"""
+
+        rows = self._cell_rows(filters)
+        return ZoneCube(self.dimensions, self.dictionaries, self.codes[rows], self.zones[rows],
+                        {name: array[rows] for name, array in self.measures.items()},
+                        self.x_edges, self.y_edges, self.value_columns)
+
+    def zone_stats(self, value=VALUE_COLUMNS[0], **filters):
+        """ Zone statistics of one value column over the cells matching the filters (see slice), summed over every
+        other dimension
+
+        Returns
+        -------
+        dict laid out as analysis.zones.zone_stats - "x_edges", "y_edges" and (nx, ny) "count", "sum", "mean", "std"
+        and "dismissals" arrays, accepted by pitch_heatmap's stats argument"""
+
+        if value not in self.value_columns:
+            raise KeyError('The cube has no measures for {0}'.format(value))
+
+        rows = self._cell_rows(filters)
+        zones = self.zones[rows]
+        shape = (len(self.x_edges) - 1, len(self.y_edges) - 1)
+
+        def total(name):
+            return np.bincount(zones, weights=self.measures[name][rows], minlength=self.n_zones)
+
+        counts = total('count')
+        sums = total(value + '_sum')
+        sum_sq = total(value + '_sumsq')
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            std = np.sqrt(np.maximum(sum_sq - counts * means ** 2, 0) / (counts - 1))
+        std[counts < 2] = np.nan
+
+        return {'x_edges': self.x_edges,
+                'y_edges': self.y_edges,
+                'count': counts.astype(np.int64).reshape(shape),
+                'sum': sums.reshape(shape),
+                'mean': means.reshape(shape),
+                'std': std.reshape(shape),
+                'dismissals': total('dismissals').reshape(shape)}
+
+    def merge(self, other):
+        """ A cube holding the cells of both cubes, with matching cells summed - both must share dimensions, value
+        columns and zone grid
+
+        Returns
+        -------
+        ZoneCube"""
+
+        if (other.dimensions != self.dimensions or other.value_columns != self.value_columns or
+                not np.array_equal(other.x_edges, self.x_edges) or not np.array_equal(other.y_edges, self.y_edges)):
+            raise ValueError('Cubes with different dimensions, value columns or zone grids cannot be merged')
+
+        dictionaries = {}
+        other_codes = np.empty_like(other.codes)
+        for i, name in enumerate(self.dimensions):
+            dictionary = list(self.dictionaries[name])
+            position = {value: code for code, value in enumerate(dictionary)}
+            for value in other.dictionaries[name]:
+                if value not in position:
+                    position[value] = len(dictionary)
+                    dictionary.append(value)
+            remap = np.array([position[value] for value in other.dictionaries[name]], dtype=np.int32)
+            other_codes[:, i] = remap[other.codes[:, i]] if len(remap) else other.codes[:, i]
+            dictionaries[name] = dictionary
+
+        combined = ZoneCube(self.dimensions, dictionaries, np.concatenate([self.codes, other_codes]),
+                            np.concatenate([self.zones, other.zones]),
+                            {name: np.concatenate([array, other.measures[name]]) for name, array in self.measures.items()},
+                            self.x_edges, self.y_edges, self.value_columns)
+        return combined._grouped()
+
+    def append(self, xy, columns):
+        """ Adds new deliveries (e.g. a new match) to the cube in place, aggregating only the new rows
+
+        ----------
+        xy, columns:
+            As for from_deliveries
+
+        Returns
+        -------
+        The cube"""
+
+        new = ZoneCube.from_deliveries(xy, columns, self.dimensions, self.value_columns, self.x_edges, self.y_edges)
+        merged = self.merge(new)
+        self.dictionaries, self.codes, self.zones, self.measures = (merged.dictionaries, merged.codes, merged.zones,
+                                                                    merged.measures)
+        return self
+
+    def save(self, path):
+        """ Writes the cube to a directory of .npy files plus meta.json, overwriting an existing cube """
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'codes.npy'), self.codes)
+        np.save(os.path.join(path, 'zones.npy'), self.zones)
+        for name, array in self.measures.items():
+            np.save(os.path.join(path, name + '.npy'), array)
+
+        meta = {'version': CUBE_VERSION,
+                'cells': len(self.zones),
+                'dimensions': list(self.dimensions),
+                'dictionaries': self.dictionaries,
+                'value_columns': list(self.value_columns),
+                'measures': list(self.measures),
+                'x_edges': self.x_edges.tolist(),
+                'y_edges': self.y_edges.tolist()}
+
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+
+def _column_names(columns):
+    # Column names of a DataFrame, DeliveryStore or dict
+    names = getattr(columns, 'columns', None)
+    return list(names) if names is not None else list(columns.keys())
+
+
+def load_cube(path):
+    """ Opens a cube written by ZoneCube.save
+
+    ----------
+    path: A string
+        The cube directory
+
+    Returns
+    -------
+    ZoneCube"""
+
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    if meta['version'] != CUBE_VERSION:
+        raise ValueError('Unsupported cube version {0}'.format(meta['version']))
+
+    measures = {name: np.load(os.path.join(path, name + '.npy')) for name in meta['measures']}
+    return ZoneCube(meta['dimensions'],
+                    meta['dictionaries'],
+                    np.load(os.path.join(path, 'codes.npy')),
+                    np.load(os.path.join(path, 'zones.npy')),
+                    measures,
+                    meta['x_edges'],
+                    meta['y_edges'],
+                    meta['value_columns'])
@@ -0,0 +1,255 @@
+"""Kernel density backends for pitch density maps.
+
+Each backend takes the (n, 2) pitching locations plus the 1d x and y grid axes and returns the density on the
+(len(x), len(y)) grid, with gaussian_kde bandwidth semantics - the kernel covariance is the data covariance scaled by
+the squared bandwidth factor (bw_method=0.30 by default, as pitch_densitymap has always used).
+
+"exact" - scipy's gaussian_kde evaluated at every grid point, O(n_points * n_grid). The reference implementation.
+"fft" - Linear binning of the points onto the grid followed by an FFT convolution with the gaussian kernel. After a
+    single O(n_points) binning pass the cost depends only on the grid size, so a season of deliveries costs the same
+    as a single spell.
+
+Accuracy: binning error grows with the ratio of grid spacing to bandwidth. On the 100x100 PITCH_BOUNDS grid the
+"fft" backend stays within FFT_TOLERANCE (2% of the peak density, max absolute difference) of "exact" for any
+sample whose bandwidth spans at least three grid cells in each direction. A grid too coarse for the bandwidth is
+evaluated on one refined by an integer factor per axis until it does, and sampled back at the requested nodes. The
+factor is capped at MAX_REFINE, so the cost stays independent of the number of points - a bandwidth under
+MIN_BANDWIDTH_CELLS / MAX_REFINE grid cells (an almost constant line or length) is binned more coarsely than that, and
+may exceed FFT_TOLERANCE. Points outside the grid, padded by the kernel radius, are dropped.
+
+"""
+
+import numpy as np
+
+# scipy is imported inside the backends, so importing the plot templates doesn't pay for it
+
+BW_METHOD = 0.30
+
+# Fixed pitch-wide grid extent (xmin, xmax, ymin, ymax) in metres, so maps are comparable across players - the full
+# wicket width and from just behind the stumps to the bowler's end of a good length
+PITCH_BOUNDS = (-1.83, 1.83, -2, 16)
+
+# Max absolute difference from the exact backend, as a fraction of the exact peak density
+FFT_TOLERANCE = 0.02
+
+# Kernel is truncated at this many standard deviations
+KERNEL_SIGMAS = 4
+
+# Grid cells the kernel bandwidth must span for the fft backend to stay within FFT_TOLERANCE, and the largest grid
+# refinement factor per axis used to get there
+MIN_BANDWIDTH_CELLS = 3
+MAX_REFINE = 8
+
+
+def bandwidth_factor(n, bw_method=BW_METHOD, d=2):
+    """ The gaussian_kde bandwidth factor for n points - bw_method can be a scalar, "scott" or "silverman" """
+
+    if bw_method is None or bw_method == 'scott':
+        return n ** (-1. / (d + 4))
+    if bw_method == 'silverman':
+        return (n * (d + 2) / 4.) ** (-1. / (d + 4))
+    return float(bw_method)
+
+
+def kernel_covariance(data, bw_method=BW_METHOD):
+    """ The gaussian kernel covariance matrix gaussian_kde would use for data """
+    return np.atleast_2d(np.cov(data.T)) * bandwidth_factor(len(data), bw_method) ** 2
+
+
+def exact_density(data, x, y, bw_method=BW_METHOD):
+    """ Reference backend - gaussian_kde evaluated at every grid point """
+    from scipy.stats import gaussian_kde
+
+    X, Y = np.meshgrid(x, y, indexing='ij')
+    positions = np.vstack([X.ravel(), Y.ravel()])
+
+    kernel = gaussian_kde(data.T, bw_method=bw_method)
+    return np.reshape(kernel(positions).T, X.shape)
+
+
+def gaussian_kernel_grid(cov, dx, dy, sigmas=KERNEL_SIGMAS):
+    """ The 2d gaussian pdf with covariance cov sampled on an odd-sized grid of (dx, dy) offsets centred on zero """
+
+    rx = max(int(np.ceil(sigmas * np.sqrt(cov[0, 0]) / dx)), 1)
+    ry = max(int(np.ceil(sigmas * np.sqrt(cov[1, 1]) / dy)), 1)
+
+    ox, oy = np.meshgrid(np.arange(-rx, rx + 1) * dx, np.arange(-ry, ry + 1) * dy, indexing='ij')
+    offsets = np.stack([ox, oy], axis=-1)
+
+    inv_cov = np.linalg.inv(cov)
+    quad = np.einsum('...i,ij,...j->...', offsets, inv_cov, offsets)
+    return np.exp(-0.5 * quad) / (2 * np.pi * np.sqrt(np.linalg.det(cov)))
+
+
+def linear_bin(data, x0, y0, dx, dy, shape, weights=None):
+    """ Spreads each point over its 4 surrounding grid nodes with bilinear weights
+
+    ----------
+    data: A 2d array
+        The x and y coordinates
+    x0, y0: Floats
+        The coordinates of grid node (0, 0)
+    dx, dy: Floats
+        The grid spacing
+    shape: A (nx, ny) tuple
+        The grid shape - points whose surrounding cell is outside the grid are dropped
+    weights: A 1d array
+        Optional weight per point, default 1
+
+    Returns
+    -------
+    numpy.ndarray of shape shape"""
+
+    fx = (data[:, 0] - x0) / dx
+    fy = (data[:, 1] - y0) / dy
+    ix = np.floor(fx).astype(np.int64)
+    iy = np.floor(fy).astype(np.int64)
+    tx = fx - ix
+    ty = fy - iy
+
+    keep = (ix >= 0) & (ix < shape[0] - 1) & (iy >= 0) & (iy < shape[1] - 1)
+    ix, iy, tx, ty = ix[keep], iy[keep], tx[keep], ty[keep]
+    w = np.ones(len(ix)) if weights is None else np.asarray(weights, dtype=float)[keep]
+
+    flat = ix * shape[1] + iy
+    size = shape[0] * shape[1]
+    grid = (np.bincount(flat, weights=w * (1 - tx) * (1 - ty), minlength=size) +
+            np.bincount(flat + shape[1], weights=w * tx * (1 - ty), minlength=size) +
+            np.bincount(flat + 1, weights=w * (1 - tx) * ty, minlength=size) +
+            np.bincount(flat + shape[1] + 1, weights=w * tx * ty, minlength=size))
+    return grid.reshape(shape)
+
+
+def fft_density(data, x, y, bw_method=BW_METHOD):
+    """ Binned backend - linear binning plus FFT convolution with the gaussian kernel, see module docstring """
+
+    cov = kernel_covariance(data, bw_method)
+
+    # Refinement factor per axis for the bandwidth to span MIN_BANDWIDTH_CELLS grid cells, at most MAX_REFINE
+    with np.errstate(divide='ignore', invalid='ignore'):
+        refine = np.ceil(MIN_BANDWIDTH_CELLS * np.array([x[1] - x[0], y[1] - y[0]]) / np.sqrt(np.diag(cov)))
+
+    kx, ky = np.clip(np.nan_to_num(refine, nan=MAX_REFINE), 1, MAX_REFINE).astype(int)
+    if kx == 1 and ky == 1:
+        return _binned_density(data, x, y, cov)
+
+    # Every kx-th (ky-th) node of the refined axes is a node of the requested grid
+    fine_x = np.linspace(x[0], x[-1], (len(x) - 1) * kx + 1)
+    fine_y = np.linspace(y[0], y[-1], (len(y) - 1) * ky + 1)
+    return _binned_density(data, fine_x, fine_y, cov)[::kx, ::ky]
+
+
+def _binned_density(data, x, y, cov):
+    from scipy.signal import fftconvolve
+
+    dx = x[1] - x[0]
+    dy = y[1] - y[0]
+
+    # Scaled to unit mass on the grid - a kernel narrower than the refined grid (see MAX_REFINE) sampled as it is would
+    # put far too much (or too little) density on the nodes next to each point
+    kernel = gaussian_kernel_grid(cov, dx, dy)
+    kernel /= kernel.sum() * dx * dy
+    rx, ry = kernel.shape[0] // 2, kernel.shape[1] // 2
+
+    # Bin onto the grid padded by the kernel radius, so points just outside still contribute at the edges
+    padded_shape = (len(x) + 2 * rx, len(y) + 2 * ry)
+    counts = linear_bin(data, x[0] - rx * dx, y[0] - ry * dy, dx, dy, padded_shape)
+
+    Z = fftconvolve(counts, kernel, mode='same')[rx:rx + len(x), ry:ry + len(y)] / len(data)
+    return np.maximum(Z, 0)  # FFT round-off can leave tiny negatives
+
+
+DENSITY_BACKENDS = {'exact': exact_density,
+                    'fft': fft_density}
+
+
+def kernel_stamp(px, py, x, y, cov, sigmas=KERNEL_SIGMAS):
+    """ The gaussian kernel of a single point evaluated on the part of the grid within its footprint
+
+    ----------
+    px, py: Floats
+        The point
+    x, y: 1d arrays
+        The grid axes
+    cov: A 2x2 array
+        The kernel covariance
+    sigmas: A float
+        The footprint half-width in standard deviations
+
+    Returns
+    -------
+    (x slice, y slice, 2d array of kernel values) - the slices index the (len(x), len(y)) grid"""
+
+    rx = sigmas * np.sqrt(cov[0, 0])
+    ry = sigmas * np.sqrt(cov[1, 1])
+
+    sx = slice(np.searchsorted(x, px - rx), np.searchsorted(x, px + rx, side='right'))
+    sy = slice(np.searchsorted(y, py - ry), np.searchsorted(y, py + ry, side='right'))
+
+    ox, oy = np.meshgrid(x[sx] - px, y[sy] - py, indexing='ij')
+    offsets = np.stack([ox, oy], axis=-1)
+
+    inv_cov = np.linalg.inv(cov)
+    quad = np.einsum('...i,ij,...j->...', offsets, inv_cov, offsets)
+    return sx, sy, np.exp(-0.5 * quad) / (2 * np.pi * np.sqrt(np.linalg.det(cov)))
+
+
+class DensityAccumulator:
+    """ Kernel density on a fixed grid that deliveries can be added to and removed from one at a time.
+
+    Each update touches only the kernel footprint of the delivery, so the cost does not depend on how many balls have
+    been seen. A streaming density can't re-derive its bandwidth from the data on every ball, so the kernel covariance
+    is fixed up front - either from a reference sample with the usual bw_method semantics, or from a bandwidth in metres.
+
+    ----------
+    bounds: A (xmin, xmax, ymin, ymax) tuple
+        The grid extent, PITCH_BOUNDS by default
+    resolution: An integer or (integer, integer) tuple
+        The number of grid points in x and y
+    bandwidth: A (float, float) tuple
+        Kernel standard deviation in x and y in metres, used when reference is not given
+    reference: A 2d array
+        Sample pitching locations to take the kernel covariance from, as gaussian_kde would with bw_method
+    bw_method: A float, "scott" or "silverman"
+        Bandwidth factor applied to the reference sample covariance
+    """
+
+    def __init__(self,
+                 bounds=PITCH_BOUNDS,
+                 resolution=100,
+                 bandwidth=(0.08, 0.6),
+                 reference=None,
+                 bw_method=BW_METHOD):
+
+        xmin, xmax, ymin, ymax = bounds
+        x_res, y_res = np.broadcast_to(resolution, 2)
+        self.x = np.linspace(xmin, xmax, x_res)
+        self.y = np.linspace(ymin, ymax, y_res)
+
+        if reference is not None:
+            self.cov = kernel_covariance(np.asarray(reference), bw_method)
+        else:
+            self.cov = np.diag(np.square(bandwidth)).astype(float)
+
+        self.total = np.zeros((x_res, y_res))
+        self.n = 0
+
+    def add(self, px, py, weight=1):
+        """ Adds a delivery's kernel to the grid """
+        sx, sy, values = kernel_stamp(px, py, self.x, self.y, self.cov)
+        self.total[sx, sy] += weight * values
+        self.n += weight
+
+    def remove(self, px, py, weight=1):
+        """ Removes a delivery previously added, e.g. when it drops out of a rolling window """
+        self.add(px, py, -weight)
+
+    def density(self):
+        """ The current density on the (len(x), len(y)) grid """
+        if self.n <= 0:
+            return np.zeros_like(self.total)
+        return np.maximum(self.total / self.n, 0)  # Removals can leave round-off just below zero
+
+    def grid(self):
+        """ X, Y arrays of the grid, as returned by np.mgrid """
+        return np.meshgrid(self.x, self.y, indexing='ij')
@@ -0,0 +1,209 @@
+"""Multi-resolution zone pyramid, so the heatmap bin size can change without re-binning the deliveries.
+
+The deliveries are binned once into a fine grid of additive measures (count, sum, sum of squares and dot balls per
+cell). Every coarser grid whose bins are whole multiples of the fine bins is then a sum over blocks of neighbouring
+fine cells - a reshape and sum over at most a few thousand cells - and each level is cached once built:
+
+    pyramid = ZonePyramid.from_deliveries(xy, df['batterRuns'])
+    pyramid.bin_sizes()                   # the supported (xbin, ybin) pairs
+    pitch_heatmap(stats=pyramid.zone_stats(0.4, 1.5), measure='strike_rate')
+
+Fine cells are right-closed intervals, as in analysis.zones, so a coarse level's cells hold exactly the deliveries
+zone_stats would put in them over the same edges (the level's "x_edges" and "y_edges"). The fine edges on the
+pitch_heatmap grid are its exact np.arange values, so the (XBIN, YBIN) level matches pitch_heatmap. The pyramid covers
+the whole XMIN to XMAX, YMIN to YMAX grid, including the last column and row that pitch_heatmap's np.arange edges stop
+short of.
+
+"""
+
+import numpy as np
+
+from analysis.zones import XMIN, XMAX, XBIN, YMIN, YMAX, YBIN, zone_edges, zone_index
+
+# Finest bins - XBIN and YBIN are whole multiples, so the pitch_heatmap grid is one of the levels
+FINE_XBIN = 0.05
+FINE_YBIN = 0.25
+
+# Additive measures kept per fine cell
+MEASURES = ('count', 'sum', 'sumsq', 'dots')
+
+
+def _bins(vmin, vmax, step):
+    # Number of whole bins of step between vmin and vmax
+    bins = int(round((vmax - vmin) / step))
+    if not np.isclose(bins * step, vmax - vmin):
+        raise ValueError('{0} to {1} is not a whole number of {2} bins'.format(vmin, vmax, step))
+    return bins
+
+
+def _fine_edges(vmin, vmax, fine_step, step):
+    # Fine edges, with those on the pitch_heatmap grid set to its np.arange values - they can differ from linspace in
+    # the last bit (the "0" edge is -2.2e-16), which is enough to move a delivery at exactly 0 to another zone
+    edges = np.linspace(vmin, vmax, _bins(vmin, vmax, fine_step) + 1)
+    reference = zone_edges(vmin, vmax, step)
+    at = np.rint((reference - vmin) / fine_step).astype(np.int64)
+    on_grid = (at < len(edges)) & np.isclose(edges[np.minimum(at, len(edges) - 1)], reference)
+    edges[at[on_grid]] = reference[on_grid]
+    return edges
+
+
+def _factor(size, fine_size, bins):
+    # Fine cells per level cell for a bin size, None if the size isn't supported
+    factor = int(round(size / fine_size))
+    if factor < 1 or not np.isclose(factor * fine_size, size) or bins % factor:
+        return None
+    return factor
+
+
+class ZonePyramid:
+    """ Additive zone measures on a fine grid, summed into any coarser grid on demand.
+
+    Built with ZonePyramid.from_deliveries or ZonePyramid.from_stats rather than directly.
+
+    ----------
+    measures: A dict
+        Measure name (see MEASURES) to (nx, ny) array over the fine grid
+    x_edges, y_edges: 1d arrays
+        The fine grid edges
+    """
+
+    def __init__(self, measures, x_edges, y_edges):
+        self.measures = measures
+        self.x_edges = np.asarray(x_edges, dtype=float)
+        self.y_edges = np.asarray(y_edges, dtype=float)
+        self._levels = {}
+
+    @property
+    def fine_bins(self):
+        """ The fine (xbin, ybin) """
+        return self.x_edges[1] - self.x_edges[0], self.y_edges[1] - self.y_edges[0]
+
+    @classmethod
+    def from_deliveries(cls,
+                        xy,
+                        values,
+                        xmin=XMIN,
+                        xmax=XMAX,
+                        ymin=YMIN,
+                        ymax=YMAX,
+                        fine_xbin=FINE_XBIN,
+                        fine_ybin=FINE_YBIN):
+
+        """ Bins deliveries into the fine grid, in a single pass
+
+        ----------
+        xy: A 2d array
+            The x and y coordinates of the delivery pitching locations
+        values: A 1d array
+            The value of each delivery e.g. batterRuns. NaN values are ignored
+        xmin, xmax, ymin, ymax: Floats
+            Grid bounds - whole multiples of the fine bins
+        fine_xbin, fine_ybin: Floats
+            The finest bin sizes - every level's bins are whole multiples of them
+
+        Returns
+        -------
+        ZonePyramid"""
+
+        x_edges = _fine_edges(xmin, xmax, fine_xbin, XBIN)
+        y_edges = _fine_edges(ymin, ymax, fine_ybin, YBIN)
+        shape = (len(x_edges) - 1, len(y_edges) - 1)
+
+        values = np.asarray(values, dtype=np.float64)
+        zones = zone_index(xy, x_edges, y_edges)
+        keep = (zones >= 0) & ~np.isnan(values)
+        zones = zones[keep]
+        values = values[keep]
+
+        def total(weights=None):
+            return np.bincount(zones, weights=weights, minlength=shape[0] * shape[1]).astype(np.float64).reshape(shape)
+
+        return cls({'count': total(),
+                    'sum': total(values),
+                    'sumsq': total(values ** 2),
+                    'dots': total(values == 0)}, x_edges, y_edges)
+
+    @classmethod
+    def from_stats(cls, stats):
+        """ A pyramid over a precomputed fine grid, e.g. analysis.cube.ZoneCube.zone_stats of a cube built on fine
+        edges. The sum of squares is recovered from "std" where given, dot balls are not available
+
+        ----------
+        stats: A dict
+            Laid out as analysis.zones.zone_stats, with "count" and "sum"
+
+        Returns
+        -------
+        ZonePyramid"""
+
+        counts = np.asarray(stats['count'], dtype=np.float64)
+        sums = np.asarray(stats['sum'], dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, 0)
+        std = np.nan_to_num(np.asarray(stats.get('std', np.full(counts.shape, np.nan)), dtype=np.float64))
+
+        measures = {'count': counts,
+                    'sum': sums,
+                    'sumsq': std ** 2 * np.maximum(counts - 1, 0) + counts * means ** 2,
+                    'dots': np.full(counts.shape, np.nan)}
+        return cls(measures, stats['x_edges'], stats['y_edges'])
+
+    def bin_sizes(self):
+        """ Every supported (xbin, ybin), finest first
+
+        Returns
+        -------
+        list of (float, float)"""
+
+        fine_x, fine_y = self.fine_bins
+        nx, ny = self.measures['count'].shape
+        return [(fine_x * fx, fine_y * fy)
+                for fx in range(1, nx + 1) if nx % fx == 0
+                for fy in range(1, ny + 1) if ny % fy == 0]
+
+    def level(self, xbin=XBIN, ybin=YBIN):
+        """ The additive measures summed into (xbin, ybin) cells, built once per level
+
+        Returns
+        -------
+        dict of "x_edges", "y_edges" and one (nx, ny) array per measure"""
+
+        fine_x, fine_y = self.fine_bins
+        nx, ny = self.measures['count'].shape
+        fx, fy = _factor(xbin, fine_x, nx), _factor(ybin, fine_y, ny)
+        if fx is None or fy is None:
+            raise ValueError('Unsupported bin size ({0}, {1}) - bins must be whole multiples of ({2:g}, {3:g}) that '
+                             'divide the grid, see bin_sizes'.format(xbin, ybin, fine_x, fine_y))
+
+        if (fx, fy) not in self._levels:
+            level = {'x_edges': self.x_edges[::fx],
+                     'y_edges': self.y_edges[::fy]}
+            for name, array in self.measures.items():
+                level[name] = array.reshape(nx // fx, fx, ny // fy, fy).sum(axis=(1, 3))
+            self._levels[(fx, fy)] = level
+        return self._levels[(fx, fy)]
+
+    def zone_stats(self, xbin=XBIN, ybin=YBIN):
+        """ Zone statistics at a bin size, from the cached level - no deliveries are touched
+
+        Returns
+        -------
+        dict laid out as analysis.zones.zone_stats - "x_edges", "y_edges" and (nx, ny) "count", "sum", "mean", "std"
+        and "dot_pct" arrays, accepted by pitch_heatmap's stats argument"""
+
+        level = self.level(xbin, ybin)
+        counts = level['count']
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = level['sum'] / counts
+            std = np.sqrt(np.maximum(level['sumsq'] - counts * means ** 2, 0) / (counts - 1))
+            dot_pct = 100 * level['dots'] / counts
+        std[counts < 2] = np.nan
+
+        return {'x_edges': level['x_edges'],
+                'y_edges': level['y_edges'],
+                'count': counts.astype(np.int64),
+                'sum': level['sum'],
+                'mean': means,
+                'std': std,
+                'dot_pct': dot_pct}
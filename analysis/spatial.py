@@ -0,0 +1,231 @@
+"""Uniform grid index over delivery co-ordinates for fast region, radius and nearest-neighbour queries.
+
+Deliveries are bucketed into square cells once and stored sorted by cell, so the deliveries of a run of neighbouring
+cells are a single contiguous slice. A query only reads the cells overlapping its region and tests those candidates
+exactly, instead of scanning every delivery of a season. Attribute filters are applied to the candidates only.
+
+    from utilities.delivery_store import open_store
+
+    store = open_store('data/season.store')
+    index = store.spatial_index()
+    rows = index.radius(0.1, 6.0, 0.3, filters={'ballSpeed': (36.1, None), 'rightHandedBat': False})
+
+"""
+
+import numpy as np
+
+# Cell side in metres - roughly the size of the smallest useful brush, keeping a few hundred deliveries per cell for
+# a season of data
+CELL_SIZE = 0.1
+
+# Percentiles of the co-ordinates the grid spans, so a few stray points (e.g. a 999 sentinel) can't blow up the cell
+# count - points outside are kept in the border cells
+EXTENT_PERCENTILES = (0.1, 99.9)
+
+# Upper bound on the number of cells - the cell side is doubled until the grid fits
+MAX_CELLS = 1 << 20
+
+
+class SpatialIndex:
+    """ Grid index over 2d co-ordinates.
+
+    ----------
+    xy: A 2d array
+        The co-ordinates to index e.g. DeliveryStore.pitch_xy or stumps_xy. Rows with NaN co-ordinates are left out
+    cell_size: A float
+        Grid cell side in the units of xy
+    attributes: A mapping of column name to 1d array
+        Optional columns the filters of a query can refer to, e.g. a DeliveryStore or a DataFrame. Each column is
+        read once, on first use
+
+    The grid spans the EXTENT_PERCENTILES of the co-ordinates, with the points beyond in its border cells, and has at
+    most MAX_CELLS cells - cell_size is increased if needed. Query results are row indices into xy (and the attribute
+    columns).
+    """
+
+    def __init__(self, xy, cell_size=CELL_SIZE, attributes=None):
+        xy = np.asarray(xy)
+        self.rows = len(xy)
+        self.cell_size = cell_size
+        self.attributes = attributes
+        self._columns = {}
+        self._dictionaries = {}
+
+        valid = np.flatnonzero(np.isfinite(xy).all(axis=1))
+        points = xy[valid].astype(np.float64)
+
+        if len(points):
+            self.lower, self.upper = points.min(axis=0), points.max(axis=0)
+            self.origin, top = np.percentile(points, EXTENT_PERCENTILES, axis=0)
+            while True:
+                self.shape = tuple((np.floor((top - self.origin) / self.cell_size) + 1).astype(np.int64))
+                if self.shape[0] * self.shape[1] <= MAX_CELLS:
+                    break
+                self.cell_size *= 2
+        else:
+            self.lower = self.upper = self.origin = np.zeros(2)
+            self.shape = (1, 1)
+
+        cx, cy = self._cell_of(points)
+        cells = cx * self.shape[1] + cy
+
+        order = np.argsort(cells, kind='stable')
+        self.row_index = valid[order]
+        self.x = np.ascontiguousarray(points[order, 0])
+        self.y = np.ascontiguousarray(points[order, 1])
+
+        # starts[c]:starts[c + 1] is the slice of cell c
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.row_index)
+
+    def _cell_of(self, points):
+        # Points beyond the grid go in its border cells
+        cell = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        np.clip(cell, 0, np.array(self.shape) - 1, out=cell)
+        return cell[:, 0], cell[:, 1]
+
+    def _cell_range(self, vmin, vmax, axis):
+        # Clamped like _cell_of, so a range past the grid still reads the border cells holding the points out there
+        last = self.shape[axis] - 1
+        lo = int(np.floor(np.clip((vmin - self.origin[axis]) / self.cell_size, -1, last + 1)))
+        hi = int(np.floor(np.clip((vmax - self.origin[axis]) / self.cell_size, -1, last + 1)))
+        return min(max(lo, 0), last), max(min(hi, last), 0)
+
+    def _slices(self, xmin, xmax, ymin, ymax):
+        # (start, stop) bounds in the cell-sorted arrays of the deliveries in the cells overlapping the rectangle - one
+        # contiguous run per column of cells
+        cx0, cx1 = self._cell_range(xmin, xmax, 0)
+        cy0, cy1 = self._cell_range(ymin, ymax, 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return []
+
+        ny = self.shape[1]
+        return [(self.starts[cx * ny + cy0], self.starts[cx * ny + cy1 + 1]) for cx in range(cx0, cx1 + 1)]
+
+    def _select(self, slices, test):
+        # Positions in the cell-sorted arrays passing test(x, y) - the co-ordinates are tested as views of each run
+        found = [start + np.flatnonzero(test(self.x[start:stop], self.y[start:stop])) for start, stop in slices]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def column(self, name):
+        """ An attribute column in the index's cell order, read from attributes on first use - dictionary-encoded
+        DeliveryStore columns are kept as their integer codes """
+        if name not in self._columns:
+            if self.attributes is None:
+                raise KeyError('No attributes were given to the index, cannot filter on {0}'.format(name))
+
+            try:
+                # Comparing integer codes is much faster than comparing decoded strings
+                dictionary = self.attributes.dictionary(name)
+                values = self.attributes.codes(name)
+                self._dictionaries[name] = dictionary
+            except (AttributeError, KeyError):
+                values = self.attributes[name]
+
+            # Kept in cell order so filtering a query's candidates reads neighbouring memory
+            self._columns[name] = np.asarray(values)[self.row_index]
+        return self._columns[name]
+
+    def _encode(self, name, value):
+        # Code of a value in a dictionary-encoded column, -2 (matches nothing) if it never occurs, -1 for None
+        dictionary = self._dictionaries[name]
+        if value is None:
+            return -1
+        return dictionary.index(value) if value in dictionary else -2
+
+    def _filter(self, positions, filters, where):
+        keep = np.ones(len(positions), dtype=bool)
+
+        if where is not None:
+            keep &= np.asarray(where)[self.row_index[positions]]
+
+        for name, condition in (filters or {}).items():
+            values = self.column(name)[positions]
+            encoded = name in self._dictionaries
+
+            if callable(condition):
+                if encoded:
+                    values = np.array(self._dictionaries[name] + [None], dtype=object)[values]
+                keep &= np.asarray(condition(values), dtype=bool)
+            elif isinstance(condition, tuple):
+                lo, hi = condition
+                if lo is not None:
+                    keep &= values >= lo
+                if hi is not None:
+                    keep &= values <= hi
+            elif isinstance(condition, (list, set, frozenset)):
+                if encoded:
+                    condition = [self._encode(name, value) for value in condition]
+                keep &= np.isin(values, list(condition))
+            else:
+                keep &= values == (self._encode(name, condition) if encoded else condition)
+
+        return positions[keep]
+
+    def rect(self, xmin, xmax, ymin, ymax, filters=None, where=None):
+        """ Rows inside a rectangle (edges included)
+
+        ----------
+        xmin, xmax, ymin, ymax: Floats
+            The rectangle
+        filters: A dict
+            Conditions on attribute columns, all of which must hold:
+            a scalar - equal to the value e.g. {"rightHandedBat": False}
+            a (low, high) tuple - between the bounds inclusive, either can be None e.g. {"ballSpeed": (36.1, None)}
+            a list or set - any of the values e.g. {"bowlingStyle": ["OFF_SPIN", "LEG_SPIN"]}
+            a callable - given the candidate values, returns a boolean mask
+        where: A 1d boolean array
+            Optional mask over all rows, for filters computed elsewhere
+
+        Returns
+        -------
+        numpy.ndarray of row indices, ascending"""
+
+        positions = self._select(self._slices(xmin, xmax, ymin, ymax),
+                                 lambda x, y: (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+        return np.sort(self.row_index[self._filter(positions, filters, where)])
+
+    def radius(self, x, y, r, filters=None, where=None):
+        """ Rows within distance r of the point (x, y), see rect for filters and where
+
+        Returns
+        -------
+        numpy.ndarray of row indices, ascending"""
+
+        positions = self._select(self._slices(x - r, x + r, y - r, y + r),
+                                 lambda px, py: (px - x) ** 2 + (py - y) ** 2 <= r ** 2)
+        return np.sort(self.row_index[self._filter(positions, filters, where)])
+
+    def nearest(self, x, y, k=1, filters=None, where=None):
+        """ The k rows nearest to the point (x, y) that pass the filters, see rect for filters and where
+
+        Returns
+        -------
+        (row indices, distances) - numpy arrays ordered nearest first, shorter than k if fewer rows match"""
+
+        # Far enough to cover every point, including those beyond the grid
+        max_reach = np.hypot(*np.maximum(np.abs([x, y] - self.lower), np.abs([x, y] - self.upper))) + self.cell_size
+
+        reach = self.cell_size
+        while True:
+            slices = self._slices(x - reach, x + reach, y - reach, y + reach)
+            positions = np.concatenate([np.arange(start, stop) for start, stop in slices] or [np.empty(0, np.int64)])
+            positions = self._filter(positions, filters, where)
+            distances = np.hypot(self.x[positions] - x, self.y[positions] - y)
+
+            # The square searched holds every point within reach, so the k nearest candidates are final once the kth
+            # is no further than reach
+            if len(positions) >= k and k > 0:
+                nearest = np.argpartition(distances, k - 1)[:k]
+                if distances[nearest].max() <= reach:
+                    order = nearest[np.argsort(distances[nearest], kind='stable')]
+                    return self.row_index[positions[order]], distances[order]
+
+            if reach >= max_reach:
+                order = np.argsort(distances, kind='stable')[:max(k, 0)]
+                return self.row_index[positions[order]], distances[order]
+
+            reach *= 2
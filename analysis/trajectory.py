@@ -0,0 +1,102 @@
+"""Vectorized reconstruction of approximate 3D ball paths from release, through the bounce, to the stumps.
+
+Hawkeye data gives the bounce point (pitchX, pitchY), where the ball passed the stumps plane (stumpsX across, stumpsY
+height) and the release speed. Each delivery is rebuilt as two ballistic arcs under gravity:
+
+    release -> bounce   from a nominal release point at RELEASE_HEIGHT, RELEASE_Y metres down the pitch
+    bounce -> stumps    leaving the pitch at BOUNCE_SPEED_RATIO of the release speed, reaching stumpsY at y = 0
+
+Across the pitch the ball moves linearly within each arc, so swing and seam show as the kink at the bounce. Drag is
+ignored - the paths are for visualisation, not ball tracking. Every delivery is computed at once as (n, points, 3)
+arrays, in the plotting orientation of the stores and templates (pitchX and stumpsX already flipped).
+
+"""
+
+import numpy as np
+
+GRAVITY = 9.81
+
+# Nominal release point - about half a metre in front of the bowler's popping crease, at a typical release height
+RELEASE_Y = 18.5
+RELEASE_HEIGHT = 2.1
+
+# Without a release position across the pitch, each delivery's bounce -> stumps line is extended back to RELEASE_Y
+# (clipped to this distance from the middle stump) and the median over all the deliveries is used as a shared release
+# point - a single bowler's releases vary far less than the extrapolation error
+RELEASE_X_LIMIT = 1.0
+
+# Share of the release speed kept after pitching
+BOUNCE_SPEED_RATIO = 0.8
+
+
+def _arc(start, end, speed, steps):
+    # Points along a ballistic arc from start to end (n, 3) whose horizontal speed is speed, at fractions steps of
+    # the flight time - vertical velocity is solved so the arc lands exactly on end
+    horizontal = np.hypot(end[:, 0] - start[:, 0], end[:, 1] - start[:, 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flight = horizontal / speed
+        vz = (end[:, 2] - start[:, 2] + 0.5 * GRAVITY * flight ** 2) / flight
+
+    t = steps[None, :] * flight[:, None]
+    points = start[:, None, :] + (end - start)[:, None, :] * steps[None, :, None]
+    points[:, :, 2] = start[:, None, 2] + vz[:, None] * t - 0.5 * GRAVITY * t ** 2
+    return points
+
+
+def reconstruct_trajectories(pitch_xy,
+                             stumps_xy,
+                             speed,
+                             release_x=None,
+                             release_y=RELEASE_Y,
+                             release_height=RELEASE_HEIGHT,
+                             bounce_speed_ratio=BOUNCE_SPEED_RATIO,
+                             points=20):
+
+    """ Reconstructs the release -> bounce -> stumps path of every delivery at once
+
+    ----------
+    pitch_xy: A 2d array
+        (n, 2) bounce co-ordinates - pitchX (flipped) and pitchY
+    stumps_xy: A 2d array
+        (n, 2) co-ordinates at the stumps plane - stumpsX (flipped) and stumpsY, the height
+    speed: A 1d array
+        Release speed in m/s (ballSpeed)
+    release_x: A float or 1d array
+        Release position across the pitch - defaults to the median of the bounce -> stumps lines extended back to
+        release_y
+    release_y, release_height: Floats
+        Release distance from the batter's stumps and height, in metres
+    bounce_speed_ratio: A float
+        Share of the speed kept after pitching
+    points: An integer
+        Points per arc - each path has 2 * points - 1 points, the bounce shared by both arcs
+
+    Returns
+    -------
+    numpy.ndarray of shape (n, 2 * points - 1, 3). Rows of untracked deliveries (NaN co-ordinates or a speed of -1)
+    are NaN"""
+
+    pitch_xy = np.asarray(pitch_xy, dtype=np.float64)
+    stumps_xy = np.asarray(stumps_xy, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    n = len(pitch_xy)
+
+    bounce = np.column_stack([pitch_xy, np.zeros(n)])
+    stumps = np.column_stack([stumps_xy[:, 0], np.zeros(n), stumps_xy[:, 1]])
+
+    if release_x is None:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = (bounce[:, 0] - stumps[:, 0]) / bounce[:, 1]
+        extended = np.clip(stumps[:, 0] + slope * release_y, -RELEASE_X_LIMIT, RELEASE_X_LIMIT)
+        release_x = np.nanmedian(extended) if np.isfinite(extended).any() else 0.0
+    release = np.column_stack([np.broadcast_to(release_x, n), np.full(n, release_y), np.full(n, release_height)])
+
+    untracked = ~(np.isfinite(pitch_xy).all(axis=1) & np.isfinite(stumps_xy).all(axis=1) & (speed > 0))
+    speed = np.where(untracked, np.nan, speed)
+
+    steps = np.linspace(0, 1, points)
+    paths = np.concatenate([_arc(release, bounce, speed, steps),
+                            _arc(bounce, stumps, speed * bounce_speed_ratio, steps)[:, 1:]], axis=1)
+
+    paths[untracked] = np.nan
+    return paths
@@ -0,0 +1,237 @@
+"""Vectorized aggregation of delivery values into pitch zones.
+
+Deliveries are mapped to an integer zone index once and every statistic is accumulated with np.bincount (or a single
+sort for order statistics), so there is no DataFrame, pd.cut or groupby on the hot path. Zones use the same
+right-closed intervals as pd.cut over the pitch_heatmap grid, and can be used without plotting anything.
+
+"""
+
+import numpy as np
+
+# Default heatmap grid in metres - X across the pitch (flipped for plotting), Y from the stumps towards the bowler
+XMIN = -1.2
+XMAX = 1.2
+XBIN = 0.2
+
+YMIN = 0
+YMAX = 15
+YBIN = 1
+
+
+def zone_edges(vmin=None, vmax=None, step=None, axis='x'):
+    """ Bin edges for one axis of the zone grid, built the same way pitch_heatmap always has (np.arange, so vmax
+    itself is excluded)
+
+    ----------
+    vmin, vmax, step: Floats
+        Grid bounds and bin size - missing values default to the XMIN/XMAX/XBIN or YMIN/YMAX/YBIN constants
+    axis: "x" or "y"
+        Which axis the defaults are taken from
+
+    Returns
+    -------
+    numpy.ndarray"""
+
+    defaults = (XMIN, XMAX, XBIN) if axis == 'x' else (YMIN, YMAX, YBIN)
+    vmin, vmax, step = [d if v is None else v for v, d in zip((vmin, vmax, step), defaults)]
+    return np.arange(vmin, vmax, step)
+
+
+def zone_index(xy, x_edges, y_edges):
+    """ Flat zone index for each delivery, -1 where the delivery falls outside the grid or has no co-ordinates
+
+    Intervals are closed on the right, (left, right], matching pd.cut. The flat index is x_zone * ny + y_zone.
+
+    ----------
+    xy: A 2d array
+        The x and y coordinates of the delivery pitching locations
+    x_edges, y_edges: 1d arrays
+        Bin edges as returned by zone_edges
+
+    Returns
+    -------
+    numpy.ndarray of int64"""
+
+    xy = np.asarray(xy)
+    nx = len(x_edges) - 1
+    ny = len(y_edges) - 1
+
+    xi = np.searchsorted(x_edges, xy[:, 0], side='left') - 1
+    yi = np.searchsorted(y_edges, xy[:, 1], side='left') - 1
+
+    # NaN sorts past the last edge so is caught by the upper bound check
+    inside = (xi >= 0) & (xi < nx) & (yi >= 0) & (yi < ny)
+    return np.where(inside, xi * ny + yi, -1)
+
+
+def _percentile_by_zone(zones, values, counts, q):
+    # Sort once by (zone, value) and interpolate inside each zone's run, as np.percentile's default 'linear' method
+    order = np.lexsort((values, zones))
+    sorted_values = values[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    result = np.full(len(counts), np.nan)
+    populated = counts > 0
+
+    pos = (q / 100) * (counts[populated] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    start = starts[populated]
+
+    v_lo = sorted_values[start + lo]
+    v_hi = sorted_values[start + hi]
+    result[populated] = v_lo + (v_hi - v_lo) * (pos - lo)
+    return result
+
+
+def zone_stats(xy,
+               values,
+               x_edges=None,
+               y_edges=None,
+               stats=()):
+
+    """ Aggregates delivery values per pitch zone in a single pass
+
+    ----------
+    xy: A 2d array
+        The x and y coordinates of the delivery pitching locations
+    values: A 1d array
+        The value of each delivery e.g. batterRuns. NaN values are ignored, as in a pandas groupby
+    x_edges, y_edges: 1d arrays
+        Bin edges - default to the pitch_heatmap grid
+    stats: An iterable of strings
+        Extra statistics on top of count, sum and mean. Can include:
+        "median" - Median value
+        "pNN" - NNth percentile, e.g. "p90"
+        "std" - Sample standard deviation
+        "dot_pct" - Percentage of deliveries with a value of 0 e.g. dot balls when values are runs
+
+    Returns
+    -------
+    dict of "x_edges", "y_edges" and one (nx, ny) array per statistic - mean and other statistics are NaN in
+    empty zones"""
+
+    x_edges = zone_edges(axis='x') if x_edges is None else np.asarray(x_edges)
+    y_edges = zone_edges(axis='y') if y_edges is None else np.asarray(y_edges)
+    shape = (len(x_edges) - 1, len(y_edges) - 1)
+    n_zones = shape[0] * shape[1]
+
+    values = np.asarray(values, dtype=np.float64)
+    zones = zone_index(xy, x_edges, y_edges)
+
+    keep = (zones >= 0) & ~np.isnan(values)
+    zones = zones[keep]
+    values = values[keep]
+
+    counts = np.bincount(zones, minlength=n_zones)
+    sums = np.bincount(zones, weights=values, minlength=n_zones)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    result = {'x_edges': x_edges,
+              'y_edges': y_edges,
+              'count': counts.reshape(shape),
+              'sum': sums.reshape(shape),
+              'mean': means.reshape(shape)}
+
+    for stat in stats:
+        if stat == 'median':
+            out = _percentile_by_zone(zones, values, counts, 50)
+        elif stat.startswith('p') and stat[1:].replace('.', '', 1).isdigit():
+            out = _percentile_by_zone(zones, values, counts, float(stat[1:]))
+        elif stat == 'std':
+            sum_sq = np.bincount(zones, weights=values ** 2, minlength=n_zones)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out = np.sqrt(np.maximum(sum_sq - counts * means ** 2, 0) / (counts - 1))
+            out[counts < 2] = np.nan
+        elif stat == 'dot_pct':
+            dots = np.bincount(zones, weights=(values == 0), minlength=n_zones)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out = 100 * dots / counts
+        else:
+            raise ValueError('Unknown zone statistic {0}'.format(stat))
+
+        result[stat] = out.reshape(shape)
+
+    return result
+
+
+def populated_zones(stats, min_balls=12):
+    """ Flattens zone_stats output to the zones with at least min_balls deliveries, in x-then-y order
+
+    ----------
+    stats: A dict
+        Output of zone_stats
+    min_balls: An integer
+        The minimum number of balls for a zone to be included
+
+    Returns
+    -------
+    dict of 1d arrays - "x_left", "x_right", "y_bottom", "y_top" and every statistic in stats"""
+
+    x_edges = stats['x_edges']
+    y_edges = stats['y_edges']
+    xi, yi = np.nonzero(stats['count'] >= min_balls)
+
+    zones = {'x_left': x_edges[xi],
+             'x_right': x_edges[xi + 1],
+             'y_bottom': y_edges[yi],
+             'y_top': y_edges[yi + 1]}
+
+    for name, array in stats.items():
+        if name not in ('x_edges', 'y_edges'):
+            zones[name] = array[xi, yi]
+
+    return zones
+
+
+def facet_zone_stats(xy,
+                     values,
+                     facets,
+                     x_edges=None,
+                     y_edges=None):
+
+    """ Aggregates delivery values per (facet, pitch zone) in a single grouped pass, e.g. per bowler for small multiples
+
+    ----------
+    xy: A 2d array
+        The x and y coordinates of the delivery pitching locations
+    values: A 1d array
+        The value of each delivery e.g. batterRuns. NaN values are ignored
+    facets: A 1d array
+        The facet key of each delivery e.g. bowlerId
+    x_edges, y_edges: 1d arrays
+        Bin edges - default to the pitch_heatmap grid
+
+    Returns
+    -------
+    dict of "facets" (the sorted unique keys), "x_edges", "y_edges" and (n_facets, nx, ny) "count", "sum" and "mean"
+    arrays - stats[name][i] is laid out exactly as zone_stats for the deliveries of facets[i]"""
+
+    x_edges = zone_edges(axis='x') if x_edges is None else np.asarray(x_edges)
+    y_edges = zone_edges(axis='y') if y_edges is None else np.asarray(y_edges)
+    shape = (len(x_edges) - 1, len(y_edges) - 1)
+    n_zones = shape[0] * shape[1]
+
+    keys, facet_codes = np.unique(np.asarray(facets), return_inverse=True)
+    shape = (len(keys),) + shape
+
+    values = np.asarray(values, dtype=np.float64)
+    zones = zone_index(xy, x_edges, y_edges)
+
+    keep = (zones >= 0) & ~np.isnan(values)
+    cells = facet_codes[keep] * n_zones + zones[keep]
+
+    counts = np.bincount(cells, minlength=len(keys) * n_zones)
+    sums = np.bincount(cells, weights=values[keep], minlength=len(keys) * n_zones)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    return {'facets': keys,
+            'x_edges': x_edges,
+            'y_edges': y_edges,
+            'count': counts.reshape(shape),
+            'sum': sums.reshape(shape),
+            'mean': means.reshape(shape)}
@@ -0,0 +1,68 @@
+"""Cold-start benchmark for short-lived render workers.
+
+Each module is imported in a fresh interpreter several times and the median wall time is reported, along with which
+heavy optional dependencies the import dragged in. Run from anywhere:
+
+    python benchmarks/startup.py [--repeat 5]
+
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['pitch_views.wicket_3d',
+           'plots.pitch_heatmap',
+           'plots.pitch_densitymap',
+           'utilities.delivery_store']
+
+HEAVY = ['scipy', 'pandas', 'mpl_toolkits.mplot3d']
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module, repeat=5):
+    """ Median import time in seconds of module over repeat fresh interpreters, and the heavy modules it loaded """
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, MPLBACKEND='Agg')
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY)],
+                             cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout))
+
+    return {'module': module,
+            'median_seconds': statistics.median(r['seconds'] for r in runs),
+            'loaded': runs[-1]['loaded']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = [time_import(module, args.repeat) for module in MODULES]
+    for r in results:
+        print('{module:<28} {ms:8.1f} ms   loads: {loaded}'.format(module=r['module'],
+                                                                  ms=r['median_seconds'] * 1000,
+                                                                  loaded=', '.join(r['loaded']) or '-'))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""Synthetic-data benchmark suite for the load, aggregate, density and render stages.
+
+For each dataset size a synthetic Hawkeye CSV is generated (see benchmarks/synthetic.py) and every stage is timed
+separately, taking the median of --repeat runs:
+
+    csv_load          read_hawkeye_csv, pitchX flip and tracking filter
+    csv_query         the same load as a utilities.delivery_query.DeliveryQuery, straight to the xy and values arrays
+    zone_aggregation  zone_stats over the heatmap zones
+    kde_exact         scipy gaussian_kde - skipped above --exact-limit rows, it is O(n) per grid point
+    kde_fft           the binned FFT kde
+    heatmap_figure    building the pitch_heatmap figure
+    densitymap_figure building the pitch_densitymap figure (fft density above --exact-limit rows)
+    savefig           writing the heatmap figure to png
+    save_<profile>    writing the densitymap figure with each utilities.output_profiles profile - the output sizes
+                      are reported too
+
+Results are written as JSON with the environment so runs can be compared:
+
+    python -m benchmarks.suite --sizes 1000 10000 100000 1000000 --out bench.json
+    python -m benchmarks.suite --out new.json --compare bench.json
+
+The figure stages draw on mplot3d by default, --renderer 2d times the NumPy-projected 2D axis instead:
+
+    python -m benchmarks.suite --renderer 2d --compare bench.json
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+from benchmarks.synthetic import write_csv  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+EXACT_LIMIT = 100000
+
+PROFILES = ['web', 'print', 'vector']
+
+STAGES = ['csv_load', 'csv_query', 'zone_aggregation', 'kde_exact', 'kde_fft', 'heatmap_figure', 'densitymap_figure',
+          'savefig'] + ['save_' + profile for profile in PROFILES]
+
+
+def _median_time(func, repeat, teardown=None):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        if teardown is not None:
+            teardown()
+    return statistics.median(times), result
+
+
+def run_size(n, work_dir, repeat=3, exact_limit=EXACT_LIMIT, seed=0, renderer='3d'):
+    """ Times every stage for a synthetic dataset of n rows
+
+    Returns
+    -------
+    dict of stage name to median seconds, None for a skipped stage, and "bytes" - the output size per profile"""
+
+    from utilities.delivery_store import read_hawkeye_csv
+    from utilities.delivery_query import DeliveryQuery
+    from analysis.zones import XMIN, XMAX, XBIN, YMIN, YMAX, YBIN, zone_edges, zone_stats
+    from analysis.density import PITCH_BOUNDS, exact_density, fft_density
+    from plots.pitch_heatmap import pitch_heatmap
+    from plots.pitch_densitymap import pitch_densitymap
+    from utilities.output_profiles import save_figure
+
+    path = os.path.join(work_dir, 'synthetic_{0}.csv'.format(n))
+    if not os.path.exists(path):
+        write_csv(n, path, seed=seed)
+
+    def load():
+        df = read_hawkeye_csv(path)
+        df['pitchX'] = -df['pitchX']
+        return df[df['pitchX'].notna() & df['pitchY'].notna() & (df['ballSpeed'] != -1)]
+
+    results = {'rows': n, 'csv_bytes': os.path.getsize(path), 'renderer': renderer}
+    results['csv_load'], df = _median_time(load, repeat)
+    results['csv_query'], _ = _median_time(lambda: DeliveryQuery(path).arrays('batterRuns'), repeat)
+
+    xy = df[['pitchX', 'pitchY']].to_numpy(dtype=float)
+    values = df['batterRuns'].to_numpy(dtype=float)
+    x_edges = zone_edges(XMIN, XMAX, XBIN)
+    y_edges = zone_edges(YMIN, YMAX, YBIN)
+    results['zone_aggregation'], _ = _median_time(lambda: zone_stats(xy, values, x_edges, y_edges), repeat)
+
+    xmin, xmax, ymin, ymax = PITCH_BOUNDS
+    x = np.linspace(xmin, xmax, 100)
+    y = np.linspace(ymin, ymax, 100)
+    # Warm up once on a small sample so the lazy scipy import isn't counted against the first size
+    exact_density(xy[:100], x, y)
+    fft_density(xy[:100], x, y)
+    results['kde_exact'] = _median_time(lambda: exact_density(xy, x, y), repeat)[0] if n <= exact_limit else None
+    results['kde_fft'], _ = _median_time(lambda: fft_density(xy, x, y), repeat)
+
+    def heatmap():
+        pitch_heatmap(xy, values, title='Benchmark', legend_title='Strike Rate', measure='strike_rate',
+                      renderer=renderer)
+
+    results['heatmap_figure'], _ = _median_time(heatmap, repeat, teardown=lambda: plt.close('all'))
+
+    method = 'exact' if n <= exact_limit else 'fft'
+    results['densitymap_figure'], _ = _median_time(lambda: pitch_densitymap(xy, title='Benchmark', method=method,
+                                                                            renderer=renderer),
+                                                   repeat, teardown=lambda: plt.close('all'))
+
+    png = os.path.join(work_dir, 'heatmap.png')
+
+    def save():
+        heatmap()
+        start = time.perf_counter()
+        plt.gcf().savefig(png)
+        elapsed = time.perf_counter() - start
+        plt.close('all')
+        return elapsed
+
+    results['savefig'] = statistics.median(save() for _ in range(repeat))
+
+    # Output profiles, on the figure whose data layer is heaviest as vectors
+    pitch_densitymap(xy, title='Benchmark', method=method, renderer=renderer)
+    plt.gcf().canvas.draw()
+    results['bytes'] = {}
+    for profile in PROFILES:
+        reports = [save_figure(plt.gcf(), os.path.join(work_dir, 'densitymap_' + profile), profile)
+                   for _ in range(repeat)]
+        results['save_' + profile] = statistics.median(report['seconds'] for report in reports)
+        results['bytes'][profile] = reports[-1]['bytes']
+    plt.close('all')
+    return results
+
+
+def environment():
+    """ Versions and revision the results were measured with """
+
+    import pandas
+    import scipy
+
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                             check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        rev = None
+
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_rev': rev,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pandas.__version__,
+            'scipy': scipy.__version__,
+            'matplotlib': matplotlib.__version__}
+
+
+def print_results(results, baseline=None):
+    """ Prints a stage x size table in milliseconds, with the ratio to a baseline run of the same size if given """
+
+    base = {r['rows']: r for r in baseline['results']} if baseline else {}
+
+    print('{0:<18}'.format('stage') + ''.join('{0:>20}'.format('{0:,} rows'.format(r['rows'])) for r in results))
+    for stage in STAGES:
+        cells = []
+        for r in results:
+            seconds = r.get(stage)
+            if seconds is None:
+                cells.append('{0:>20}'.format('-'))
+                continue
+            cell = '{0:.1f} ms'.format(seconds * 1000)
+            old = base.get(r['rows'], {}).get(stage)
+            if old:
+                cell += ' ({0:.2f}x)'.format(seconds / old)
+            cells.append('{0:>20}'.format(cell))
+        print('{0:<18}'.format(stage) + ''.join(cells))
+
+    for profile in PROFILES:
+        sizes = ['{0:>20}'.format('{0:,} KB'.format(r['bytes'][profile] // 1024) if 'bytes' in r else '-')
+                 for r in results]
+        print('{0:<18}'.format('size_' + profile) + ''.join(sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Dataset sizes in rows, up to 10M')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--exact-limit', type=int, default=EXACT_LIMIT,
+                        help='Largest size the exact kde is run for')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--renderer', choices=['3d', '2d'], default='3d',
+                        help='Axis the figure stages draw on, see pitch_views/wicket_2d.py')
+    parser.add_argument('--data-dir', help='Keep the generated CSVs here and reuse them on later runs')
+    parser.add_argument('--out', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='A previous results JSON file to compare against')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = args.data_dir or tmp
+        os.makedirs(work_dir, exist_ok=True)
+        results = []
+        for n in args.sizes:
+            results.append(run_size(n, work_dir, repeat=args.repeat, exact_limit=args.exact_limit, seed=args.seed,
+                                    renderer=args.renderer))
+
+    print_results(results, baseline)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
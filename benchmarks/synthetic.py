@@ -0,0 +1,164 @@
+"""Generator of synthetic Hawkeye ball-by-ball data at production scale.
+
+Rows follow the real CSV schema and orientation (pitchX not yet flipped) with plausible distributions per bowling
+style - seamers pitch fuller-to-short around 6-7m at 33-39 m/s, spinners around 4-5m at 23-25 m/s - plus ~1% of
+deliveries with tracking disabled (ballSpeed -1 and empty co-ordinates), as in the sample files.
+
+    python benchmarks/synthetic.py 1000000 data/synthetic_1m.csv
+
+"""
+
+import argparse
+
+import numpy as np
+
+COLUMNS = ['matchId', 'delivery', 'ball', 'batter', 'batterId', 'rightHandedBat', 'nonStriker', 'nonStrikerId',
+           'bowler', 'bowlerId', 'rightArmedBowl', 'bowlingStyle', 'ballSpeed', 'dismissalDetails', 'runs',
+           'batterRuns', 'bowlerRuns', 'extras', 'pitchX', 'pitchY', 'stumpsX', 'stumpsY']
+
+# Style: (share of deliveries, speed mean, speed sd (m/s), pitchY mean, pitchY sd (m))
+STYLES = {'FAST_SEAM': (0.45, 37.5, 1.8, 6.8, 2.2),
+          'MEDIUM_SEAM': (0.15, 33.5, 1.5, 6.0, 1.9),
+          'OFF_SPIN': (0.18, 24.5, 1.0, 4.6, 1.1),
+          'LEG_SPIN': (0.10, 23.5, 1.1, 4.4, 1.3),
+          'ORTHODOX': (0.12, 24.0, 1.0, 4.7, 1.1)}
+
+# Runs off the bat and their probabilities
+RUNS = np.array([0, 1, 2, 3, 4, 6])
+RUN_PROBS = np.array([0.62, 0.24, 0.05, 0.01, 0.07, 0.01])
+
+EXTRAS = np.array(['Wd', 'Nb', 'Lb', 'B'])
+
+TRACKING_DISABLED = 0.01
+DISMISSAL_RATE = 0.02
+EXTRAS_RATE = 0.02
+
+PLAYERS_PER_TEAM = 11
+DELIVERIES_PER_MATCH = 1800
+
+
+def generate_deliveries(n, seed=0, first_row=0):
+    """ Generates n synthetic deliveries
+
+    ----------
+    n: An integer
+        Number of rows
+    seed: An integer
+        Random seed - the same seed and first_row always give the same rows
+    first_row: An integer
+        Position of the first row in the whole dataset, so chunks continue the same matches and innings
+
+    Returns
+    -------
+    pandas.DataFrame with the Hawkeye CSV columns"""
+
+    import pandas as pd
+
+    rng = np.random.default_rng([seed, first_row])
+
+    row = first_row + np.arange(n)
+    match = 1 + row // DELIVERIES_PER_MATCH
+    in_match = row % DELIVERIES_PER_MATCH
+    innings = 1 + in_match // (DELIVERIES_PER_MATCH // 2)
+    ball_in_innings = in_match % (DELIVERIES_PER_MATCH // 2)
+    over = ball_in_innings // 6
+    ball = 1 + ball_in_innings % 6
+
+    # Each match draws two teams from a pool of squads, players keep the same style/handedness across matches. They
+    # are seeded independently of first_row so chunks of one dataset share them
+    n_players = 40 * PLAYERS_PER_TEAM
+    players = np.random.default_rng(seed)
+    style_names = np.array(list(STYLES))
+    player_style = players.choice(len(STYLES), size=n_players, p=[s[0] for s in STYLES.values()])
+    player_right_hand = players.random(n_players) < 0.75
+    player_right_arm = players.random(n_players) < 0.8
+    player_names = np.array(['Player {0}'.format(i) for i in range(n_players)])
+
+    batting_team = (match * 7 + innings) % 40
+    bowling_team = (match * 7 + 3 - innings) % 40
+    batter = batting_team * PLAYERS_PER_TEAM + (ball_in_innings // 60) % PLAYERS_PER_TEAM
+    non_striker = batting_team * PLAYERS_PER_TEAM + (ball_in_innings // 60 + 1) % PLAYERS_PER_TEAM
+    bowler = bowling_team * PLAYERS_PER_TEAM + 6 + over % 5
+
+    style_code = player_style[bowler]
+    speed_mean = np.array([STYLES[s][1] for s in STYLES])
+    speed_sd = np.array([STYLES[s][2] for s in STYLES])
+    length_mean = np.array([STYLES[s][3] for s in STYLES])
+    length_sd = np.array([STYLES[s][4] for s in STYLES])
+
+    ball_speed = rng.normal(speed_mean[style_code], speed_sd[style_code])
+    pitch_y = rng.normal(length_mean[style_code], length_sd[style_code])
+
+    # Line - a touch outside off stump, which is on the other side for left-handers
+    right_hand = player_right_hand[batter]
+    off_side = np.where(right_hand, -1, 1)
+    pitch_x = rng.normal(0.3 * off_side, 0.28)
+
+    stumps_x = pitch_x * 0.6 + rng.normal(0, 0.15, n)
+    stumps_y = np.clip(0.9 - 0.06 * pitch_y + rng.normal(0, 0.12, n), 0.05, None)
+
+    runs = rng.choice(RUNS, size=n, p=RUN_PROBS)
+    extras = np.where(rng.random(n) < EXTRAS_RATE, rng.choice(EXTRAS, size=n), None)
+    batter_runs = np.where(extras == None, runs, 0)  # noqa: E711 - elementwise comparison
+    bowler_runs = np.where(np.isin(extras, ['Lb', 'B']), 0, runs)
+
+    dismissed = rng.random(n) < DISMISSAL_RATE
+    dismissal = np.full(n, None, dtype=object)
+    dismissal[dismissed] = 'b ' + pd.Series(player_names[bowler[dismissed]]).to_numpy(dtype=object)
+
+    untracked = rng.random(n) < TRACKING_DISABLED
+    ball_speed[untracked] = -1
+    for coord in (pitch_x, pitch_y, stumps_x, stumps_y):
+        coord[untracked] = np.nan
+
+    delivery = (pd.Series(innings).astype(str) + '.' + pd.Series(over).astype(str) + '.' +
+                pd.Series(ball).astype(str)).to_numpy()
+
+    return pd.DataFrame({'matchId': match,
+                         'delivery': delivery,
+                         'ball': ball,
+                         'batter': player_names[batter],
+                         'batterId': batter,
+                         'rightHandedBat': right_hand,
+                         'nonStriker': player_names[non_striker],
+                         'nonStrikerId': non_striker,
+                         'bowler': player_names[bowler],
+                         'bowlerId': bowler,
+                         'rightArmedBowl': player_right_arm[bowler],
+                         'bowlingStyle': style_names[style_code],
+                         'ballSpeed': ball_speed.round(3),
+                         'dismissalDetails': dismissal,
+                         'runs': runs,
+                         'batterRuns': batter_runs,
+                         'bowlerRuns': bowler_runs,
+                         'extras': extras,
+                         'pitchX': pitch_x.round(3),
+                         'pitchY': pitch_y.round(3),
+                         'stumpsX': stumps_x.round(3),
+                         'stumpsY': stumps_y.round(3)}, columns=COLUMNS)
+
+
+def write_csv(n, path, seed=0, chunk_size=1000000):
+    """ Writes n synthetic deliveries to a Hawkeye-style CSV (with the UTF-8 BOM), in chunks to bound memory """
+
+    written = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        while written < n:
+            rows = min(chunk_size, n - written)
+            chunk = generate_deliveries(rows, seed=seed, first_row=written)
+            chunk.to_csv(f, header=written == 0, index=False)
+            written += rows
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic Hawkeye deliveries to a CSV')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.rows, args.path, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
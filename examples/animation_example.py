@@ -0,0 +1,35 @@
+"""A quick example that exports Steve Smith's Ashes 2019 deliveries as ball-by-ball animations - a strike rate heatmap
+GIF and a density map GIF, each drawn frame by frame in fixed memory"""
+
+import pandas as pd
+from plots.pitch_animation import PitchAnimation
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX and stumpsX for plotting
+df['pitchX'] = -df['pitchX']
+df['stumpsX'] = -df['stumpsX']
+
+xy = df[['pitchX', 'pitchY']].to_numpy()
+
+# One over per frame, on the 2D renderer - see plots.pitch_animation for its frame rate against mplot3d
+heatmap = PitchAnimation(xy,
+                         df['batterRuns'].to_numpy(),
+                         title='Steve Smith',
+                         subtitle_1='Batting Strike Rate Zones | Ashes 2019 | England',
+                         subtitle_2='Minimum 12 balls per zone',
+                         legend_title='Strike Rate',
+                         balls_per_frame=6,
+                         renderer='2d',
+                         measure='strike_rate')
+print(heatmap.save('smith_heatmap.gif', fps=4))
+
+density = PitchAnimation(xy,
+                         kind='density',
+                         title='Steve Smith',
+                         subtitle_1='Pitch Map | Last 36 Balls | Ashes 2019 | England',
+                         balls_per_frame=6,
+                         renderer='2d',
+                         window=36)
+print(density.save('smith_density.gif', fps=4))
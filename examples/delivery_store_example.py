@@ -0,0 +1,27 @@
+"""A quick example that converts the sample Hawkeye CSVs into a columnar delivery store once, then reopens it
+memory-mapped to plot Steve Smith's strike rate zones without re-parsing the CSVs"""
+
+import os
+from utilities.delivery_store import build_store, open_store
+from plots.pitch_heatmap import pitch_heatmap
+
+STORE_PATH = 'data/deliveries.store'
+
+# Convert once - later runs just open the store
+if not os.path.exists(STORE_PATH):
+    build_store(['data/moeen.csv', 'data/ssmith_ashes_2019.csv'], STORE_PATH)
+
+store = open_store(STORE_PATH)
+
+# Filter on the dictionary codes rather than decoding the names, co-ordinates are already flipped for plotting
+smith = store.codes('batter') == store.code_of('batter', 'Steve Smith')
+
+xy = store.pitch_xy[smith]
+runs = store['batterRuns'][smith]
+
+title = 'Steve Smith'
+subtitle_1 = 'Series Batting Strike Rate Zones | Ashes 2019 | England'
+subtitle_2 = 'From {0} balls faced with tracking enabled | Minimum 12 balls per zone'.format(len(xy))
+legend_title = 'Strike Rate'
+
+pitch_heatmap(xy, runs, title, subtitle_1, subtitle_2, legend_title, measure='strike_rate')
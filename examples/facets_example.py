@@ -0,0 +1,30 @@
+"""A quick example that plots Steve Smith's Ashes 2019 strike rate zones against each of England's main bowlers, as
+small multiples sharing one colour scale"""
+
+import pandas as pd
+import matplotlib.pyplot as plt
+from plots.pitch_facets import pitch_heatmap_facets
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX for plotting
+df['pitchX'] = -df['pitchX']
+
+# Filter to balls with tracking enabled, against bowlers who bowled at least 80 balls to him
+df = df[df['pitchX'].notna() & df['pitchY'].notna() & (df['ballSpeed'] != -1)]
+df = df[df.groupby('bowlerId')['bowlerId'].transform('size') >= 80]
+
+fig, axes = pitch_heatmap_facets(df[['pitchX', 'pitchY']].to_numpy(),
+                                 df['batterRuns'].to_numpy(),
+                                 df['bowlerId'].to_numpy(),
+                                 labels=dict(zip(df['bowlerId'], df['bowler'])),
+                                 ncols=4,
+                                 title='Steve Smith',
+                                 subtitle_1='Batting Strike Rate Zones by Bowler | Ashes 2019 | England',
+                                 subtitle_2='Minimum 6 balls per zone',
+                                 legend_title='Strike Rate',
+                                 min_balls=6,
+                                 measure='strike_rate')
+
+plt.show()
@@ -0,0 +1,26 @@
+"""A quick example that ingests every Hawkeye CSV in data/ into one delivery store - moeen.csv has fielding
+co-ordinates and ssmith_ashes_2019.csv does not, so the store's fieldXY is NaN for the Smith deliveries - then plots
+where Moeen Ali's deliveries were fielded"""
+
+from utilities.ingest import ingest
+from utilities.delivery_query import DeliveryQuery
+from plots.pitch_densitymap import pitch_densitymap
+
+store, report = ingest('data', 'data/ingested.store', workers=2)
+
+print('{rows} deliveries from {files} files, {duplicates} duplicates dropped - {rows_per_second:,.0f} rows/s, '
+      '{bytes_per_second:,.0f} bytes/s'.format(**report))
+print('Null rows added by the schema union: {0}'.format(report['backfilled']))
+
+# Where Moeen Ali's tracked deliveries were fielded - co-ordinates only moeen.csv provides
+xy = DeliveryQuery(store, coords='field').where(bowler='Moeen Ali').xy()
+
+print('{0} fielding positions, first {1}'.format(len(xy), xy[0]))
+
+# The pitch map of the same deliveries
+pitch_xy = DeliveryQuery(store).where(bowler='Moeen Ali').xy()
+
+pitch_densitymap(pitch_xy,
+                 title='Moeen Ali',
+                 subtitle_1='Pitch Map | Ingested Store',
+                 subtitle_2='From {0} balls bowled with tracking enabled'.format(len(pitch_xy)))
@@ -0,0 +1,25 @@
+"""A quick example that replays Steve Smith's Ashes 2019 deliveries ball by ball into a live strike rate heatmap, as
+it would be fed during live coverage"""
+
+import pandas as pd
+import matplotlib.pyplot as plt
+from plots.live_heatmap import LiveHeatmap
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX and stumpsX for plotting
+df['pitchX'] = -df['pitchX']
+df['stumpsX'] = -df['stumpsX']
+
+live = LiveHeatmap(title='Steve Smith',
+                   subtitle_1='Live Batting Strike Rate Zones | Ashes 2019 | England',
+                   subtitle_2='Minimum 12 balls per zone',
+                   legend_title='Strike Rate',
+                   measure='strike_rate')
+
+for ball in df.itertuples():
+    if live.add(ball.pitchX, ball.pitchY, ball.batterRuns):
+        plt.pause(0.001)  # Let an interactive backend show the update
+
+plt.show()
@@ -0,0 +1,30 @@
+"""A quick example that saves Steve Smith's Ashes 2019 pitch density map with each output profile, printing the save
+time and file size of each - "web" and "print" rasterize the density surface, "vector" keeps every facet"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from plots.pitch_densitymap import pitch_densitymap
+from utilities.output_profiles import save_figure, save_profiles
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX and stumpsX for plotting
+df['pitchX'] = -df['pitchX']
+df['stumpsX'] = -df['stumpsX']
+
+# Filter to balls with tracking enabled
+df = df[(df['pitchX'].notna()) & (df['pitchY'].notna()) & (df['ballSpeed'] != -1)]
+xy = np.array(df[['pitchX', 'pitchY']])
+
+pitch_densitymap(xy,
+                 title='Steve Smith',
+                 subtitle_1='Pitch Map | Ashes 2019 | England',
+                 subtitle_2='From {0} balls faced with tracking enabled'.format(len(xy)))
+
+# smith_density_web.svg, smith_density_print.pdf, smith_density_vector.svg and smith_density_png.png
+save_profiles(plt.gcf(), 'smith_density')
+
+# A single profile, at a higher raster resolution
+print(save_figure(plt.gcf(), 'smith_density_retina', profile='web', dpi=200))
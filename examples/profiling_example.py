@@ -0,0 +1,26 @@
+"""A quick example that profiles each stage of the heatmap and density templates, including matplotlib's draw"""
+
+import pandas as pd
+import matplotlib.pyplot as plt
+from plots.pitch_heatmap import pitch_heatmap
+from plots.pitch_densitymap import pitch_densitymap
+from utilities.instrumentation import Collector, draw_figure
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX for plotting
+df['pitchX'] = -df['pitchX']
+
+# Filter to balls with tracking enabled
+df = df[df['pitchX'].notna() & df['pitchY'].notna() & (df['ballSpeed'] != -1)]
+xy = df[['pitchX', 'pitchY']].to_numpy()
+
+with Collector(memory=True) as profile:
+    pitch_heatmap(xy, df['batterRuns'].to_numpy(), measure='strike_rate')
+    draw_figure(plt.gcf())
+
+    pitch_densitymap(xy)
+    draw_figure(plt.gcf())
+
+print(profile.report())
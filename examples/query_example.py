@@ -0,0 +1,22 @@
+"""A quick example that plots Steve Smith's strike rate zones against the seamers in the first innings of each Ashes
+2019 Test, with the load, pitchX flip, tracking filter and delivery string split all done in one pass by a
+DeliveryQuery"""
+
+from utilities.delivery_query import DeliveryQuery
+from plots.pitch_heatmap import pitch_heatmap
+
+# Nothing is read until the arrays are asked for
+smith = DeliveryQuery('data/ssmith_ashes_2019.csv')
+seam = smith.where(bowlingStyle=['FAST_SEAM', 'MEDIUM_SEAM'], innings=[1, 2])
+
+# Only pitchX, pitchY, ballSpeed, bowlingStyle, delivery and batterRuns are parsed
+print(seam.select('batterRuns').plan())
+
+xy, runs = seam.arrays('batterRuns')
+
+title = 'Steve Smith'
+subtitle_1 = 'First Innings Strike Rate Zones vs Seam | Ashes 2019 | England'
+subtitle_2 = 'From {0} balls faced with tracking enabled | Minimum 8 balls per zone'.format(len(xy))
+legend_title = 'Strike Rate'
+
+pitch_heatmap(xy, runs, title, subtitle_1, subtitle_2, legend_title, min_balls=8, measure='strike_rate')
@@ -0,0 +1,28 @@
+"""A quick example that plots the reconstructed paths of Stuart Broad's deliveries to Steve Smith in the Ashes 2019,
+seen side on and coloured by release speed"""
+
+import pandas as pd
+import matplotlib.pyplot as plt
+from plots.pitch_trajectories import pitch_trajectories
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip the X co-ords for plotting
+df['pitchX'] = -df['pitchX']
+df['stumpsX'] = -df['stumpsX']
+
+# Filter to balls with tracking enabled, bowled by Broad
+df = df[df['pitchX'].notna() & df['pitchY'].notna() & df['stumpsX'].notna() & (df['ballSpeed'] != -1)]
+df = df[df['bowler'] == 'Stuart Broad']
+
+ax = pitch_trajectories(df[['pitchX', 'pitchY']].to_numpy(),
+                        df[['stumpsX', 'stumpsY']].to_numpy(),
+                        df['ballSpeed'].to_numpy(),
+                        title='Stuart Broad to Steve Smith',
+                        subtitle_1='Reconstructed Ball Paths | Ashes 2019',
+                        subtitle_2='Coloured by release speed',
+                        view='side',
+                        colour_by=df['ballSpeed'].to_numpy())
+
+plt.show()
@@ -0,0 +1,38 @@
+"""A quick example that bootstraps confidence intervals for Steve Smith's strike rate per pitch zone, prints the
+least certain zones and fades them on the heatmap"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from analysis.bootstrap import zone_bootstrap
+from analysis.zones import populated_zones
+from plots.pitch_heatmap import pitch_heatmap
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX and stumpsX for plotting
+df['pitchX'] = -df['pitchX']
+df['stumpsX'] = -df['stumpsX']
+
+xy = np.array(df[['pitchX', 'pitchY']])
+runs = df.batterRuns
+
+# 5000 resamples of every zone at once
+stats = zone_bootstrap(xy, runs, resamples=5000, min_balls=12, seed=2019)
+
+zones = populated_zones(stats, min_balls=12)
+for i in np.argsort(zones['ci_low'] - zones['ci_high'])[:5]:
+    print('x {0:.1f} to {1:.1f}m, y {2:.0f} to {3:.0f}m: strike rate {4:.0f} ({5:.0f} to {6:.0f}) from {7} balls'.format(
+        zones['x_left'][i], zones['x_right'][i], zones['y_bottom'][i], zones['y_top'][i], zones['mean'][i] * 100,
+        zones['ci_low'][i] * 100, zones['ci_high'][i] * 100, zones['count'][i]))
+
+pitch_heatmap(title='Steve Smith',
+              subtitle_1='Series Batting Strike Rate Zones | Ashes 2019 | England',
+              subtitle_2='Zones faded by the width of their bootstrapped 95 percent interval | Minimum 12 balls per zone',
+              legend_title='Strike Rate',
+              measure='strike_rate',
+              stats=stats,
+              uncertainty='opacity')
+
+plt.show()
@@ -0,0 +1,39 @@
+"""A quick example that bins Steve Smith's Ashes 2019 deliveries once into a zone pyramid, then serves strike rate
+heatmaps at several zone sizes without re-binning - scroll over the pitch to zoom in and out"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from analysis.pyramid import ZonePyramid
+from plots.pitch_heatmap import pitch_heatmap
+from plots.zoomable_heatmap import ZoomableHeatmap
+
+# Import Steve Smith data
+df = pd.read_csv('data/ssmith_ashes_2019.csv')
+
+# Hawkeye Data has Y co-ord as meters from stumps towards bowler, so need to flip pitchX and stumpsX for plotting
+df['pitchX'] = -df['pitchX']
+df['stumpsX'] = -df['stumpsX']
+
+xy = np.array(df[['pitchX', 'pitchY']])
+pyramid = ZonePyramid.from_deliveries(xy, df.batterRuns)
+
+# Any supported zone size is a sum over the fine grid
+print('{0} zone sizes available'.format(len(pyramid.bin_sizes())))
+pitch_heatmap(title='Steve Smith',
+              subtitle_1='Batting Strike Rate Zones | Ashes 2019 | England',
+              subtitle_2='0.4m x 1.5m zones | Minimum 12 balls per zone',
+              legend_title='Strike Rate',
+              measure='strike_rate',
+              stats=pyramid.zone_stats(0.4, 1.5))
+
+# Smaller zones hold fewer balls, so the finer levels get a lower minimum
+ZoomableHeatmap(pyramid,
+                title='Steve Smith',
+                subtitle_1='Batting Strike Rate Zones | Ashes 2019 | England',
+                subtitle_2='Scroll to change the zone size',
+                legend_title='Strike Rate',
+                measure='strike_rate',
+                min_balls={(0.05, 0.25): 2, (0.1, 0.5): 4})
+
+plt.show()
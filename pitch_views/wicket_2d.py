@@ -0,0 +1,381 @@
+"""A plain 2D axis that draws the plot_wicket_3d views with the camera projection done once, in NumPy.
+
+The templates only ever look at the pitch from the fixed "front", "back", "top" and "side" cameras, yet an mplot3d axis
+re-projects and depth-sorts every artist on each draw. PitchAxes instead projects the 3D co-ordinates it is given
+through the same camera mplot3d would use, when they are added, and keeps ordinary 2D collections, lines and texts.
+Depth sorting is done at the same point: the faces of each polygon collection are sorted back to front and, as
+mplot3d does, the collections are ordered by their nearest point - so the output matches the mplot3d view.
+
+The axis is registered with matplotlib as the "pitch2d" projection:
+
+    fig = plt.figure()
+    ax = fig.add_subplot(projection='pitch2d')
+    plot_wicket_2d(ax, view='front')
+
+"""
+
+from functools import lru_cache
+import numpy as np
+from matplotlib import colors
+from matplotlib.axes import Axes
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.patches import Polygon
+from matplotlib.projections import register_projection
+from pitch_views.wicket_3d import VIEWS, PITCH_Z_BOUND, wicket_background, plot_wicket_3d, _hashable
+from utilities.instrumentation import profiled, span
+
+# mplot3d camera constants - the eye distance and focal length of a default Axes3D, the length its box aspect is
+# scaled to, and the 2D view limits it projects into (see Axes3D.get_proj, set_box_aspect and set_top_view)
+CAMERA_DISTANCE = 10
+FOCAL_LENGTH = 1
+BOX_ASPECT_LENGTH = 1.8294640721620434
+VIEW_XLIM = (-0.95 / CAMERA_DISTANCE, 0.9 / CAMERA_DISTANCE)
+VIEW_YLIM = (-0.95 / CAMERA_DISTANCE, 0.9 / CAMERA_DISTANCE)
+
+# mplot3d pads the limits by a quarter of a twelfth of their range when drawing the floor pane
+PANE_PADDING = 0.25 / 12
+
+
+def _view_limits(view):
+    # The 3D (x, y, z) limits plot_wicket_3d sets for a view, as a (3, 2) array
+    _, x_bound, y_bound, _, behind_stumps = VIEWS[view]
+    return np.array([[-x_bound, x_bound], [behind_stumps, y_bound], [0, PITCH_Z_BOUND]], dtype=float)
+
+
+@lru_cache(maxsize=None)
+def view_matrix(view):
+    """ The 4x4 homogeneous projection matrix of a plot_wicket_3d view - the same matrix mplot3d builds for the view's
+    camera angle, limits and box aspect on each draw
+
+    Returns
+    -------
+    numpy.ndarray"""
+
+    (elev, azim), _, _, _, _ = VIEWS[view]
+    limits = _view_limits(view)
+
+    # World transform - the limits scaled to a box with the plot's aspect
+    aspect = limits[:, 1] - limits[:, 0]
+    aspect = aspect * BOX_ASPECT_LENGTH / np.linalg.norm(aspect)
+    scale = aspect / (limits[:, 1] - limits[:, 0])
+    world = np.eye(4)
+    world[:3, :3] = np.diag(scale)
+    world[:3, 3] = -limits[:, 0] * scale
+
+    # Camera looking at the middle of the box from CAMERA_DISTANCE, along the elevation and azimuth
+    elev, azim = np.deg2rad(elev), np.deg2rad(azim)
+    middle = 0.5 * aspect
+    direction = np.array([np.cos(elev) * np.cos(azim), np.cos(elev) * np.sin(azim), np.sin(elev)])
+    eye = middle + CAMERA_DISTANCE * direction * FOCAL_LENGTH
+
+    w = (eye - middle) / np.linalg.norm(eye - middle)
+    u = np.cross([0, 0, 1], w)
+    u = u / np.linalg.norm(u)
+    v = np.cross(w, u)
+
+    rotate, translate = np.eye(4), np.eye(4)
+    rotate[:3, :3] = [u, v, w]
+    translate[:3, 3] = -eye
+
+    # Perspective
+    near, far = -CAMERA_DISTANCE, CAMERA_DISTANCE
+    perspective = np.array([[FOCAL_LENGTH, 0, 0, 0],
+                            [0, FOCAL_LENGTH, 0, 0],
+                            [0, 0, (near + far) / (near - far), -2 * near * far / (near - far)],
+                            [0, 0, -1, 0]])
+
+    return perspective @ rotate @ translate @ world
+
+
+def project(xyz, matrix):
+    """ Projects 3D points, an array of shape (..., 3), with a view_matrix
+
+    Returns
+    -------
+    (xy, depth) - the 2D co-ordinates, shape (..., 2), and the depth of each point, shape (...) - larger is further
+    from the camera"""
+
+    xyz = np.asarray(xyz, dtype=float)
+    projected = xyz @ matrix[:3, :3].T + matrix[:3, 3]
+    w = xyz @ matrix[3, :3] + matrix[3, 3]
+    return projected[..., :2] / w[..., None], projected[..., 2] / w
+
+
+class DepthSortedPolyCollection(PolyCollection):
+    """ A PolyCollection painted in a fixed face order - order[i] is the index of the ith face painted - whose
+    per-face colours are still given in the original face order, as for a Poly3DCollection. Code recolouring the faces
+    of a collection (e.g. plots.live_heatmap) works the same on either axis """
+
+    def __init__(self, verts, order, **kwargs):
+        self.order = order
+        painted = verts[order] if isinstance(verts, np.ndarray) else [verts[i] for i in order]
+        super().__init__(painted, **kwargs)
+
+    def _painted(self, colour):
+        if colour is None or isinstance(colour, str):
+            return colour
+        colour = colors.to_rgba_array(colour)
+        return colour[self.order] if len(colour) == len(self.order) and len(colour) > 1 else colour
+
+    def set_facecolor(self, c):
+        super().set_facecolor(self._painted(c))
+
+    def set_edgecolor(self, c):
+        super().set_edgecolor(self._painted(c))
+
+
+class PitchAxes(Axes):
+    """ A 2D axis showing one plot_wicket_3d view, drawn by plot_wicket_2d. Its drawing methods take 3D data
+    co-ordinates, projected through the view's camera as they are added:
+
+    text(x, y, z, s) and plot(xs, ys, zs) as on a 3D axis
+    add_polygons(verts) and add_lines(segments) for flat collections, as Poly3DCollection and Line3DCollection
+    plot_surface(X, Y, Z, facecolors=...) as on a 3D axis
+
+    Collections are sorted back to front, as on a 3D axis - lines and texts are drawn in zorder, as on a 3D axis.
+    """
+
+    name = 'pitch2d'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.view = None
+        self.matrix = None
+        self._depth_sorted = []
+
+        # The 2D limits mplot3d projects into, on a square box
+        self.set_xlim(*VIEW_XLIM)
+        self.set_ylim(*VIEW_YLIM)
+        self.set_aspect('equal', adjustable='box')
+        self.set_autoscale_on(False)
+        self.set_axis_off()
+
+    def set_view(self, view):
+        """ Sets the camera - one of the plot_wicket_3d views. Artists already added keep their projection """
+
+        self.view = view
+        self.matrix = view_matrix(view)
+
+    def project(self, xyz):
+        """ Projects 3D points (..., 3) with the axis' view, see project """
+
+        if self.matrix is None:
+            raise ValueError('No view has been set, call set_view or plot_wicket_2d first')
+        return project(xyz, self.matrix)
+
+    def add_floor(self, colour):
+        """ Fills the floor of the view's limits, the pane mplot3d draws below everything else """
+
+        limits = np.sort(_view_limits(self.view), axis=1)
+        padding = (limits[:, 1] - limits[:, 0]) * PANE_PADDING
+        (xmin, ymin, zmin), (xmax, ymax, _) = limits[:, 0] - padding, limits[:, 1] + padding
+
+        # Every view looks down on the pitch, so the pane is always at the bottom of the box
+        xy, _ = self.project([[xmin, ymin, zmin], [xmax, ymin, zmin], [xmax, ymax, zmin], [xmin, ymax, zmin]])
+        floor = Polygon(xy, closed=True, facecolor=colors.to_rgba(colour), edgecolor='w', zorder=0)
+        self.add_patch(floor)
+        # Panes aren't clipped to the axis
+        floor.set_clip_on(False)
+        return floor
+
+    def _add_depth_sorted(self, collection, depth):
+        # mplot3d orders collections by the depth of their nearest point when drawing, see draw
+        collection.pitch_depth = depth.min() if depth.size else np.nan
+        self._depth_sorted.append(collection)
+        self.add_collection(collection, autolim=False)
+        return collection
+
+    def add_polygons(self, verts, **kwargs):
+        """ Adds flat polygons, as a Poly3DCollection would draw them, in one PolyCollection
+
+        ----------
+        verts: An array of shape (n, k, 3) or a list of (k, 3) arrays
+            The polygon vertices in data co-ordinates
+        kwargs:
+            PolyCollection properties - per-polygon facecolors and edgecolors follow verts, alpha only applies to the
+            facecolors
+
+        Returns
+        -------
+        The DepthSortedPolyCollection"""
+
+        facecolors = kwargs.pop('facecolors', None)
+        edgecolors = kwargs.pop('edgecolors', None)
+
+        if isinstance(verts, np.ndarray) and verts.ndim == 3:
+            xy, depth = self.project(verts)
+            mean_depth = depth.mean(axis=1)
+            polygons = xy
+        else:
+            projected = [self.project(poly) for poly in verts]
+            polygons = [xy for xy, _ in projected]
+            depth = np.concatenate([d for _, d in projected]) if projected else np.empty(0)
+            mean_depth = np.array([d.mean() for _, d in projected])
+
+        # As on a Poly3DCollection, alpha only applies to the faces - the edges stay opaque
+        if facecolors is not None and kwargs.get('alpha') is not None:
+            facecolors = colors.to_rgba_array(facecolors, kwargs.pop('alpha'))
+
+        # Faces are painted back to front
+        order = np.argsort(-mean_depth, kind='stable')
+        collection = DepthSortedPolyCollection(polygons, order, facecolors=facecolors, edgecolors=edgecolors, **kwargs)
+        return self._add_depth_sorted(collection, depth)
+
+    def add_lines(self, segments, **kwargs):
+        """ Adds 3D line segments, as a Line3DCollection would draw them, in one LineCollection
+
+        ----------
+        segments: An array of shape (n, k, 3) or a list of (k, 3) arrays
+        kwargs:
+            LineCollection properties
+
+        Returns
+        -------
+        The LineCollection"""
+
+        if isinstance(segments, np.ndarray) and segments.ndim == 3:
+            lines, depth = self.project(segments)
+        else:
+            projected = [self.project(segment) for segment in segments]
+            lines = [xy for xy, _ in projected]
+            depth = np.concatenate([d for _, d in projected]) if projected else np.empty(0)
+
+        return self._add_depth_sorted(LineCollection(lines, **kwargs), depth)
+
+    # 2D text in axes co-ordinates, as on a 3D axis
+    text2D = Axes.text
+
+    def plot(self, xs, ys, zs=0, **kwargs):
+        """ Plots a 3D line or markers, as Axes3D.plot - drawn in zorder like a Line3D """
+
+        xs, ys, zs = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (xs, ys, zs)])
+        xy, _ = self.project(np.stack([xs, ys, zs], axis=-1))
+        return super().plot(xy[..., 0], xy[..., 1], **kwargs)
+
+    def text(self, x, y, z, s, **kwargs):
+        """ Adds text at a 3D position, as Axes3D.text """
+
+        (px, py), _ = self.project([x, y, z])
+        return super().text(px, py, s, **kwargs)
+
+    def plot_surface(self, X, Y, Z, facecolors, rcount=50, ccount=50, **kwargs):
+        """ Draws a flat surface coloured per grid point, sampled into polygons as Axes3D.plot_surface does with
+        facecolors - every polygon spans a stride of grid cells and takes the colour of its first corner. Any cmap
+        argument is ignored, as it is by Axes3D.plot_surface when facecolors are given
+
+        Returns
+        -------
+        The PolyCollection"""
+
+        kwargs.pop('cmap', None)
+        linewidth = kwargs.pop('linewidth', None)
+        if linewidth is not None:
+            kwargs['linewidths'] = linewidth
+        antialiased = kwargs.pop('antialiased', None)
+        if antialiased is not None:
+            kwargs['antialiaseds'] = antialiased
+
+        rows, cols = Z.shape
+        rstride = int(max(np.ceil(rows / rcount), 1))
+        cstride = int(max(np.ceil(cols / ccount), 1))
+        row_inds = np.array(list(range(0, rows - 1, rstride)) + [rows - 1])
+        col_inds = np.array(list(range(0, cols - 1, cstride)) + [cols - 1])
+
+        r0, c0 = np.meshgrid(row_inds[:-1], col_inds[:-1], indexing='ij')
+        r1, c1 = np.meshgrid(row_inds[1:], col_inds[1:], indexing='ij')
+
+        # Corners of each polygon, in the order Axes3D.plot_surface walks a polygon's perimeter
+        corners = [(r0, c0), (r1, c0), (r1, c1), (r0, c1)]
+        verts = np.stack([np.stack([A[r, c] for r, c in corners], axis=-1) for A in (X, Y, Z)], axis=-1)
+        verts = verts.reshape(-1, 4, 3)
+        colours = np.asarray(facecolors)[r0, c0].reshape(-1, 4)
+
+        keep = ~np.isnan(verts).any(axis=(1, 2))
+        return self.add_polygons(verts[keep], facecolors=colours[keep], edgecolors=colours[keep], **kwargs)
+
+    def draw(self, renderer):
+        # As mplot3d does: collections are drawn above the axes, furthest (by nearest point) first. Collections
+        # removed since (e.g. by plots.zoomable_heatmap switching levels) are dropped
+        self._depth_sorted = [collection for collection in self._depth_sorted if collection.axes is self]
+        zorder = max(axis.get_zorder() for axis in self._axis_map.values()) + 1
+        for collection in sorted(self._depth_sorted, key=lambda c: c.pitch_depth, reverse=True):
+            collection.set_zorder(zorder)
+            zorder += 1
+        super().draw(renderer)
+
+
+register_projection(PitchAxes)
+
+
+def _line_kwargs(kwargs):
+    # Line2D style arguments as LineCollection ones - the cap style of a Line2D is kept
+    kwargs = dict(kwargs)
+    style = {'color': 'colors', 'linewidth': 'linewidths', 'linestyle': 'linestyles'}
+    kwargs = {style.get(key, key): value for key, value in kwargs.items()}
+    kwargs['capstyle'] = 'butt' if kwargs.get('linestyles', '-') not in ('-', 'solid') else 'projecting'
+    return kwargs
+
+
+def draw_wicket_background_2d(ax, recipe):
+    """ Adds the artists of a wicket_background recipe to a PitchAxes - lines of the same style share one
+    LineCollection, drawn in zorder like the Line3D artists of plot_wicket_3d """
+
+    lines = {}
+    for kind, args, kwargs in recipe:
+        if kind == 'line':
+            key = tuple(sorted(kwargs.items(), key=lambda item: item[0]))
+            xy, _ = ax.project(np.column_stack(args))
+            lines.setdefault(key, (kwargs, []))[1].append(xy)
+        elif kind == 'poly':
+            verts, = args
+            ax.add_polygons(np.asarray(verts, dtype=float), **kwargs)
+        else:
+            ax.text(*args, **kwargs)
+
+    for kwargs, segments in lines.values():
+        kwargs = _line_kwargs(kwargs)
+        kwargs.setdefault('zorder', 2)
+        ax.add_collection(LineCollection(segments, **kwargs), autolim=False)
+
+
+@profiled('plot_wicket_2d')
+def plot_wicket_2d(ax,
+                   stumps_guide=True,
+                   view='front',
+                   pitch_colour='white',
+                   wicket_colour='#f5f6fa',
+                   wicket_alpha=0.1,
+                   outline_colour='silver',
+                   marking_colour='navy',
+                   stump_colour='slategray',
+                   guide_colour='royalblue'):
+
+    """ Plots the plot_wicket_3d wicket on a PitchAxes (projection='pitch2d'), projected in NumPy up front - the
+    arguments are as for plot_wicket_3d
+
+    Returns
+    -------
+    The PitchAxes"""
+
+    ax.set_view(view)
+
+    with span('plot_wicket_2d.recipe'):
+        recipe = wicket_background(view,
+                                   stumps_guide,
+                                   _hashable(wicket_colour),
+                                   wicket_alpha,
+                                   _hashable(outline_colour),
+                                   _hashable(marking_colour),
+                                   _hashable(stump_colour),
+                                   _hashable(guide_colour))
+
+    with span('plot_wicket_2d.artists', ax):
+        ax.add_floor(pitch_colour)
+        draw_wicket_background_2d(ax, recipe)
+
+    return ax
+
+
+# Wicket plotting function for each new_pitch_figure renderer
+WICKET_RENDERERS = {'3d': plot_wicket_3d,
+                    '2d': plot_wicket_2d}
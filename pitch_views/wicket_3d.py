@@ -1,132 +1,96 @@
+from functools import lru_cache
 from matplotlib import colors
 import mpl_toolkits.mplot3d.art3d as art3d
-import matplotlib.font_manager as fm
+from utilities.resources import font_properties
+from utilities.instrumentation import profiled, span
 
+PITCH_Z_BOUND = 3
 
-def plot_wicket_3d(ax,
-                   stumps_guide=True,
-                   view='front',
-                   pitch_colour='white',
-                   wicket_colour='#f5f6fa',
-                   wicket_alpha=0.1,
-                   outline_colour='silver',
-                   marking_colour='navy',
-                   stump_colour='slategray',
-                   guide_colour='royalblue'):
-
-    """ Plots a standard cricket wicket to regulation dimensions in metres - centre of the middle stump is (0,0)
-
-    ----------
-    ax: A matplotlib axis where ax = plt.gca(projection='3d')
-        The 3D axes to plot on.
-    view: Camera angle for plot - either "front", "back", "top"
-    stumps_guide: Boolean - stumps line guide overlay will be added if True
-    pitch_colour: A matplotlib named colour string OR an RGBA (0-1) tuple
-        The colour of the outfield pitch floor.
-    wicket_colour: Any valid matplotlib colour
-        The colour of the wicket pitch
-    wicket_alpha: Float
-        The alpha value (transparency) of the wicket colour
-    outlineline_colour: Any valid matplotlib colour
-        The colour of the wicket outline.
-    marking_colour: Any valid matplotlib colour
-        The colour of the pitch line markings.
-    stump_colour: Any valid matplotlib colour
-        The colour of the stumps.
-    guide_colour: Any valid matplotlib colour
-        The colour of shaded stumps line overlay.
+WICKET_LENGTH = 22.56
+WICKET_WIDTH = 3.66
 
-    Returns
-    -------
-    matplotlib.axes.Axes"""
+BATTING_CREASE_LENGTH = 1.22
+BOWLING_CREASE_WIDTH = 2.64
 
-    fname = 'fonts/AlumniSans-SemiBold.ttf'
-    fp = fm.FontProperties(fname=fname)
+STUMP_HEIGHT = 0.7112
+STUMP_WIDTH = 0.03943
+STUMP_GAP = 0.08893
 
-    if view == 'front':
-        PITCH_X_BOUND = 0.5
-        PITCH_Y_BOUND = 5
-        STUMP_LINEWIDTH = 3
-        BEHIND_STUMPS_Y_LIMIT = -2
+# Per view: camera (elev, azim), PITCH_X_BOUND, PITCH_Y_BOUND, STUMP_LINEWIDTH, BEHIND_STUMPS_Y_LIMIT
+VIEWS = {'front': ((8, 90), 0.5, 5, 3, -2),
+         'back': ((2, -90), -0.9, -1, 5, -2),
+         'top': ((90, 90), 1, 10, 2, -10),
+         'side': ((10, 0), 1.8, 20, 3, -2)}
 
-        ax.view_init(elev=8, azim=90)
 
-    elif view == 'back':
-        PITCH_X_BOUND = -0.9
-        PITCH_Y_BOUND = -1
-        STUMP_LINEWIDTH = 5
-        BEHIND_STUMPS_Y_LIMIT = -2
+def _hashable(colour):
+    # Colours are cache keys, so anything but a colour string (RGB(A) lists and arrays, (colour, alpha) pairs) is
+    # normalised to an RGBA tuple
+    return colour if isinstance(colour, str) else colors.to_rgba(colour)
 
-        ax.view_init(elev=2, azim=-90)
 
-    elif view == 'top':
-        PITCH_X_BOUND = 1
-        PITCH_Y_BOUND = 10
-        STUMP_LINEWIDTH = 2
-        BEHIND_STUMPS_Y_LIMIT = -10
+@lru_cache(maxsize=64)
+def wicket_background(view='front',
+                      stumps_guide=True,
+                      wicket_colour='#f5f6fa',
+                      wicket_alpha=0.1,
+                      outline_colour='silver',
+                      marking_colour='navy',
+                      stump_colour='slategray',
+                      guide_colour='royalblue'):
 
-        ax.view_init(elev=90, azim=90)
+    """ Builds, once per view and style, the recipe of static wicket artists drawn by plot_wicket_3d
 
-    PITCH_Z_BOUND = 3
+    The recipe is a tuple of (kind, args, kwargs) entries - kind is "line", "poly" or "text" - in drawing order, with
+    every position and style already resolved, so draw_wicket_background only has to construct the artists.
+    Results are cached on all arguments, which must be hashable.
 
-    WICKET_LENGTH = 22.56
-    WICKET_WIDTH = 3.66
+    Returns
+    -------
+    tuple"""
 
-    BATTING_CREASE_LENGTH = 1.22
-    BOWLING_CREASE_WIDTH = 2.64
+    fp = font_properties()
 
-    STUMP_HEIGHT = 0.7112
-    STUMP_WIDTH = 0.03943
-    STUMP_GAP = 0.08893
+    _, _, _, STUMP_LINEWIDTH, _ = VIEWS[view]
 
     min_h = 0  # Z height to plot court lines - 99% use cases will be ground level i.e. 0
 
-    ax.set_xlim3d([-PITCH_X_BOUND, PITCH_X_BOUND])
-    ax.set_ylim3d([BEHIND_STUMPS_Y_LIMIT, PITCH_Y_BOUND])
-    ax.set_zlim3d([0, PITCH_Z_BOUND])
+    recipe = []
+
+    def line(x, y, z, **kwargs):
+        z = [z] * len(x) if not isinstance(z, list) else z
+        recipe.append(('line', (tuple(x), tuple(y), tuple(z)), kwargs))
 
     # Plot wicket side lines
-    ax.plot([-WICKET_WIDTH / 2, -WICKET_WIDTH / 2], [-BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH],
-            min_h, c=outline_colour, lw=0.5, zorder=1)
-    ax.plot([WICKET_WIDTH / 2, WICKET_WIDTH / 2], [-BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH],
-            min_h, c=outline_colour, lw=0.5, zorder=1)
+    line([-WICKET_WIDTH / 2, -WICKET_WIDTH / 2], [-BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH],
+         min_h, color=outline_colour, linewidth=0.5, zorder=1)
+    line([WICKET_WIDTH / 2, WICKET_WIDTH / 2], [-BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH],
+         min_h, color=outline_colour, linewidth=0.5, zorder=1)
 
     # Plot wicket end lines
-    ax.plot([-WICKET_WIDTH / 2, WICKET_WIDTH / 2],
-            [WICKET_LENGTH - BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH],
-            min_h, c=outline_colour, lw=0.5, zorder=1)
-    ax.plot([-WICKET_WIDTH / 2, WICKET_WIDTH / 2], [-BATTING_CREASE_LENGTH, -BATTING_CREASE_LENGTH],
-            min_h, c=outline_colour, lw=0.5, zorder=1)
+    line([-WICKET_WIDTH / 2, WICKET_WIDTH / 2],
+         [WICKET_LENGTH - BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH],
+         min_h, color=outline_colour, linewidth=0.5, zorder=1)
+    line([-WICKET_WIDTH / 2, WICKET_WIDTH / 2], [-BATTING_CREASE_LENGTH, -BATTING_CREASE_LENGTH],
+         min_h, color=outline_colour, linewidth=0.5, zorder=1)
 
     # Plot batting crease
-    ax.plot([-WICKET_WIDTH / 2, WICKET_WIDTH / 2], [BATTING_CREASE_LENGTH, BATTING_CREASE_LENGTH],
-            min_h, c=marking_colour, zorder=1)
+    line([-WICKET_WIDTH / 2, WICKET_WIDTH / 2], [BATTING_CREASE_LENGTH, BATTING_CREASE_LENGTH],
+         min_h, color=marking_colour, zorder=1)
 
     # Plot bowling crease
-    ax.plot([-BOWLING_CREASE_WIDTH / 2, BOWLING_CREASE_WIDTH / 2], [0, 0],
-            min_h, c=marking_colour, zorder=1)
+    line([-BOWLING_CREASE_WIDTH / 2, BOWLING_CREASE_WIDTH / 2], [0, 0],
+         min_h, color=marking_colour, zorder=1)
 
     # Plot return creases
-    ax.plot([-BOWLING_CREASE_WIDTH / 2, -BOWLING_CREASE_WIDTH / 2], [BATTING_CREASE_LENGTH, -BATTING_CREASE_LENGTH],
-            min_h, c=marking_colour, zorder=1)
-    ax.plot([BOWLING_CREASE_WIDTH / 2, BOWLING_CREASE_WIDTH / 2], [BATTING_CREASE_LENGTH, -BATTING_CREASE_LENGTH],
-            min_h, c=marking_colour, zorder=1)
+    line([-BOWLING_CREASE_WIDTH / 2, -BOWLING_CREASE_WIDTH / 2], [BATTING_CREASE_LENGTH, -BATTING_CREASE_LENGTH],
+         min_h, color=marking_colour, zorder=1)
+    line([BOWLING_CREASE_WIDTH / 2, BOWLING_CREASE_WIDTH / 2], [BATTING_CREASE_LENGTH, -BATTING_CREASE_LENGTH],
+         min_h, color=marking_colour, zorder=1)
 
     # Draw stumps
-    x = [0, 0]
-    y = [0, 0]
-    z = [0, STUMP_HEIGHT]
-    ax.plot(x, y, z, color=stump_colour, linewidth=STUMP_LINEWIDTH, zorder=10)
-
-    x = [STUMP_GAP, STUMP_GAP]
-    y = [0, 0]
-    z = [0, STUMP_HEIGHT]
-    ax.plot(x, y, z, color=stump_colour, linewidth=STUMP_LINEWIDTH, zorder=10)
-
-    x = [-STUMP_GAP, -STUMP_GAP]
-    y = [0, 0]
-    z = [0, STUMP_HEIGHT]
-    ax.plot(x, y, z, color=stump_colour, linewidth=STUMP_LINEWIDTH, zorder=10)
+    for x in [0, STUMP_GAP, -STUMP_GAP]:
+        line([x, x], [0, 0], [0, STUMP_HEIGHT], color=stump_colour, linewidth=STUMP_LINEWIDTH, zorder=10)
 
     if stumps_guide == True:
         # Draw stumps line guide
@@ -136,9 +100,8 @@ def plot_wicket_3d(ax,
         y = [0, 0, WICKET_LENGTH - BATTING_CREASE_LENGTH, WICKET_LENGTH - BATTING_CREASE_LENGTH]
         z = [0, 0, 0, 0]
         verts = [list(zip(x, y, z))]
-        ax.add_collection3d(art3d.Poly3DCollection(verts,
-                                                   facecolors=guide_colour,
-                                                   alpha=0.1))
+        recipe.append(('poly', (verts,), dict(facecolors=guide_colour,
+                                              alpha=0.1)))
 
     # Draw a pitch surface
     x = [WICKET_WIDTH / 2,
@@ -151,10 +114,100 @@ def plot_wicket_3d(ax,
          -BATTING_CREASE_LENGTH]
     z = [0, 0, 0, 0]
     verts = [list(zip(x, y, z))]
-    ax.add_collection3d(art3d.Poly3DCollection(verts,
-                                               facecolors=wicket_colour,
-                                               alpha=wicket_alpha,
-                                               zorder=0))
+    recipe.append(('poly', (verts,), dict(facecolors=wicket_colour,
+                                          alpha=wicket_alpha,
+                                          zorder=0)))
+
+    # Plot ruler on the surface of the pitch - text angle is in radians
+    for dist in [2, 4, 6, 8, 10]:
+        # Plot text labels on pitch surface
+        # text3d(ax, (2.5, dist, 0),
+        #        '{0}m'.format(dist),
+        #        zdir="z", size=0.25, usetex=False, angle=np.pi,
+        #        facecolor='black', edgecolor=outline_colour)
+
+        # Plot text labels as a regular text label
+        line([-2, 2], [dist, dist], 0, color=marking_colour, alpha=0.2, linestyle='--', linewidth=1)
+        recipe.append(('text', (2.1, dist, 0, '{0}m'.format(dist)), dict(color=outline_colour,
+                                                                         fontproperties=fp,
+                                                                         size=14)))
+
+    return tuple(recipe)
+
+
+def draw_wicket_background(ax, recipe):
+    """ Adds the artists of a wicket_background recipe to a 3D axis, in recipe order """
+
+    for kind, args, kwargs in recipe:
+        if kind == 'line':
+            ax.add_line(art3d.Line3D(*args, **kwargs))
+        elif kind == 'poly':
+            ax.add_collection3d(art3d.Poly3DCollection(*args, **kwargs))
+        else:
+            ax.text(*args, **kwargs)
+
+
+@profiled('plot_wicket_3d')
+def plot_wicket_3d(ax,
+                   stumps_guide=True,
+                   view='front',
+                   pitch_colour='white',
+                   wicket_colour='#f5f6fa',
+                   wicket_alpha=0.1,
+                   outline_colour='silver',
+                   marking_colour='navy',
+                   stump_colour='slategray',
+                   guide_colour='royalblue'):
+
+    """ Plots a standard cricket wicket to regulation dimensions in metres - centre of the middle stump is (0,0)
+
+    The static wicket artists are built from a recipe cached per view and style (see wicket_background), so repeated
+    calls with the same arguments only pay for constructing the artists on the new axis.
+
+    ----------
+    ax: A matplotlib axis where ax = plt.gca(projection='3d')
+        The 3D axes to plot on.
+    view: Camera angle for plot - either "front", "back", "top", "side"
+    stumps_guide: Boolean - stumps line guide overlay will be added if True
+    pitch_colour: A matplotlib named colour string OR an RGBA (0-1) tuple
+        The colour of the outfield pitch floor.
+    wicket_colour: Any valid matplotlib colour
+        The colour of the wicket pitch
+    wicket_alpha: Float
+        The alpha value (transparency) of the wicket colour
+    outlineline_colour: Any valid matplotlib colour
+        The colour of the wicket outline.
+    marking_colour: Any valid matplotlib colour
+        The colour of the pitch line markings.
+    stump_colour: Any valid matplotlib colour
+        The colour of the stumps.
+    guide_colour: Any valid matplotlib colour
+        The colour of shaded stumps line overlay.
+
+    Returns
+    -------
+    matplotlib.axes.Axes"""
+
+    (elev, azim), PITCH_X_BOUND, PITCH_Y_BOUND, _, BEHIND_STUMPS_Y_LIMIT = VIEWS[view]
+
+    ax.view_init(elev=elev, azim=azim)
+
+    ax.set_xlim3d([-PITCH_X_BOUND, PITCH_X_BOUND])
+    ax.set_ylim3d([BEHIND_STUMPS_Y_LIMIT, PITCH_Y_BOUND])
+    ax.set_zlim3d([0, PITCH_Z_BOUND])
+
+    with span('plot_wicket_3d.recipe'):
+        recipe = wicket_background(view,
+                                   stumps_guide,
+                                   _hashable(wicket_colour),
+                                   wicket_alpha,
+                                   _hashable(outline_colour),
+                                   _hashable(marking_colour),
+                                   _hashable(stump_colour),
+                                   _hashable(guide_colour))
+
+    with span('plot_wicket_3d.artists', ax):
+        draw_wicket_background(ax, recipe)
 
     # Get rid of colored axes planes
     # First remove fill
@@ -175,7 +228,12 @@ def plot_wicket_3d(ax,
 
     # Remove grid
     ax.grid(False)
-    #
+
+    # No ticks - removed before the tick labels so matplotlib doesn't build tick objects only to throw them away
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_zticks([])
+
     # Remove tick labels
     ax.set_xticklabels([])
     ax.set_yticklabels([])
@@ -186,22 +244,5 @@ def plot_wicket_3d(ax,
     ax.w_yaxis.line.set_color((1.0, 1.0, 1.0, 0.0))
     ax.w_zaxis.line.set_color((1.0, 1.0, 1.0, 0.0))
 
-    # No ticks
-    ax.set_xticks([])
-    ax.set_yticks([])
-    ax.set_zticks([])
-    #
     ax.set_box_aspect(
         (2 * PITCH_X_BOUND, PITCH_Y_BOUND - BEHIND_STUMPS_Y_LIMIT, PITCH_Z_BOUND))  # max - min for each axis
-
-    # Plot ruler on the surface of the pitch - text angle is in radians
-    for dist in [2, 4, 6, 8, 10]:
-        # Plot text labels on pitch surface
-        # text3d(ax, (2.5, dist, 0),
-        #        '{0}m'.format(dist),
-        #        zdir="z", size=0.25, usetex=False, angle=np.pi,
-        #        facecolor='black', edgecolor=outline_colour)
-
-        # Plot text labels as a regular text label
-        ax.plot([-2, 2], [dist, dist], 0, c=marking_colour, alpha=0.2, ls='--', lw=1)
-        ax.text(2.1, dist, 0, '{0}m'.format(dist), color=outline_colour, fontproperties=fp, size=14)
@@ -0,0 +1,148 @@
+"""Live-updating bowling density map, built on the same styling as pitch_densitymap.
+
+LiveDensityMap keeps a DensityAccumulator on a fixed pitch-wide grid. Each delivery adds its kernel footprint, and
+with a rolling window (e.g. the last 36 balls for "last 6 overs") the oldest delivery's kernel is removed again. The
+existing plot_surface face colours are then refreshed in place instead of rebuilding the figure.
+
+"""
+
+from collections import deque
+
+import numpy as np
+import matplotlib.pyplot as plt
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import add_title_axis, alpha_fade, mark_data_layer, new_pitch_figure
+from analysis.density import PITCH_BOUNDS, BW_METHOD, DensityAccumulator
+from plots.pitch_densitymap import (PITCH_COLOUR, WICKET_COLOUR, MARKING_COLOUR, STUMP_COLOUR, OUTLINE_COLOUR,
+                                    TITLE_COLOUR, SUBTITLE_COLOUR, ALPHA_THRESHOLDS)
+
+# plot_surface samples at most this many rows and columns of the grid as faces
+SURFACE_COUNT = 50
+
+
+def surface_face_index(rows, cols, count=SURFACE_COUNT):
+    """ Grid row and column indices whose colour plot_surface uses for each face, for its default rcount/ccount
+
+    Returns
+    -------
+    (row indices, column indices) - face colours are facecolors[rows][:, cols] in row-major order"""
+
+    rstride = int(max(np.ceil(rows / count), 1))
+    cstride = int(max(np.ceil(cols / count), 1))
+    return np.arange(0, rows - 1, rstride), np.arange(0, cols - 1, cstride)
+
+
+class LiveDensityMap:
+    """ Incrementally updated pitch density map.
+
+    ----------
+    title, subtitle_1, subtitle_2: Strings
+        As for pitch_densitymap
+    window: An integer
+        Only the most recent window deliveries are shown, None keeps every delivery
+    bounds: A (xmin, xmax, ymin, ymax) tuple
+        The fixed grid extent
+    resolution: An integer or (integer, integer) tuple
+        The density grid resolution
+    bandwidth: A (float, float) tuple
+        Kernel standard deviation in x and y in metres, see DensityAccumulator
+    reference: A 2d array
+        Optional sample (e.g. the bowler's previous matches) to take the kernel covariance from instead
+    alpha_thresholds: A sequence of (luminance, alpha) pairs
+        As for pitch_densitymap
+    renderer: A string
+        "3d" or "2d", as for pitch_densitymap - see plots.pitch_animation for the frame rate of each
+
+    Co-ordinates passed to add are in plotting orientation, i.e. with the Hawkeye pitchX already flipped.
+    """
+
+    def __init__(self,
+                 title='',
+                 subtitle_1='',
+                 subtitle_2='',
+                 window=None,
+                 bounds=PITCH_BOUNDS,
+                 resolution=100,
+                 bandwidth=(0.08, 0.6),
+                 reference=None,
+                 bw_method=BW_METHOD,
+                 alpha_thresholds=ALPHA_THRESHOLDS,
+                 renderer='3d'):
+
+        self.window = window
+        self.recent = deque()
+        self.alpha_thresholds = alpha_thresholds
+        self.density = DensityAccumulator(bounds=bounds,
+                                          resolution=resolution,
+                                          bandwidth=bandwidth,
+                                          reference=reference,
+                                          bw_method=bw_method)
+
+        fp = font_properties()
+
+        X, Y = self.density.grid()
+        self._rows, self._cols = surface_face_index(*X.shape)
+
+        self.fig, self.ax = new_pitch_figure(renderer)
+
+        # The wicket goes first, so a 2D axis knows its view
+        WICKET_RENDERERS[renderer](self.ax,
+                                   view='front',
+                                   pitch_colour=PITCH_COLOUR,
+                                   marking_colour=MARKING_COLOUR,
+                                   outline_colour=OUTLINE_COLOUR,
+                                   stump_colour=STUMP_COLOUR,
+                                   wicket_colour=WICKET_COLOUR)
+
+        self.surface = mark_data_layer(self.ax.plot_surface(X,
+                                                            Y,
+                                                            np.zeros(X.shape),
+                                                            cmap='Purples',
+                                                            facecolors=self._colours(),
+                                                            linewidth=1,
+                                                            antialiased=False))
+
+        add_title_axis(self.fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=TITLE_COLOUR,
+                       subtitle_colour=SUBTITLE_COLOUR)
+
+    def _colours(self):
+        colours = plt.cm.PuRd(self.density.density())
+        return alpha_fade(colours, self.alpha_thresholds)
+
+    def add(self, x, y, draw=True):
+        """ Adds a delivery, drops the oldest one if the rolling window is full, and refreshes the surface
+
+        ----------
+        x, y: Floats
+            The pitching location
+        draw: Boolean
+            Redraw the figure straight away"""
+
+        if np.isnan(x) or np.isnan(y):
+            return
+
+        self.density.add(x, y)
+        self.recent.append((x, y))
+
+        if self.window is not None and len(self.recent) > self.window:
+            self.density.remove(*self.recent.popleft())
+
+        self.refresh(draw)
+
+    def refresh(self, draw=True):
+        """ Recolours the existing surface faces, and their edges, from the current density """
+
+        colours = self._colours()[self._rows][:, self._cols].reshape(-1, 4)
+
+        # plot_surface gives each face an edge of its own colour, so the edges are recoloured with the faces
+        self.surface.set_facecolor(colours)
+        self.surface.set_edgecolor(colours)
+
+        if draw:
+            self.fig.canvas.draw_idle()
@@ -0,0 +1,185 @@
+"""Ball-by-ball heatmap for live coverage, built on the same zones and styling as pitch_heatmap.
+
+LiveHeatmap keeps per-zone counts and sums, so each delivery is an O(1) update however long the innings, and keeps a
+persistent figure whose zone collection covers the whole grid. A zone becomes visible once it reaches min_balls, and
+only the face colours that changed are rewritten - a single zone normally, every visible zone when the colour
+normalisation (the min or max zone mean) moves.
+
+"""
+
+import numpy as np
+from matplotlib import colors
+import matplotlib.pyplot as plt
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import add_polygons, add_title_axis, mark_data_layer, quad_verts, new_pitch_figure
+from analysis.zones import XMIN, XMAX, XBIN, YMIN, YMAX, YBIN, zone_edges, zone_index
+from plots.pitch_heatmap import (PITCH_COLOUR, WICKET_COLOUR, MARKING_COLOUR, STUMP_COLOUR, OUTLINE_COLOUR,
+                                 TITLE_COLOUR, SUBTITLE_COLOUR, ZONE_ALPHA, ZONE_LINEWIDTH,
+                                 add_zone_legend, zone_legend_labels)
+
+HIDDEN = (0.0, 0.0, 0.0, 0.0)
+
+
+class LiveHeatmap:
+    """ Incrementally updated pitch heatmap.
+
+    ----------
+    title, subtitle_1, subtitle_2, legend_title: Strings
+        As for pitch_heatmap
+    min_balls: An integer
+        The minimum number of balls for a zone to be displayed
+    cmap: Any valid matplotlib named colormap string
+        The colour map used for the heatmap shading
+    measure: string
+        "strike_rate", "economy" or None, as for pitch_heatmap
+    renderer: A string
+        "3d" or "2d", as for pitch_heatmap - see plots.pitch_animation for the frame rate of each
+
+    Co-ordinates passed to add and extend are in plotting orientation, i.e. with the Hawkeye pitchX already flipped.
+    """
+
+    def __init__(self,
+                 title='',
+                 subtitle_1='',
+                 subtitle_2='',
+                 legend_title='',
+                 min_balls=12,
+                 cmap='cool',
+                 measure=None,
+                 renderer='3d'):
+
+        self.min_balls = min_balls
+        self.cmap = plt.get_cmap(cmap)
+        self.measure = measure
+
+        self.x_edges = zone_edges(XMIN, XMAX, XBIN)
+        self.y_edges = zone_edges(YMIN, YMAX, YBIN)
+        ny = len(self.y_edges) - 1
+        n_zones = (len(self.x_edges) - 1) * ny
+
+        self.counts = np.zeros(n_zones, dtype=np.int64)
+        self.sums = np.zeros(n_zones)
+        self.visible = np.zeros(n_zones, dtype=bool)
+        self.balls = 0
+        self.norm = (np.nan, np.nan)
+
+        fp = font_properties()
+
+        self.fig, self.ax = new_pitch_figure(renderer)
+
+        WICKET_RENDERERS[renderer](self.ax,
+                                   view='front',
+                                   pitch_colour=PITCH_COLOUR,
+                                   marking_colour=MARKING_COLOUR,
+                                   outline_colour=OUTLINE_COLOUR,
+                                   stump_colour=STUMP_COLOUR,
+                                   wicket_colour=WICKET_COLOUR)
+
+        # One face per grid zone, all hidden until they reach min_balls. Alpha lives in the per-face colours so hidden
+        # zones can be fully transparent
+        xi, yi = np.divmod(np.arange(n_zones), ny)
+        verts = quad_verts(self.x_edges[xi], self.x_edges[xi + 1], self.y_edges[yi], self.y_edges[yi + 1])
+
+        self._facecolours = np.tile(HIDDEN, (n_zones, 1))
+        self._edgecolours = np.tile(HIDDEN, (n_zones, 1))
+        self._edge_rgba = colors.to_rgba(OUTLINE_COLOUR, ZONE_ALPHA)
+
+        self.zones = mark_data_layer(add_polygons(self.ax,
+                                                  verts,
+                                                  edgecolors=self._edgecolours,
+                                                  facecolors=self._facecolours,
+                                                  linewidths=ZONE_LINEWIDTH,
+                                                  zorder=0))
+
+        self.legend_texts = add_zone_legend(self.ax, np.nan, np.nan, cmap, measure, legend_title, fp, OUTLINE_COLOUR)
+
+        add_title_axis(self.fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=TITLE_COLOUR,
+                       subtitle_colour=SUBTITLE_COLOUR)
+
+    @property
+    def means(self):
+        """ Mean value per zone (flat, x-then-y order), NaN where the zone has no balls """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sums / self.counts
+
+    def add(self, x, y, value, draw=True):
+        """ Adds a single delivery and updates the plot
+
+        ----------
+        x, y: Floats
+            The pitching location
+        value: A float
+            The delivery value, e.g. batterRuns
+        draw: Boolean
+            Redraw the figure straight away
+
+        Returns
+        -------
+        Boolean - True if the plot changed"""
+
+        zone = zone_index(np.array([[x, y]]), self.x_edges, self.y_edges)[0]
+        if zone < 0 or np.isnan(value):
+            return False
+
+        self.counts[zone] += 1
+        self.sums[zone] += value
+        self.balls += 1
+
+        if self.counts[zone] < self.min_balls:
+            return False
+
+        self.visible[zone] = True
+        self._recolour(np.array([zone]))
+
+        if draw:
+            self.redraw()
+        return True
+
+    def extend(self, xy, values, draw=True):
+        """ Adds many deliveries at once, e.g. to catch up with an innings already in progress """
+
+        values = np.asarray(values, dtype=float)
+        zones = zone_index(xy, self.x_edges, self.y_edges)
+        keep = (zones >= 0) & ~np.isnan(values)
+
+        self.counts += np.bincount(zones[keep], minlength=len(self.counts))
+        self.sums += np.bincount(zones[keep], weights=values[keep], minlength=len(self.sums))
+        self.balls += int(keep.sum())
+
+        self.visible = self.counts >= self.min_balls
+        self._recolour(np.flatnonzero(self.visible), force=True)
+
+        if draw:
+            self.redraw()
+
+    def redraw(self):
+        self.fig.canvas.draw_idle()
+
+    def _recolour(self, zones, force=False):
+        visible_means = self.means[self.visible]
+        norm = (visible_means.min(), visible_means.max()) if len(visible_means) else (np.nan, np.nan)
+
+        if force or norm != self.norm:
+            # The normalisation moved, so every visible zone's colour (and the legend) changes
+            self.norm = norm
+            zones = np.flatnonzero(self.visible)
+            for text, label in zip(self.legend_texts, zone_legend_labels(norm[0], norm[1], self.measure)):
+                text.set_text(label)
+
+        mean_min, mean_max = self.norm
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_norm = (self.means[zones] - mean_min) / (mean_max - mean_min)
+
+        face = self.cmap(mean_norm)
+        face[:, 3] = ZONE_ALPHA
+        self._facecolours[zones] = face
+        self._edgecolours[zones] = self._edge_rgba
+
+        self.zones.set_facecolor(self._facecolours)
+        self.zones.set_edgecolor(self._edgecolours)
@@ -6,28 +6,73 @@ function.
 
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import gaussian_kde
-import matplotlib.font_manager as fm
-from pitch_views.wicket_3d import plot_wicket_3d
-from utilities.plotting_utils import add_title_axis
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import add_highlight, add_title_axis, alpha_fade, mark_data_layer, new_pitch_figure
+from utilities.instrumentation import profiled, span
+from analysis.density import BW_METHOD, PITCH_BOUNDS, DENSITY_BACKENDS
+
+
+# Density map styling
+PITCH_COLOUR = 'white'
+WICKET_COLOUR = '#f5f6fa'
+MARKING_COLOUR = 'cornflowerblue'
+STUMP_COLOUR = 'slategray'
+OUTLINE_COLOUR = 'lightsteelblue'
+TITLE_COLOUR = '#080a2e'
+SUBTITLE_COLOUR = '#9e9fa3'
+
+# Luminance -> alpha steps used to fade the low density (near-white) parts of the colour map into the pitch
+ALPHA_THRESHOLDS = ((0.87, 0.25), (0.92, 0))
 
 
 # Helper function to get gaussian kde for plotting - returns X,Y grid and Z density
-def get_density(data):
-    xmin = min(data[:, 0])
-    xmax = max(data[:, 0])
-    ymin = min(data[:, 1])
-    ymax = max(data[:, 1])
+def get_density(data, resolution=100, bounds=None, method='exact', bw_method=BW_METHOD):
+    """ Evaluates a gaussian kde of the pitching locations on a regular grid
 
-    X, Y = np.mgrid[xmin:xmax:100j, ymin:ymax:100j]
-    positions = np.vstack([X.ravel(), Y.ravel()])
+    ----------
+    data: A 2d array
+        The x and y coordinates of the delivery pitching locations
+    resolution: An integer or (integer, integer) tuple
+        The number of grid points in x and y
+    bounds: A (xmin, xmax, ymin, ymax) tuple or "pitch"
+        The grid extent - defaults to the extent of the data. "pitch" uses the fixed analysis.density.PITCH_BOUNDS
+        so maps are comparable across players
+    method: A string
+        The density backend from analysis.density.DENSITY_BACKENDS:
+        "exact" - scipy gaussian_kde at every grid point, the reference
+        "fft" - Binned FFT kde, cost independent of the number of deliveries - use for large samples
+    bw_method: A float, "scott" or "silverman"
+        The kde bandwidth, as for scipy gaussian_kde
 
-    kernel = gaussian_kde(data.T, bw_method=0.30)
-    Z = np.reshape(kernel(positions).T, X.shape)
+    Returns
+    -------
+    X, Y, Z arrays of shape resolution"""
+
+    if bounds is None:
+        bounds = (data[:, 0].min(), data[:, 0].max(), data[:, 1].min(), data[:, 1].max())
+    elif isinstance(bounds, str) and bounds == 'pitch':
+        bounds = PITCH_BOUNDS
+    xmin, xmax, ymin, ymax = bounds
+    x_res, y_res = np.broadcast_to(resolution, 2)
+
+    X, Y = np.mgrid[xmin:xmax:complex(x_res), ymin:ymax:complex(y_res)]
+
+    Z = DENSITY_BACKENDS[method](data, X[:, 0], Y[0, :], bw_method=bw_method)
     return X, Y, Z
 
 
-def pitch_densitymap(xy, title='', subtitle_1='', subtitle_2=''):
+@profiled('pitch_densitymap')
+def pitch_densitymap(xy,
+                     title='',
+                     subtitle_1='',
+                     subtitle_2='',
+                     resolution=100,
+                     bounds=None,
+                     alpha_thresholds=ALPHA_THRESHOLDS,
+                     method='exact',
+                     highlight=None,
+                     renderer='3d'):
 
     """ Plots a heatmap overlaid on wicket_3d front view, using a specified values array for square shading
 
@@ -40,81 +85,87 @@ def pitch_densitymap(xy, title='', subtitle_1='', subtitle_2=''):
         The plot's 1st subtitle
     subtitle_2: A string
         The plot's 2nd subtitle
+    resolution: An integer or (integer, integer) tuple
+        The density grid resolution - raise for print output
+    bounds: A (xmin, xmax, ymin, ymax) tuple or "pitch"
+        The density grid extent - defaults to the extent of the data, "pitch" for a fixed pitch-wide extent
+    alpha_thresholds: A sequence of (luminance, alpha) pairs
+        Fades the low density colours into the pitch, see utilities.plotting_utils.alpha_fade
+    method: A string
+        The density backend - "exact" (default, reference) or "fft" (fast for large samples), see get_density
+    highlight: An array of row indices or a boolean mask into xy
+        Optional deliveries to mark on top of the density, e.g. from an analysis.spatial.SpatialIndex query
+    renderer: A string
+        "3d" (default) or "2d" - a plain 2D axis with the view projected up front in NumPy, see pitch_heatmap
 
     Returns
     -------
     matplotlib.axes.Axes"""
 
     # Define some styling
-    pitch_colour = 'white'
-    wicket_colour = '#f5f6fa'
-    marking_colour = 'cornflowerblue'
-    stump_colour = 'slategray'
-    outline_colour = 'lightsteelblue'
-    title_colour = '#080a2e'
-    subtitle_colour = '#9e9fa3'
-    fname = 'fonts/AlumniSans-SemiBold.ttf'
-    fp = fm.FontProperties(fname=fname)
-
-    X, Y, Z = get_density(xy)
+    pitch_colour = PITCH_COLOUR
+    wicket_colour = WICKET_COLOUR
+    marking_colour = MARKING_COLOUR
+    stump_colour = STUMP_COLOUR
+    outline_colour = OUTLINE_COLOUR
+    title_colour = TITLE_COLOUR
+    subtitle_colour = SUBTITLE_COLOUR
+    fp = font_properties()
+
+    with span('pitch_densitymap.density'):
+        X, Y, Z = get_density(xy, resolution=resolution, bounds=bounds, method=method)
 
     # Plot a 2D KDE plot of the delivery pitch locations on a 3D pitch
 
-    fig = plt.figure()
-    fig.set_size_inches(8, 5)
-    fig.subplots_adjust(left=0,
-                        right=1,
-                        bottom=-0.2,
-                        top=2)  # Get rid of some excess whitespace - adjust to taste
+    with span('pitch_densitymap.figure') as stage:
+        fig, ax = new_pitch_figure(renderer)  # We'll plot on a 3D axis, or its 2D projection
+        stage.watch(fig)
 
-    ax = plt.gca(projection='3d')  # We'll plot on a 3D axis
+    # Generate a cricket pitch on the axis we created - before the surface, so a 2D axis knows its view
+    WICKET_RENDERERS[renderer](ax,
+                               view='front',
+                               pitch_colour=pitch_colour,
+                               marking_colour=marking_colour,
+                               outline_colour=outline_colour,
+                               stump_colour=stump_colour,
+                               wicket_colour=wicket_colour)
 
     # We have data for a 3D surface plot, but we want to plot a 2D surface on the xy plane, so we'll set the Z axis
     # to zeros
     z_axis = np.zeros(X.shape)
 
-    # We will manually set the colours of the surface based on the actual Z data using facecolors argument of
-    # ax.plot_surface
-    colours = plt.cm.PuRd(Z)
-
-    # A trick to apply gradual alpha shading to the surface plot for cleaner looking visual
+    with span('pitch_densitymap.colours'):
+        # We will manually set the colours of the surface based on the actual Z data using facecolors argument of
+        # ax.plot_surface
+        colours = plt.cm.PuRd(Z)
 
-    for i in range(len(colours)):
-        plane = colours[i]
-        for j in range(len(plane)):
-            row = plane[j]
-            if (row[0:3].mean() >= 0.87) & (row[0:3].mean() < 0.92):
-                row[3] = 0.25
-            elif row[0:3].mean() >= 0.92:
-                row[3] = 0
+        # A trick to apply gradual alpha shading to the surface plot for cleaner looking visual
+        alpha_fade(colours, alpha_thresholds)
 
     # Plot the surfaces
-    ax.plot_surface(X,
-                    Y,
-                    z_axis,
-                    cmap='Purples',
-                    facecolors=colours,
-                    linewidth=1,
-                    antialiased=False)
+    with span('pitch_densitymap.surface', ax):
+        mark_data_layer(ax.plot_surface(X,
+                                        Y,
+                                        z_axis,
+                                        cmap='Purples',
+                                        facecolors=colours,
+                                        linewidth=1,
+                                        antialiased=False))
+
+    if highlight is not None:
+        with span('pitch_densitymap.highlight', ax):
+            add_highlight(ax, np.asarray(xy)[highlight])
 
     # Plot the pitch points as a scatter overlaid
     # ax.scatter(xy[:, 0], xy[:, 1], c='blue', edgecolor='black', alpha=0.5, zorder=9)
 
 
     # Add titles and subtitles
-    add_title_axis(fig,
-                   title,
-                   subtitle_1,
-                   subtitle_2,
-                   fp=fp,
-                   title_colour=title_colour,
-                   subtitle_colour=subtitle_colour)
-
-    # Generate a cricket pitch on the axis we created
-    plot_wicket_3d(ax,
-                   view='front',
-                   pitch_colour=pitch_colour,
-                   marking_colour=marking_colour,
-                   outline_colour=outline_colour,
-                   stump_colour=stump_colour,
-                   wicket_colour=wicket_colour)
+    with span('pitch_densitymap.titles', fig):
+        add_title_axis(fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=title_colour,
+                       subtitle_colour=subtitle_colour)
@@ -0,0 +1,202 @@
+"""Small-multiples version of pitch_heatmap - one front-view heatmap per facet (bowler, match, handedness...) in a
+single figure.
+
+All facets are aggregated in one grouped pass over (facet, x zone, y zone) and share one colour normalisation, so the
+same colour means the same value in every panel. Every panel draws the same cached wicket recipe and picks its zones
+from one precomputed set of zone vertices.
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+from pitch_views.wicket_2d import PitchAxes, WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import add_polygons, add_title_axis, mark_data_layer, quad_verts
+from utilities.instrumentation import profiled, span
+from analysis.zones import XMIN, XMAX, XBIN, YMIN, YMAX, YBIN, zone_edges, facet_zone_stats
+from plots.pitch_heatmap import (PITCH_COLOUR, WICKET_COLOUR, MARKING_COLOUR, STUMP_COLOUR, OUTLINE_COLOUR,
+                                 TITLE_COLOUR, SUBTITLE_COLOUR, ZONE_ALPHA, ZONE_LINEWIDTH, LEGEND_YPOS,
+                                 zone_legend_labels)
+
+# Size of each panel and of the title band, in inches - a panel is half the size of a single pitch_heatmap
+PANEL_SIZE = (4, 2.5)
+TITLE_HEIGHT = 1.5
+LEGEND_WIDTH = 1.0
+
+
+def facet_layout(n_facets, ncols):
+    """ Figure size and the 3D axis rect of each panel, in row-major order
+
+    Each rect repeats new_pitch_figure's trick of stretching the axis past the top and bottom of its cell (bottom=-0.2,
+    top=2 of the cell height) to zoom in on the pitch.
+
+    Returns
+    -------
+    ((width, height) in inches, list of [left, bottom, width, height] figure fractions)"""
+
+    ncols = max(1, min(ncols, n_facets))
+    nrows = int(np.ceil(n_facets / ncols))
+    panel_w, panel_h = PANEL_SIZE
+    width = ncols * panel_w + LEGEND_WIDTH
+    height = nrows * panel_h + TITLE_HEIGHT
+
+    rects = []
+    for i in range(n_facets):
+        row, col = divmod(i, ncols)
+        left = (LEGEND_WIDTH + col * panel_w) / width
+        bottom = (nrows - 1 - row) * panel_h / height
+        cell_h = panel_h / height
+        rects.append([left, bottom - 0.2 * cell_h, panel_w / width, 2.2 * cell_h])
+
+    return (width, height), rects
+
+
+def add_facet_legend(fig, rect, mean_min, mean_max, cmap, measure, legend_title, fp, outline_colour):
+    """ Draws the shared colour legend of the facet panels as a column of swatches in a 2D inset axis """
+
+    ax = fig.add_axes(rect)
+    ax.set_axis_off()
+    ax.set_xlim(0, 1)
+    # Inverted, so the swatches run as they do beside the wicket of a front view - the maximum at the top, nearest the
+    # stumps, and the legend title above them
+    ax.set_ylim(12, -2)
+
+    legend_colours = plt.get_cmap(cmap)(LEGEND_YPOS/10)
+    labels = zone_legend_labels(mean_min, mean_max, measure)
+
+    for ypos, label in zip(LEGEND_YPOS, labels):
+        ax.add_patch(Rectangle((0.15, ypos), 0.3, 2,
+                               facecolor=legend_colours[int(ypos/2)],
+                               edgecolor=outline_colour,
+                               alpha=ZONE_ALPHA,
+                               linewidth=ZONE_LINEWIDTH))
+        ax.text(0.6, ypos+1, label, fontproperties=fp, size=12, c=outline_colour, ha='left', va='center')
+
+    ax.text(0.45, -1, legend_title, fontproperties=fp, size=17, c=outline_colour, ha='center', va='center')
+    return ax
+
+
+@profiled('pitch_heatmap_facets')
+def pitch_heatmap_facets(xy,
+                         values,
+                         facets,
+                         labels=None,
+                         ncols=5,
+                         title='',
+                         subtitle_1='',
+                         subtitle_2='',
+                         legend_title='',
+                         min_balls=12,
+                         cmap='cool',
+                         measure=None,
+                         renderer='3d'):
+
+    """ Plots one pitch_heatmap panel per facet in a single figure, with a shared colour scale
+
+    ----------
+    xy: A 2d array
+        The x and y coordinates of the delivery pitching locations
+    values: A 1d array
+        The values which will determine the heatmap zone shading
+    facets: A 1d array
+        The facet key of each delivery e.g. bowlerId - one panel per unique key, in sorted key order
+    labels: A dict
+        Optional panel label for each facet key, defaults to the key itself
+    ncols: An integer
+        Number of panels per row
+    title, subtitle_1, subtitle_2, legend_title: Strings
+        As for pitch_heatmap
+    min_balls: An integer
+        The minimum number of balls for a zone to be displayed in a panel
+    cmap: Any valid matplotlib named colormap string
+        The colour map used for the heatmap shading
+    measure: string
+        "strike_rate", "economy" or None, as for pitch_heatmap
+    renderer: A string
+        "3d" (default) or "2d" - plain 2D panels with the view projected up front in NumPy, see pitch_heatmap
+
+    Returns
+    -------
+    (matplotlib.figure.Figure, list of the panel 3D axes, in facet order)"""
+
+    fp = font_properties()
+
+    x_edges = zone_edges(XMIN, XMAX, XBIN)
+    y_edges = zone_edges(YMIN, YMAX, YBIN)
+
+    with span('pitch_heatmap_facets.aggregate'):
+        stats = facet_zone_stats(xy, values, facets, x_edges, y_edges)
+
+    with span('pitch_heatmap_facets.colours'):
+        shown = stats['count'] >= min_balls
+
+        # One normalisation across every panel
+        shown_means = stats['mean'][shown]
+        mean_min, mean_max = (shown_means.min(), shown_means.max()) if len(shown_means) else (np.nan, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            colours = plt.get_cmap(cmap)((stats['mean'] - mean_min) / (mean_max - mean_min))
+
+        # Vertices of every zone of the grid, in the same x-then-y order as the stats, shared by all panels
+        nx, ny = shown.shape[1:]
+        xi, yi = np.divmod(np.arange(nx * ny), ny)
+        verts = quad_verts(x_edges[xi], x_edges[xi + 1], y_edges[yi], y_edges[yi + 1]).reshape(nx, ny, 4, 3)
+
+    (width, height), rects = facet_layout(len(stats['facets']), ncols)
+
+    with span('pitch_heatmap_facets.figure') as stage:
+        fig = plt.figure(figsize=(width, height))
+        stage.watch(fig)
+
+    projection = PitchAxes.name if renderer == '2d' else '3d'
+
+    axes = []
+    for i, (key, rect) in enumerate(zip(stats['facets'], rects)):
+        ax = fig.add_axes(rect, projection=projection)
+        # Panels overlap vertically (see facet_layout) - only the pitch pane should cover the panel below
+        ax.patch.set_visible(False)
+
+        WICKET_RENDERERS[renderer](ax,
+                                   view='front',
+                                   pitch_colour=PITCH_COLOUR,
+                                   marking_colour=MARKING_COLOUR,
+                                   outline_colour=OUTLINE_COLOUR,
+                                   stump_colour=STUMP_COLOUR,
+                                   wicket_colour=WICKET_COLOUR)
+
+        with span('pitch_heatmap_facets.zones', ax):
+            mark_data_layer(add_polygons(ax,
+                                         verts[shown[i]],
+                                         edgecolors=OUTLINE_COLOUR,
+                                         facecolors=colours[i][shown[i]],
+                                         alpha=ZONE_ALPHA,
+                                         linewidths=ZONE_LINEWIDTH,
+                                         zorder=0))
+
+            label = labels.get(key, key) if labels is not None else key
+            # Panel label at the top left of the cell, beside the stumps - the cell top is 1.2 / 2.2 of the axis height
+            ax.text2D(0.04, 0.54, str(label), transform=ax.transAxes, fontproperties=fp, size=16, c=TITLE_COLOUR,
+                      ha='left', va='top')
+            ax.text2D(0.04, 0.49, '{0} balls'.format(int(stats['count'][i].sum())), transform=ax.transAxes,
+                      fontproperties=fp, size=11, c=SUBTITLE_COLOUR, ha='left', va='top')
+
+        axes.append(ax)
+
+    with span('pitch_heatmap_facets.legend', fig):
+        panels_h = height - TITLE_HEIGHT
+        add_facet_legend(fig,
+                         [0, 0.5 * (panels_h - min(panels_h, 3.5)) / height, LEGEND_WIDTH / width,
+                          min(panels_h, 3.5) / height],
+                         mean_min, mean_max, cmap, measure, legend_title, fp, OUTLINE_COLOUR)
+
+    with span('pitch_heatmap_facets.titles', fig):
+        add_title_axis(fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=TITLE_COLOUR,
+                       subtitle_colour=SUBTITLE_COLOUR,
+                       rect=(0, (height - TITLE_HEIGHT) / height, 1, TITLE_HEIGHT / height))
+
+    return fig, axes
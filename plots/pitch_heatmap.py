@@ -5,22 +5,126 @@ which utilises the front view of the plot_wicket_3d function.
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import matplotlib.font_manager as fm
-import mpl_toolkits.mplot3d.art3d as art3d
-from pitch_views.wicket_3d import plot_wicket_3d
-from utilities.plotting_utils import add_title_axis
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import (add_highlight, add_polygons, add_title_axis, mark_data_layer, quad_verts,
+                                     new_pitch_figure)
+from utilities.instrumentation import profiled, span
+from analysis.zones import XMIN, XMAX, XBIN, YMIN, YMAX, YBIN, zone_edges, zone_stats, populated_zones
+from analysis.bootstrap import CONFIDENCE, zone_bootstrap
 
 
-def pitch_heatmap(xy,
-                  values,
+# Heatmap styling, shared with the other zone templates
+PITCH_COLOUR = 'white'
+WICKET_COLOUR = '#f5f6fa'
+MARKING_COLOUR = '#595959'
+STUMP_COLOUR = 'slategray'
+OUTLINE_COLOUR = '#595959'
+TITLE_COLOUR = '#080a2e'
+SUBTITLE_COLOUR = '#9e9fa3'
+
+# Zone face alpha and edge width
+ZONE_ALPHA = 0.9
+ZONE_LINEWIDTH = 0.5
+
+# Uncertainty overlays - a zone's spread is its confidence interval width as a share of the colour scale. The
+# "opacity" overlay fades zones towards UNCERTAIN_ALPHA as their spread reaches 1, the "hatch" overlay hatches zones
+# whose spread is over UNCERTAIN_SPREAD
+UNCERTAIN_ALPHA = 0.2
+UNCERTAIN_SPREAD = 0.5
+UNCERTAIN_HATCH = '////'
+
+# Legend swatch positions along the pitch, drawn beside the wicket
+LEGEND_YPOS = np.linspace(10,0,6)
+
+
+def zone_legend_labels(mean_min, mean_max, measure=None):
+    """ The legend label strings, in LEGEND_YPOS order, for zone means spanning mean_min to mean_max """
+
+    legend_labels = np.linspace(mean_max, mean_min, 6)
+    if measure == 'strike_rate':
+        legend_labels = legend_labels*100
+    elif measure == 'economy':
+        legend_labels = legend_labels*6
+
+    labels = []
+    for ypos in LEGEND_YPOS:
+        count = int(ypos/2)
+        if measure == 'strike_rate':
+            labels.append(f'{legend_labels[count]*1:.0f}')
+        else:
+            labels.append(f'{legend_labels[count]*1:.1f}')
+    return labels
+
+
+def zone_spread(grouped, mean_min, mean_max):
+    """ Confidence interval width of each zone as a share of the colour scale, mean_min to mean_max - 1 (fully
+    uncertain) where there is no interval or no scale
+
+    ----------
+    grouped: A dict
+        Output of analysis.zones.populated_zones, with "ci_low" and "ci_high"
+
+    Returns
+    -------
+    numpy.ndarray"""
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spread = (grouped['ci_high'] - grouped['ci_low']) / (mean_max - mean_min)
+    return np.where(np.isfinite(spread), spread, 1.0)
+
+
+def add_zone_legend(ax, mean_min, mean_max, cmap, measure, legend_title, fp, outline_colour):
+    """ Draws the heatmap colour legend beside the wicket
+
+    Returns
+    -------
+    list of the label Text artists, in LEGEND_YPOS order, so callers can update them with zone_legend_labels"""
+
+    legend_colours = plt.get_cmap(cmap)(LEGEND_YPOS/10)
+
+    # Legend swatches are a single collection
+    verts = quad_verts(-2.3, -2.6, LEGEND_YPOS, LEGEND_YPOS+2)
+    add_polygons(ax,
+                 verts,
+                 edgecolors=outline_colour,
+                 facecolors=legend_colours[(LEGEND_YPOS/2).astype(int)],
+                 alpha=ZONE_ALPHA,
+                 linewidths=ZONE_LINEWIDTH,
+                 zorder=0)
+
+    texts = []
+    for ypos, label in zip(LEGEND_YPOS, zone_legend_labels(mean_min, mean_max, measure)):
+        texts.append(ax.text(-2.3+0.20, ypos+1, 0, label, fontproperties=fp, size=12, c=outline_colour, ha='center', va='center'))
+
+    ax.text(-2.4,-1,0,legend_title, fontproperties=fp, size=17, c=outline_colour, ha='center', va='center')
+    return texts
+
+
+def add_uncertainty_key(ax, uncertainty, confidence, fp, outline_colour):
+    """ Notes under the colour legend how the uncertainty overlay reads """
+
+    # Spelt out - the title font's percent sign doesn't read well at this size
+    shading = 'Faded' if uncertainty == 'opacity' else 'Hatched'
+    key = f'{shading}: wide {confidence*100:.0f}\npercent interval'
+    ax.text(-2.4, 13, 0, key, fontproperties=fp, size=10, c=outline_colour, ha='center', va='center')
+
+
+@profiled('pitch_heatmap')
+def pitch_heatmap(xy=None,
+                  values=None,
                   title='',
                   subtitle_1='',
                   subtitle_2='',
                   legend_title='',
                   min_balls=12,
                   cmap='cool',
-                  measure=None):
+                  measure=None,
+                  highlight=None,
+                  stats=None,
+                  renderer='3d',
+                  uncertainty=None,
+                  confidence=CONFIDENCE):
 
     """ Plots a heatmap overlaid on wicket_3d front view, using a specified values array for square shading
 
@@ -46,118 +150,119 @@ def pitch_heatmap(xy,
         "strike_rate" - Strike Rate, value multiplied by 100
         "economy" - Economy, value multiplied by 6
         Any other value - No transformation applied
+    highlight: An array of row indices or a boolean mask into xy
+        Optional deliveries to mark on top of the zones, e.g. from an analysis.spatial.SpatialIndex query
+    stats: A dict
+        Precomputed zone statistics laid out as analysis.zones.zone_stats, e.g. from analysis.cube.ZoneCube.zone_stats,
+        plotted instead of aggregating xy and values - which can then be omitted
+    renderer: A string
+        "3d" - draws on an mplot3d axis
+        "2d" - projects the view up front in NumPy and draws on a plain 2D axis, see pitch_views.wicket_2d. Looks the
+        same - saving took 0.050s against 0.070s for a heatmap (1.4x) and 0.061s against 0.175s for a density map
+        (2.9x) when measured
+    uncertainty: A string
+        Optional overlay of each zone's bootstrap confidence interval, see analysis.bootstrap:
+        "opacity" - zones fade as their interval widens relative to the colour scale
+        "hatch" - zones whose interval spans over half the colour scale are hatched
+        Without stats the intervals are bootstrapped from xy and values, otherwise stats needs "ci_low" and "ci_high"
+    confidence: A float
+        Confidence level of the bootstrapped intervals
 
     Returns
     -------
     matplotlib.axes.Axes"""
 
     # Define some styling
-    pitch_colour = 'white'
-    wicket_colour = '#f5f6fa'
-    marking_colour = '#595959'
-    stump_colour = 'slategray'
-    outline_colour = '#595959'
-    title_colour = '#080a2e'
-    subtitle_colour = '#9e9fa3'
-    fname = 'fonts/AlumniSans-SemiBold.ttf'
-    fp = fm.FontProperties(fname=fname)
-
-    # Bin edges
-    XMIN = -1.2
-    XMAX = 1.2
-    XBIN = 0.2
-
-    YMIN = 0
-    YMAX = 15
-    YBIN = 1
-
-    x_edges = np.arange(XMIN, XMAX, XBIN)
-    y_edges = np.arange(YMIN, YMAX, YBIN)
-
-    df = pd.DataFrame(np.column_stack([xy, values]),
-                      columns=['pitchX', 'pitchY', 'values'])
-
-    df['x_binned'] = pd.cut(df.pitchX, x_edges)
-    df['y_binned'] = pd.cut(df.pitchY, y_edges)
-
-    grouped = df.groupby(['x_binned', 'y_binned']).agg(['mean', 'count'])['values'].reset_index()
-    grouped = grouped[grouped['count'] >= min_balls]
-
-    mean_norm = (grouped['mean'] - grouped['mean'].min()) / (grouped['mean'].max() - grouped['mean'].min())
-
-    colours = plt.get_cmap(cmap)(mean_norm)
-
-    grouped['colours'] = [tuple(x) for x in colours.tolist()]
-
-    fig = plt.figure()
-    fig.set_size_inches(8, 5)
-    fig.subplots_adjust(left=0,
-                        right=1,
-                        bottom=-0.2,
-                        top=2)  # Get rid of some excess whitespace - adjust to taste
-
-    ax = plt.gca(projection='3d')
-
-    plot_wicket_3d(ax,
-                   view='front',
-                   pitch_colour=pitch_colour,
-                   marking_colour=marking_colour,
-                   outline_colour=outline_colour,
-                   stump_colour=stump_colour,
-                   wicket_colour=wicket_colour)
-
-    for row in grouped.itertuples():
-        x = [row.x_binned.left,
-             row.x_binned.right,
-             row.x_binned.right,
-             row.x_binned.left]
-        y = [row.y_binned.left,
-             row.y_binned.left,
-             row.y_binned.right,
-             row.y_binned.right]
-        z = [0, 0, 0, 0]
-        verts = [list(zip(x, y, z))]
-        ax.add_collection3d(art3d.Poly3DCollection(verts,
-                                                   edgecolors=outline_colour,
-                                                   facecolors=row.colours,
-                                                   alpha=0.9,
-                                                   linewidths=0.5,
-                                                   zorder=0))
-
-    legend_ypos = np.linspace(10,0,6)
-
-    legend_labels = np.linspace(grouped['mean'].max(), grouped['mean'].min(), 6)
-    if measure == 'strike_rate':
-        legend_labels = legend_labels*100
-    elif measure == 'economy':
-        legend_labels = legend_labels*6
+    pitch_colour = PITCH_COLOUR
+    wicket_colour = WICKET_COLOUR
+    marking_colour = MARKING_COLOUR
+    stump_colour = STUMP_COLOUR
+    outline_colour = OUTLINE_COLOUR
+    title_colour = TITLE_COLOUR
+    subtitle_colour = SUBTITLE_COLOUR
+    fp = font_properties()
 
-    legend_colours = plt.get_cmap(cmap)([y/10 for y in legend_ypos])
-    colour_tuples = [tuple(x) for x in legend_colours.tolist()]
-    for ypos in legend_ypos:
-        x = [-2.3,-2.6,-2.6,-2.3]
-        y = [ypos, ypos, ypos+2, ypos+2]
-        z = [0,0,0,0]
-        count = int(ypos/2)
-        verts = [list(zip(x, y, z))]
-        ax.add_collection3d(art3d.Poly3DCollection(verts,
-                                                   edgecolors=outline_colour,
-                                                   facecolors=colour_tuples[count],
-                                                   alpha=0.9,
-                                                   linewidths=0.5,
-                                                   zorder=0))
+    with span('pitch_heatmap.aggregate'):
+        if stats is None:
+            # Bin edges
+            x_edges = zone_edges(XMIN, XMAX, XBIN)
+            y_edges = zone_edges(YMIN, YMAX, YBIN)
 
-        if measure == 'strike_rate':
-            ax.text(x[0]+0.20, y[0]+1, z[0], f'{legend_labels[count]*1:.0f}', fontproperties=fp, size=12, c=outline_colour, ha='center', va='center')
-        else:
-            ax.text(x[0]+0.20, y[0]+1, z[0], f'{legend_labels[count]*1:.1f}', fontproperties=fp, size=12, c=outline_colour, ha='center', va='center')
+            if uncertainty is None:
+                stats = zone_stats(xy, values, x_edges, y_edges)
+            else:
+                stats = zone_bootstrap(xy, values, x_edges, y_edges, confidence=confidence, min_balls=min_balls)
+        elif uncertainty is not None and 'ci_low' not in stats:
+            raise ValueError('An uncertainty overlay needs stats with ci_low and ci_high, e.g. from '
+                             'analysis.bootstrap.zone_bootstrap')
 
-    ax.text(-2.4,-1,0,legend_title, fontproperties=fp, size=17, c=outline_colour, ha='center', va='center')
+        grouped = populated_zones(stats, min_balls)
+
+    with span('pitch_heatmap.colours'):
+        # No zone may reach min_balls - keep the empty plot (NaN legend) rather than failing on an empty min/max
+        mean_min, mean_max = (grouped['mean'].min(), grouped['mean'].max()) if len(grouped['mean']) else (np.nan, np.nan)
+
+        mean_norm = (grouped['mean'] - mean_min) / (mean_max - mean_min)
+
+        colours = plt.get_cmap(cmap)(mean_norm)
+
+        zone_alpha = ZONE_ALPHA
+        if uncertainty is not None:
+            spread = zone_spread(grouped, mean_min, mean_max)
+            if uncertainty == 'opacity':
+                # Per-zone alpha goes into the face colours
+                colours[:, 3] = ZONE_ALPHA - (ZONE_ALPHA - UNCERTAIN_ALPHA) * np.clip(spread, 0, 1)
+                zone_alpha = None
+            elif uncertainty != 'hatch':
+                raise ValueError('uncertainty must be "opacity" or "hatch", not {0}'.format(uncertainty))
+
+    with span('pitch_heatmap.figure') as stage:
+        fig, ax = new_pitch_figure(renderer)
+        stage.watch(fig)
+
+    WICKET_RENDERERS[renderer](ax,
+                               view='front',
+                               pitch_colour=pitch_colour,
+                               marking_colour=marking_colour,
+                               outline_colour=outline_colour,
+                               stump_colour=stump_colour,
+                               wicket_colour=wicket_colour)
+
+    with span('pitch_heatmap.zones', ax):
+        # All zones go into one collection with per-face colours, so draw cost doesn't grow with the number of artists
+        verts = quad_verts(grouped['x_left'], grouped['x_right'], grouped['y_bottom'], grouped['y_top'])
+        mark_data_layer(add_polygons(ax,
+                                     verts,
+                                     edgecolors=outline_colour,
+                                     facecolors=colours,
+                                     alpha=zone_alpha,
+                                     linewidths=ZONE_LINEWIDTH,
+                                     zorder=0))
+
+    if uncertainty is not None:
+        with span('pitch_heatmap.uncertainty', ax):
+            add_uncertainty_key(ax, uncertainty, confidence, fp, outline_colour)
+            if uncertainty == 'hatch' and (spread > UNCERTAIN_SPREAD).any():
+                mark_data_layer(add_polygons(ax,
+                                             verts[spread > UNCERTAIN_SPREAD],
+                                             facecolors=(0, 0, 0, 0),  # Not 'none' - Poly3DCollection can't sort it
+                                             edgecolors=outline_colour,
+                                             linewidths=0,
+                                             hatch=UNCERTAIN_HATCH,
+                                             zorder=0))
+
+    if highlight is not None:
+        with span('pitch_heatmap.highlight', ax):
+            add_highlight(ax, np.asarray(xy)[highlight])
+
+    with span('pitch_heatmap.legend', ax):
+        add_zone_legend(ax, mean_min, mean_max, cmap, measure, legend_title, fp, outline_colour)
 
-    add_title_axis(fig,
-                   title,
-                   subtitle_1,
-                   subtitle_2,
-                   fp=fp,
-                   title_colour=title_colour,
-                   subtitle_colour=subtitle_colour)
+    with span('pitch_heatmap.titles', fig):
+        add_title_axis(fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=title_colour,
+                       subtitle_colour=subtitle_colour)
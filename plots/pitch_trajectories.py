@@ -0,0 +1,151 @@
+"""Plotting template for the reconstructed 3D paths of many deliveries, drawn on any plot_wicket_3d view - the
+"side" view (the default) shows the whole of each path, from the release to the stumps, square of the wicket.
+
+Every path goes into a single line collection, so thousands of deliveries are one artist for mplot3d to project and
+sort rather than one line each.
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.transforms import Bbox, TransformedBbox
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import add_lines, add_title_axis, mark_data_layer, new_pitch_figure
+from utilities.instrumentation import profiled, span
+from analysis.trajectory import reconstruct_trajectories
+
+# Trajectory styling
+PITCH_COLOUR = 'white'
+WICKET_COLOUR = '#f5f6fa'
+MARKING_COLOUR = 'cornflowerblue'
+STUMP_COLOUR = 'slategray'
+OUTLINE_COLOUR = 'lightsteelblue'
+TITLE_COLOUR = '#080a2e'
+SUBTITLE_COLOUR = '#9e9fa3'
+PATH_COLOUR = '#7a0177'
+PATH_ALPHA = 0.25
+PATH_LINEWIDTH = 0.6
+
+# The pitch map figure stretches its axis well above the figure (see new_pitch_figure), which would put the release
+# end of the paths out of sight on the back and side views - those get an axis that fits the figure instead
+VIEW_MARGINS = {'side': dict(left=0, right=1, bottom=-0.15, top=1.2),
+                'back': dict(left=0, right=1, bottom=0, top=0.85)}
+
+# Figure area the paths are clipped to - everything below the title band of add_title_axis
+PATH_AREA = (0, 0, 1, 0.85)
+
+
+def add_trajectories(ax, paths, values=None, cmap='PuRd', colour=PATH_COLOUR, alpha=PATH_ALPHA,
+                     linewidth=PATH_LINEWIDTH):
+    """ Draws delivery paths on a 3D axis (or PitchAxes) as one line collection
+
+    ----------
+    ax: A 3D axis or PitchAxes
+        e.g. set up with plot_wicket_3d
+    paths: A 3d array
+        (n, points, 3) paths from analysis.trajectory.reconstruct_trajectories - NaN (untracked) paths are skipped
+    values: A 1d array
+        Optional value per delivery (e.g. ballSpeed) to colour the paths by, through cmap
+    cmap: Any valid matplotlib named colormap string
+        Used with values
+    colour: Any valid matplotlib colour
+        The path colour when values is None
+    alpha, linewidth: Floats
+        Path styling
+
+    Returns
+    -------
+    The line collection"""
+
+    paths = np.asarray(paths)
+    drawn = np.isfinite(paths).all(axis=(1, 2))
+
+    if values is not None:
+        values = np.asarray(values, dtype=float)[drawn]
+        vmin, vmax = np.nanmin(values), np.nanmax(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            colours = plt.get_cmap(cmap)((values - vmin) / (vmax - vmin))
+    else:
+        colours = colour
+
+    return mark_data_layer(add_lines(ax, paths[drawn], colors=colours, alpha=alpha, linewidths=linewidth))
+
+
+@profiled('pitch_trajectories')
+def pitch_trajectories(pitch_xy,
+                       stumps_xy,
+                       speed,
+                       title='',
+                       subtitle_1='',
+                       subtitle_2='',
+                       view='side',
+                       colour_by=None,
+                       cmap='PuRd',
+                       points=20,
+                       renderer='3d'):
+
+    """ Plots the reconstructed paths of deliveries on a wicket_3d view
+
+    ----------
+    pitch_xy: A 2d array
+        The x and y coordinates of the delivery pitching locations (pitchX flipped)
+    stumps_xy: A 2d array
+        The x and height coordinates where the deliveries passed the stumps (stumpsX flipped)
+    speed: A 1d array
+        The release speeds in m/s (ballSpeed)
+    title: A string
+        The plot title
+    subtitle_1: A string
+        The plot's 1st subtitle
+    subtitle_2: A string
+        The plot's 2nd subtitle
+    view: Camera angle for plot - either "side", "back", "front", "top" - the release end of the paths is outside the
+        front and top views and is cut off below the titles
+    colour_by: A 1d array
+        Optional value per delivery to colour the paths by, e.g. speed
+    cmap: Any valid matplotlib named colormap string
+        Used with colour_by
+    points: An integer
+        Points per arc of each path, see analysis.trajectory.reconstruct_trajectories
+    renderer: A string
+        "3d" (default) or "2d" - a plain 2D axis with the view projected up front in NumPy, see pitch_heatmap
+
+    Returns
+    -------
+    matplotlib.axes.Axes"""
+
+    fp = font_properties()
+
+    with span('pitch_trajectories.reconstruct'):
+        paths = reconstruct_trajectories(pitch_xy, stumps_xy, speed, points=points)
+
+    with span('pitch_trajectories.figure') as stage:
+        fig, ax = new_pitch_figure(renderer)
+        if view in VIEW_MARGINS:
+            fig.subplots_adjust(**VIEW_MARGINS[view])
+        stage.watch(fig)
+
+    WICKET_RENDERERS[renderer](ax,
+                               view=view,
+                               pitch_colour=PITCH_COLOUR,
+                               marking_colour=MARKING_COLOUR,
+                               outline_colour=OUTLINE_COLOUR,
+                               stump_colour=STUMP_COLOUR,
+                               wicket_colour=WICKET_COLOUR)
+
+    with span('pitch_trajectories.paths', ax):
+        lines = add_trajectories(ax, paths, values=colour_by, cmap=cmap)
+        # Parts of paths outside the view are cut off below the title band rather than drawn through it
+        lines.set_clip_box(TransformedBbox(Bbox.from_bounds(*PATH_AREA), fig.transFigure))
+
+    with span('pitch_trajectories.titles', fig):
+        add_title_axis(fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=TITLE_COLOUR,
+                       subtitle_colour=SUBTITLE_COLOUR)
+
+    return ax
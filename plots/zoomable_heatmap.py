@@ -0,0 +1,166 @@
+"""Pitch heatmap whose zone size can be changed on the fly, served from an analysis.pyramid.ZonePyramid.
+
+The wicket, legend and titles are drawn once, as in pitch_heatmap. Switching level only swaps the zone collection for
+one built from the pyramid's cached level, and relabels the legend - the deliveries are never touched again. With an
+interactive backend the mouse wheel steps through the levels, scrolling up for smaller zones:
+
+    zoomable = ZoomableHeatmap(ZonePyramid.from_deliveries(xy, df['batterRuns']), title='Steve Smith',
+                               legend_title='Strike Rate', measure='strike_rate')
+    zoomable.set_level(0.4, 1.5)
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from utilities.resources import font_properties
+from utilities.plotting_utils import add_polygons, add_title_axis, mark_data_layer, quad_verts, new_pitch_figure
+from analysis.zones import XBIN, YBIN, populated_zones
+from plots.pitch_heatmap import (PITCH_COLOUR, WICKET_COLOUR, MARKING_COLOUR, STUMP_COLOUR, OUTLINE_COLOUR,
+                                 TITLE_COLOUR, SUBTITLE_COLOUR, ZONE_ALPHA, ZONE_LINEWIDTH,
+                                 add_zone_legend, zone_legend_labels)
+
+# Mouse wheel zoom steps, finest first - (xbin, ybin) pairs supported by the default pyramid grid
+ZOOM_LEVELS = ((0.05, 0.25),
+               (0.1, 0.5),
+               (0.2, 1),
+               (0.4, 1.5),
+               (0.6, 3))
+
+
+class ZoomableHeatmap:
+    """ Pitch heatmap with switchable zone size.
+
+    ----------
+    pyramid: An analysis.pyramid.ZonePyramid
+        The zone measures
+    title, subtitle_1, subtitle_2, legend_title: Strings
+        As for pitch_heatmap
+    min_balls: An integer or a dict
+        The minimum number of balls for a zone to be displayed - or a dict of (xbin, ybin) to minimum, for levels
+        needing a different one (smaller zones hold fewer balls), falling back to 12
+    cmap: Any valid matplotlib named colormap string
+        The colour map used for the heatmap shading
+    measure: string
+        "strike_rate", "economy" or None, as for pitch_heatmap
+    stat: A string
+        The zone statistic shaded - "mean" or any other statistic of ZonePyramid.zone_stats e.g. "dot_pct"
+    levels: A sequence of (xbin, ybin)
+        The mouse wheel zoom steps, finest first
+    level: (xbin, ybin)
+        The level shown first
+    renderer: A string
+        "3d" or "2d", as for pitch_heatmap
+    """
+
+    def __init__(self,
+                 pyramid,
+                 title='',
+                 subtitle_1='',
+                 subtitle_2='',
+                 legend_title='',
+                 min_balls=12,
+                 cmap='cool',
+                 measure=None,
+                 stat='mean',
+                 levels=ZOOM_LEVELS,
+                 level=(XBIN, YBIN),
+                 renderer='3d'):
+
+        self.pyramid = pyramid
+        self.min_balls = min_balls
+        self.cmap = plt.get_cmap(cmap)
+        self.measure = measure
+        self.stat = stat
+        self.levels = [tuple(size) for size in levels]
+        self.level = None
+        self.zones = None
+
+        fp = font_properties()
+
+        self.fig, self.ax = new_pitch_figure(renderer)
+
+        WICKET_RENDERERS[renderer](self.ax,
+                                   view='front',
+                                   pitch_colour=PITCH_COLOUR,
+                                   marking_colour=MARKING_COLOUR,
+                                   outline_colour=OUTLINE_COLOUR,
+                                   stump_colour=STUMP_COLOUR,
+                                   wicket_colour=WICKET_COLOUR)
+
+        self.legend_texts = add_zone_legend(self.ax, np.nan, np.nan, cmap, measure, legend_title, fp, OUTLINE_COLOUR)
+
+        add_title_axis(self.fig,
+                       title,
+                       subtitle_1,
+                       subtitle_2,
+                       fp=fp,
+                       title_colour=TITLE_COLOUR,
+                       subtitle_colour=SUBTITLE_COLOUR)
+
+        self.set_level(*level, draw=False)
+        self.fig.canvas.mpl_connect('scroll_event', self._on_scroll)
+
+    def _min_balls(self, xbin, ybin):
+        if isinstance(self.min_balls, dict):
+            return next((minimum for size, minimum in self.min_balls.items() if np.allclose(size, (xbin, ybin))), 12)
+        return self.min_balls
+
+    def set_level(self, xbin, ybin, draw=True):
+        """ Shows the zones of another bin size, see ZonePyramid.bin_sizes
+
+        ----------
+        xbin, ybin: Floats
+            The zone size in metres
+        draw: Boolean
+            Redraw the figure straight away
+
+        Returns
+        -------
+        The zone collection"""
+
+        grouped = populated_zones(self.pyramid.zone_stats(xbin, ybin), self._min_balls(xbin, ybin))
+        shaded = grouped[self.stat]
+
+        mean_min, mean_max = (shaded.min(), shaded.max()) if len(shaded) else (np.nan, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            colours = self.cmap((shaded - mean_min) / (mean_max - mean_min))
+
+        if self.zones is not None:
+            self.zones.remove()
+
+        verts = quad_verts(grouped['x_left'], grouped['x_right'], grouped['y_bottom'], grouped['y_top'])
+        self.zones = mark_data_layer(add_polygons(self.ax,
+                                                  verts,
+                                                  edgecolors=OUTLINE_COLOUR,
+                                                  facecolors=colours,
+                                                  alpha=ZONE_ALPHA,
+                                                  linewidths=ZONE_LINEWIDTH,
+                                                  zorder=0))
+
+        for text, label in zip(self.legend_texts, zone_legend_labels(mean_min, mean_max, self.measure)):
+            text.set_text(label)
+
+        self.level = (xbin, ybin)
+        if draw:
+            self.fig.canvas.draw_idle()
+        return self.zones
+
+    def zoom(self, steps):
+        """ Moves steps along levels - negative for smaller zones, positive for larger ones
+
+        Returns
+        -------
+        The (xbin, ybin) now shown"""
+
+        # The nearest zoom step to the current level, which may have been set outside levels
+        sizes = np.array(self.levels)
+        current = int(np.argmin(np.abs(sizes - self.level).sum(axis=1)))
+        target = int(np.clip(current + steps, 0, len(self.levels) - 1))
+        if self.levels[target] != self.level:
+            self.set_level(*self.levels[target])
+        return self.level
+
+    def _on_scroll(self, event):
+        if event.inaxes is self.ax:
+            self.zoom(-1 if event.button == 'up' else 1)
@@ -0,0 +1,296 @@
+"""Batch rendering of one pitch map per group (bowler, batter, match or handedness) of a delivery file.
+
+The deliveries are loaded and split into groups once in the parent process, then each group is rendered by a pool of
+worker processes on the headless Agg backend. Every figure is closed as soon as it is saved, so worker memory stays
+bounded however many plots are produced.
+
+Usage, from the repository root:
+
+    python -m reports.batch_render data/ssmith_ashes_2019.csv --by bowlerId --template heatmap --out renders/
+
+The delivery file can be a Hawkeye CSV or a delivery store directory written by utilities.delivery_store.
+
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utilities.output_profiles import PROFILES
+
+# Grouping key: (source column, column holding a readable name for titles)
+GROUP_KEYS = {'bowlerId': ('bowlerId', 'bowler'),
+              'batterId': ('batterId', 'batter'),
+              'matchId': ('matchId', None),
+              'handedness': ('rightHandedBat', None)}
+
+TEMPLATES = ('heatmap', 'density')
+
+# savefig resolution when neither a dpi nor a profile is given
+DEFAULT_DPI = 100
+
+
+def load_deliveries(path, columns):
+    """ Loads the tracked deliveries of a Hawkeye CSV or delivery store, with pitchX already flipped for plotting
+
+    ----------
+    path: A string
+        A Hawkeye CSV file or a delivery store directory
+    columns: A list of strings
+        The columns to load in addition to pitchX and pitchY
+
+    Returns
+    -------
+    dict of column name to 1d numpy array, tracked deliveries only"""
+
+    from utilities.delivery_query import DeliveryQuery
+
+    return DeliveryQuery(path).select('pitchX', 'pitchY', *columns).collect()
+
+
+def split_groups(deliveries, by):
+    """ Splits the deliveries by a grouping key with a single stable sort
+
+    ----------
+    deliveries: A dict
+        Output of load_deliveries
+    by: A string
+        One of GROUP_KEYS
+
+    Returns
+    -------
+    list of (key value, label, row indices) tuples"""
+
+    key_col, name_col = GROUP_KEYS[by]
+    keys = deliveries[key_col]
+
+    order = np.argsort(keys, kind='stable')
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    bounds = np.append(starts, len(keys))
+
+    groups = []
+    for i, key in enumerate(unique_keys):
+        rows = order[bounds[i]:bounds[i + 1]]
+
+        if by == 'handedness':
+            label = 'Right-handers' if key else 'Left-handers'
+        elif name_col is not None:
+            label = str(deliveries[name_col][rows[0]])
+        else:
+            label = '{0} {1}'.format(by[:-2].capitalize(), key)
+
+        groups.append((key, label, rows))
+
+    return groups
+
+
+def _init_worker():
+    # Each worker renders headless - set before pyplot is first imported in the process
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_group(task):
+    """ Renders and saves a single group's plot in a worker process, returning (path, seconds, error) - a failing
+    group is reported rather than stopping the batch """
+
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    error = None
+
+    try:
+        if task['template'] == 'heatmap':
+            from plots.pitch_heatmap import pitch_heatmap
+            pitch_heatmap(task['xy'], task['values'], **task['kwargs'])
+        else:
+            from plots.pitch_densitymap import pitch_densitymap
+            pitch_densitymap(task['xy'], **task['kwargs'])
+
+        if task.get('profile'):
+            from utilities.output_profiles import save_figure
+            save_figure(plt.gcf(), task['path'], task['profile'], dpi=task['dpi'])
+        else:
+            plt.gcf().savefig(task['path'], dpi=DEFAULT_DPI if task['dpi'] is None else task['dpi'])
+    except Exception as e:
+        error = '{0}: {1}'.format(type(e).__name__, e)
+    finally:
+        plt.close('all')  # Free the figures straight away, pyplot would otherwise keep every figure alive
+
+    return task['path'], time.perf_counter() - start, error
+
+
+def _safe_filename(value):
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(value))
+
+
+def build_tasks(deliveries, groups, by, template, out_dir, fmt='png', dpi=None, min_deliveries=20,
+                legend_title='Strike Rate', measure='strike_rate', density_method='exact', profile=None):
+
+    """ Builds one render task per group with at least min_deliveries tracked deliveries """
+
+    tasks = []
+    xy_all = np.column_stack([deliveries['pitchX'], deliveries['pitchY']]).astype(float)
+
+    for key, label, rows in groups:
+        if len(rows) < min_deliveries:
+            continue
+
+        kwargs = dict(title=label,
+                      subtitle_1='Grouped by {0}'.format(by),
+                      subtitle_2='From {0} balls with tracking enabled'.format(len(rows)))
+
+        task = dict(template=template,
+                    xy=xy_all[rows],
+                    path=os.path.join(out_dir, '{0}_{1}.{2}'.format(by, _safe_filename(key), fmt)),
+                    dpi=dpi,
+                    profile=profile,
+                    kwargs=kwargs)
+
+        if template == 'heatmap':
+            task['values'] = deliveries['values'][rows]
+            kwargs.update(legend_title=legend_title, measure=measure)
+        else:
+            kwargs.update(method=density_method)
+
+        tasks.append(task)
+
+    return tasks
+
+
+def render_batch(path,
+                 by='bowlerId',
+                 template='heatmap',
+                 out_dir='renders',
+                 value='batterRuns',
+                 workers=None,
+                 fmt='png',
+                 dpi=None,
+                 min_deliveries=20,
+                 legend_title='Strike Rate',
+                 measure='strike_rate',
+                 density_method='exact',
+                 profile=None,
+                 verbose=True):
+
+    """ Renders a pitch map for every group of a delivery file in a process pool
+
+    ----------
+    path: A string
+        A Hawkeye CSV file or a delivery store directory
+    by: A string
+        The grouping key - "bowlerId", "batterId", "matchId" or "handedness"
+    template: A string
+        "heatmap" (pitch_heatmap) or "density" (pitch_densitymap)
+    out_dir: A string
+        Directory the figures are written to, created if needed
+    value: A string
+        The delivery column used as the heatmap values
+    workers: An integer
+        Number of worker processes - defaults to the number of CPUs
+    fmt: A string
+        Any savefig format e.g. "png", "svg", "pdf"
+    dpi: An integer
+        Output resolution - None for the profile's resolution, or DEFAULT_DPI without a profile
+    min_deliveries: An integer
+        Groups with fewer tracked deliveries are skipped
+    legend_title, measure: Strings
+        Passed to pitch_heatmap
+    density_method: A string
+        Passed to pitch_densitymap - "fft" is much faster for large groups
+    profile: A string
+        An utilities.output_profiles profile e.g. "web" - sets the format and rasterizes the data layers as the
+        profile does, instead of fmt
+    verbose: Boolean
+        Print progress and the throughput summary
+
+    Returns
+    -------
+    dict with the rendered paths, failed paths and errors, skipped group count, wall time and plots per second"""
+
+    if by not in GROUP_KEYS:
+        raise ValueError('by must be one of {0}'.format(', '.join(GROUP_KEYS)))
+    if template not in TEMPLATES:
+        raise ValueError('template must be one of {0}'.format(', '.join(TEMPLATES)))
+    if profile is not None:
+        fmt = PROFILES[profile]['format']
+
+    start = time.perf_counter()
+
+    key_col, name_col = GROUP_KEYS[by]
+    columns = [key_col] + ([name_col] if name_col else []) + ([value] if template == 'heatmap' else [])
+    deliveries = load_deliveries(path, columns)
+    if template == 'heatmap':
+        deliveries['values'] = deliveries[value]
+
+    groups = split_groups(deliveries, by)
+    tasks = build_tasks(deliveries, groups, by, template, out_dir, fmt=fmt, dpi=dpi, min_deliveries=min_deliveries,
+                        legend_title=legend_title, measure=measure, density_method=density_method, profile=profile)
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    paths = []
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for path_out, seconds, error in pool.map(render_group, tasks):
+            if error is None:
+                paths.append(path_out)
+            else:
+                failed[path_out] = error
+            if verbose:
+                print('{0} ({1:.2f}s){2}'.format(path_out, seconds, ' FAILED ' + error if error else ''))
+
+    elapsed = time.perf_counter() - start
+    summary = {'paths': paths,
+               'failed': failed,
+               'skipped': len(groups) - len(tasks),
+               'seconds': elapsed,
+               'plots_per_second': len(paths) / elapsed if elapsed > 0 else 0.0}
+
+    if verbose:
+        print('Rendered {0} plots in {1:.2f}s - {2:.2f} plots/s ({3} failed, {4} groups skipped with fewer than {5} '
+              'deliveries)'.format(len(paths), elapsed, summary['plots_per_second'], len(failed), summary['skipped'],
+                                   min_deliveries))
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render a pitch map for every group of a delivery file')
+    parser.add_argument('path', help='Hawkeye CSV file or delivery store directory')
+    parser.add_argument('--by', default='bowlerId', choices=list(GROUP_KEYS))
+    parser.add_argument('--template', default='heatmap', choices=TEMPLATES)
+    parser.add_argument('--out', default='renders', help='Output directory')
+    parser.add_argument('--value', default='batterRuns', help='Heatmap value column')
+    parser.add_argument('--measure', default='strike_rate', help='Heatmap measure, see pitch_heatmap')
+    parser.add_argument('--legend-title', default='Strike Rate')
+    parser.add_argument('--density-method', default='exact', choices=['exact', 'fft'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--format', default='png')
+    parser.add_argument('--dpi', type=int, default=None,
+                        help='Output resolution - defaults to the profile\'s, or {0} without one'.format(DEFAULT_DPI))
+    parser.add_argument('--profile', default=None, choices=list(PROFILES),
+                        help='Output profile, see utilities.output_profiles - overrides --format')
+    parser.add_argument('--min-deliveries', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    render_batch(args.path,
+                 by=args.by,
+                 template=args.template,
+                 out_dir=args.out,
+                 value=args.value,
+                 workers=args.workers,
+                 fmt=args.format,
+                 dpi=args.dpi,
+                 min_deliveries=args.min_deliveries,
+                 legend_title=args.legend_title,
+                 measure=args.measure,
+                 density_method=args.density_method,
+                 profile=args.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,539 @@
+"""Local HTTP service rendering pitch_heatmap and pitch_densitymap images, with an LRU cache of the results.
+
+Each request is a query - the data source, filters, template and style parameters. The query is put in a canonical
+form (defaults filled in, keys and filter values sorted) and hashed together with the data version (the modification
+time and size of the CSV or store), so:
+
+    repeat requests for the same image are served from memory in milliseconds
+    identical requests arriving while the image renders wait for that one render rather than starting their own
+    editing the data file changes the version, so stale images are never served
+
+Cache misses are rendered in a pool of worker processes on the headless Agg backend, off the event loop, and each
+worker keeps its most recently loaded delivery files. The cache is bounded by the total size of the stored images and
+evicts the least recently used first. The service only needs the standard library on top of the plotting
+requirements. From the repository root:
+
+    python -m reports.render_service --data data --port 8050
+
+    GET  /render?source=ssmith_ashes_2019.csv&template=heatmap&measure=strike_rate&where.bowlerId=4321&format=svg
+    GET  /render?source=ssmith_ashes_2019.csv&template=density&profile=web
+    POST /render                  the same query as a JSON object, filters under "where"
+    GET  /metrics                 cache hits, misses, evictions and latency percentiles as JSON
+
+Sources are paths under the --data directory, Hawkeye CSVs or delivery store directories (see
+utilities.delivery_store).
+
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import matplotlib
+
+from analysis.density import DENSITY_BACKENDS
+from pitch_views.wicket_2d import WICKET_RENDERERS
+from reports.batch_render import _init_worker, load_deliveries
+from utilities.output_profiles import PROFILES, save_figure
+
+TEMPLATES = ('heatmap', 'density')
+
+# Style parameters accepted per template, with their types and defaults - anything else is rejected, so arbitrary
+# keyword arguments never reach the templates and equivalent queries hash the same
+COMMON_PARAMS = {'title': (str, ''),
+                 'subtitle_1': (str, ''),
+                 'subtitle_2': (str, ''),
+                 'renderer': (str, '3d')}
+
+TEMPLATE_PARAMS = {'heatmap': {'value': (str, 'batterRuns'),
+                               'legend_title': (str, ''),
+                               'min_balls': (int, 12),
+                               'cmap': (str, 'cool'),
+                               'measure': (str, ''),
+                               'uncertainty': (str, '')},
+                   'density': {'resolution': (int, 100),
+                               'bounds': (str, ''),
+                               'method': (str, 'exact')}}
+
+# Parameters whose empty string default stands for None, so every parameter has a JSON type in the canonical query
+NULLABLE_PARAMS = ('measure', 'uncertainty', 'bounds')
+
+# Allowed values of the enumerated style parameters - cmap is checked against the registered matplotlib colormaps
+PARAM_CHOICES = {'renderer': tuple(WICKET_RENDERERS),
+                 'measure': ('', 'strike_rate', 'economy'),
+                 'uncertainty': ('', 'opacity', 'hatch'),
+                 'bounds': ('', 'pitch'),
+                 'method': tuple(DENSITY_BACKENDS)}
+
+FORMATS = {'png': 'image/png',
+           'svg': 'image/svg+xml',
+           'pdf': 'application/pdf'}
+
+DPI_RANGE = (50, 300)
+
+# The density grid is resolution x resolution, so its cost grows with the square
+RESOLUTION_RANGE = (10, 400)
+
+# Default cache size and the number of latencies kept for the percentiles
+CACHE_BYTES = 64 * 2 ** 20
+LATENCY_WINDOW = 1000
+
+# Largest request head or body accepted
+MAX_REQUEST_BYTES = 64 * 2 ** 10
+
+
+class QueryError(ValueError):
+    """ A query the service can't render - reported to the client as a 400 """
+
+
+def canonical_query(params):
+    """ Validates a query and puts it in canonical form - every parameter present, typed and defaulted, filter values
+    as sorted lists of strings
+
+    ----------
+    params: A dict
+        Query parameters, e.g. from a query string or JSON body - filters under "where" as a dict of column to value
+        or list of values, or as "where.<column>" keys with comma separated values
+
+    Returns
+    -------
+    dict"""
+
+    params = dict(params)
+    template = params.pop('template', 'heatmap')
+    if template not in TEMPLATES:
+        raise QueryError('template must be one of {0}'.format(', '.join(TEMPLATES)))
+
+    source = params.pop('source', None)
+    if not source:
+        raise QueryError('A source is required')
+
+    # An output profile sets the format and default resolution, and rasterizes the data layers
+    profile = params.pop('profile', '')
+    if profile and profile not in PROFILES:
+        raise QueryError('profile must be one of {0}'.format(', '.join(PROFILES)))
+
+    fmt = params.pop('format', 'png')
+    fmt = PROFILES[profile]['format'] if profile else fmt
+    if fmt not in FORMATS:
+        raise QueryError('format must be one of {0}'.format(', '.join(FORMATS)))
+
+    try:
+        dpi = int(params.pop('dpi', PROFILES[profile]['dpi'] if profile else 100))
+    except ValueError:
+        raise QueryError('dpi must be an integer')
+    dpi = int(np.clip(dpi, *DPI_RANGE))
+
+    where = params.pop('where', {})
+    if not isinstance(where, dict):
+        raise QueryError('where must map column names to values')
+    where = dict(where)
+    for name in [name for name in params if name.startswith('where.')]:
+        value = params.pop(name)
+        where[name[len('where.'):]] = value if isinstance(value, list) else str(value).split(',')
+
+    filters = {}
+    for column, wanted in where.items():
+        wanted = wanted if isinstance(wanted, list) else [wanted]
+        filters[str(column)] = sorted({str(value) for value in wanted})
+
+    style = {}
+    for name, (kind, default) in {**COMMON_PARAMS, **TEMPLATE_PARAMS[template]}.items():
+        value = params.pop(name, default)
+        try:
+            style[name] = kind(value)
+        except (TypeError, ValueError):
+            raise QueryError('{0} must be of type {1}'.format(name, kind.__name__))
+
+        if name in PARAM_CHOICES and style[name] not in PARAM_CHOICES[name]:
+            choices = ', '.join(choice or '(empty)' for choice in PARAM_CHOICES[name])
+            raise QueryError('{0} must be one of {1}'.format(name, choices))
+
+    if 'cmap' in style and style['cmap'] not in matplotlib.colormaps:
+        raise QueryError('cmap must be a matplotlib colormap name')
+    if 'resolution' in style:
+        style['resolution'] = int(np.clip(style['resolution'], *RESOLUTION_RANGE))
+
+    if params:
+        raise QueryError('Unknown parameters: {0}'.format(', '.join(sorted(params))))
+
+    return {'source': os.path.normpath(str(source)),
+            'template': template,
+            'profile': profile,
+            'format': fmt,
+            'dpi': dpi,
+            'where': filters,
+            'style': style}
+
+
+def query_key(query, version):
+    """ Cache key of a canonical query and data version - a sha256 hex digest """
+
+    text = json.dumps({'query': query, 'version': version}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def data_version(path):
+    """ Version of a delivery file - (modification time in ns, size) of a CSV, or of a store's meta.json """
+
+    if os.path.isdir(path):
+        path = os.path.join(path, 'meta.json')
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _filter_mask(column, wanted):
+    # Rows whose value is one of the wanted strings, compared in the column's own type
+    column = np.asarray(column)
+    if column.dtype == bool:
+        wanted = [value.lower() in ('1', 'true', 'yes') for value in wanted]
+    elif np.issubdtype(column.dtype, np.number):
+        try:
+            wanted = [float(value) for value in wanted]
+        except ValueError:
+            raise QueryError('Filter values for a numeric column must be numbers')
+    else:
+        column = column.astype(str)
+    return np.isin(column, wanted)
+
+
+@lru_cache(maxsize=4)
+def _cached_deliveries(path, version, columns):
+    # Per worker process - the version is part of the key, so a changed file is loaded again
+    return load_deliveries(path, list(columns))
+
+
+def render_query(path, version, query):
+    """ Renders a canonical query in a worker process
+
+    Returns
+    -------
+    bytes of the PNG or SVG image"""
+
+    import io
+    import matplotlib.pyplot as plt
+
+    style = dict(query['style'])
+    value = style.pop('value', None)
+    columns = tuple(sorted(set(query['where']) | ({value} if value else set())))
+
+    try:
+        deliveries = _cached_deliveries(path, tuple(version), columns)
+    except KeyError as e:
+        raise QueryError('Unknown column {0}'.format(e))
+
+    keep = np.ones(len(deliveries['pitchX']), dtype=bool)
+    for column, wanted in query['where'].items():
+        keep &= _filter_mask(deliveries[column], wanted)
+
+    xy = np.column_stack([deliveries['pitchX'], deliveries['pitchY']]).astype(float)[keep]
+    if not len(xy):
+        raise QueryError('No tracked deliveries match the filters')
+
+    for name in NULLABLE_PARAMS:
+        if style.get(name) == '':
+            style[name] = None
+
+    try:
+        if query['template'] == 'heatmap':
+            from plots.pitch_heatmap import pitch_heatmap
+            pitch_heatmap(xy, np.asarray(deliveries[value], dtype=float)[keep], **style)
+        else:
+            from plots.pitch_densitymap import pitch_densitymap
+            pitch_densitymap(xy, **style)
+
+        image = io.BytesIO()
+        if query['profile']:
+            save_figure(plt.gcf(), image, query['profile'], dpi=query['dpi'])
+        else:
+            plt.gcf().savefig(image, format=query['format'], dpi=query['dpi'])
+    finally:
+        plt.close('all')
+
+    return image.getvalue()
+
+
+class RenderCache:
+    """ Least recently used cache of rendered images, bounded by their total size
+
+    ----------
+    max_bytes: An integer
+        Total image bytes kept - the least recently used images are evicted beyond it
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._images = OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def get(self, key):
+        """ The cached image, most recently used from now on, or None """
+
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        """ Stores an image, evicting the least recently used ones to stay within max_bytes. Images bigger than the
+        whole cache are not stored """
+
+        if len(image) > self.max_bytes:
+            return
+        if key in self._images:
+            self.bytes -= len(self._images.pop(key))
+
+        self._images[key] = image
+        self.bytes += len(image)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+
+class RenderService:
+    """ Renders queries in a process pool, through a RenderCache, and keeps the service metrics
+
+    ----------
+    data_root: A string
+        The directory sources are resolved in - sources outside it are rejected
+    workers: An integer
+        Worker processes - defaults to the number of CPUs
+    cache_bytes: An integer
+        Size bound of the image cache
+    """
+
+    def __init__(self, data_root, workers=None, cache_bytes=CACHE_BYTES):
+        self.data_root = os.path.realpath(data_root)
+        self.cache = RenderCache(cache_bytes)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self._rendering = {}
+
+        self.counts = {'requests': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+        self.latency = {'hit': deque(maxlen=LATENCY_WINDOW),
+                        'miss': deque(maxlen=LATENCY_WINDOW),
+                        'render': deque(maxlen=LATENCY_WINDOW)}
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def resolve(self, source):
+        """ Full path of a source, which must exist under data_root """
+
+        path = os.path.realpath(os.path.join(self.data_root, source))
+        if os.path.commonpath([path, self.data_root]) != self.data_root or not os.path.exists(path):
+            raise QueryError('Unknown source {0}'.format(source))
+        return path
+
+    async def render(self, params):
+        """ The image of a query, from the cache or rendered in the pool
+
+        Returns
+        -------
+        (bytes, content type, cache key, "HIT" or "MISS")"""
+
+        start = time.perf_counter()
+        self.counts['requests'] += 1
+        query = canonical_query(params)
+        path = self.resolve(query['source'])
+        version = data_version(path)
+        key = query_key(query, version)
+
+        image = self.cache.get(key)
+        if image is not None:
+            self.counts['hits'] += 1
+            self.latency['hit'].append(time.perf_counter() - start)
+            return image, FORMATS[query['format']], key, 'HIT'
+
+        self.counts['misses'] += 1
+        if key in self._rendering:
+            # Already rendering - share that render
+            self.counts['coalesced'] += 1
+            image = await asyncio.shield(self._rendering[key])
+        else:
+            future = asyncio.get_running_loop().run_in_executor(self.pool, render_query, path, version, query)
+            self._rendering[key] = future
+            render_start = time.perf_counter()
+            try:
+                image = await future
+            finally:
+                del self._rendering[key]
+            self.latency['render'].append(time.perf_counter() - render_start)
+            self.cache.put(key, image)
+
+        self.latency['miss'].append(time.perf_counter() - start)
+        return image, FORMATS[query['format']], key, 'MISS'
+
+    def metrics(self):
+        """ Request counts, cache state and latency percentiles in milliseconds
+
+        Returns
+        -------
+        dict"""
+
+        lookups = self.counts['hits'] + self.counts['misses']
+        metrics = dict(self.counts,
+                       hit_rate=self.counts['hits'] / lookups if lookups else None,
+                       cache_entries=len(self.cache),
+                       cache_bytes=self.cache.bytes,
+                       cache_max_bytes=self.cache.max_bytes,
+                       evictions=self.cache.evictions)
+
+        for name, seconds in self.latency.items():
+            if seconds:
+                p50, p95, p99 = np.percentile(np.array(seconds) * 1000, [50, 95, 99])
+                metrics[name + '_ms'] = {'p50': p50, 'p95': p95, 'p99': p99, 'samples': len(seconds)}
+            else:
+                metrics[name + '_ms'] = None
+        return metrics
+
+
+async def _read_request(reader):
+    # (method, target, headers, body) of the next request on the connection, None once the client has closed it
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > MAX_REQUEST_BYTES:
+        raise QueryError('Request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def _response(status, body, content_type='application/json', headers=None, keep_alive=True):
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+    lines = ['HTTP/1.1 {0} {1}'.format(status, reasons[status]),
+             'Content-Type: {0}'.format(content_type),
+             'Content-Length: {0}'.format(len(body)),
+             'Connection: {0}'.format('keep-alive' if keep_alive else 'close')]
+    lines += ['{0}: {1}'.format(name, value) for name, value in (headers or {}).items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def _json(payload):
+    return json.dumps(payload, indent=1).encode('utf-8')
+
+
+async def _handle(service, method, target, body):
+    # (status, body, content type, extra headers) of one request
+    url = urlsplit(target)
+
+    if url.path == '/metrics':
+        return 200, _json(service.metrics()), 'application/json', {}
+
+    if url.path != '/render':
+        return 404, _json({'error': 'Not found'}), 'application/json', {}
+
+    if method == 'GET':
+        params = dict(parse_qsl(url.query))
+    elif method == 'POST':
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError:
+            raise QueryError('The body must be a JSON object')
+        if not isinstance(params, dict):
+            raise QueryError('The body must be a JSON object')
+    else:
+        return 405, _json({'error': 'Use GET or POST'}), 'application/json', {}
+
+    image, content_type, key, cache = await service.render(params)
+    return 200, image, content_type, {'ETag': '"{0}"'.format(key), 'X-Cache': cache}
+
+
+async def _serve_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (QueryError, ValueError, asyncio.LimitOverrunError) as e:
+                writer.write(_response(400, _json({'error': str(e) or 'Malformed request'}), keep_alive=False))
+                break
+            if request is None:
+                break
+
+            method, target, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            try:
+                status, payload, content_type, extra = await _handle(service, method, target, body)
+            except QueryError as e:
+                service.counts['errors'] += 1
+                status, payload, content_type, extra = 400, _json({'error': str(e)}), 'application/json', {}
+            except Exception as e:
+                service.counts['errors'] += 1
+                status, payload, content_type, extra = (500, _json({'error': '{0}: {1}'.format(type(e).__name__, e)}),
+                                                        'application/json', {})
+
+            writer.write(_response(status, payload, content_type, extra, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(data_root, host='127.0.0.1', port=8050, workers=None, cache_bytes=CACHE_BYTES):
+    """ Runs the service until cancelled
+
+    ----------
+    data_root: A string
+        The directory sources are resolved in
+    host, port:
+        The address to listen on - localhost by default
+    workers: An integer
+        Worker processes - defaults to the number of CPUs
+    cache_bytes: An integer
+        Size bound of the image cache"""
+
+    service = RenderService(data_root, workers=workers, cache_bytes=cache_bytes)
+    server = await asyncio.start_server(lambda reader, writer: _serve_connection(service, reader, writer), host, port,
+                                        limit=MAX_REQUEST_BYTES)
+    print('Rendering pitch maps from {0} on http://{1}:{2}'.format(service.data_root, host, port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve rendered pitch maps over HTTP, with an LRU image cache')
+    parser.add_argument('--data', default='data', help='Directory of Hawkeye CSVs and delivery stores')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-mb', type=float, default=CACHE_BYTES / 2 ** 20, help='Image cache size in MB')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.data, args.host, args.port, args.workers, int(args.cache_mb * 2 ** 20)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Fixed-memory GIF writer for matplotlib animations.
+
+matplotlib's PillowWriter keeps every frame in memory until the animation is finished, which for a 300 ball innings
+is hundreds of megabytes of RGBA frames. StreamingGifWriter writes each frame to the file as it is grabbed, so memory
+stays at a single frame however long the animation:
+
+    each frame is rendered into one reused buffer, the area that changed since the previous frame is cropped out,
+    quantized to its own 256 colour palette with Pillow and appended to the file as a GIF image block
+
+Unchanged pixels are kept from the previous frame by the GIF disposal method, so frames where only a marker moved are
+small. The writer is registered with matplotlib as "streaming_gif":
+
+    writer = matplotlib.animation.writers['streaming_gif'](fps=10)
+
+MP4 (and GIF, if preferred) can be written with matplotlib's "ffmpeg" writer, which also streams frames - to an ffmpeg
+process - when ffmpeg is installed.
+
+"""
+
+import io
+import struct
+
+import numpy as np
+from matplotlib import animation
+
+# GIF disposal method 1 - leave the frame in place, the next one is drawn over it
+DISPOSAL_KEEP = 1
+
+
+def _gif_blocks(data):
+    # The image block of a single frame GIF written by Pillow - (image descriptor, colour table, image data), with the
+    # global colour table Pillow writes returned as the frame's colour table
+    flags = data[10]
+    offset = 13
+    table = b''
+    if flags & 0x80:
+        table_size = 3 * 2 ** ((flags & 0x07) + 1)
+        table = data[offset:offset + table_size]
+        offset += table_size
+    table_bits = flags & 0x07
+
+    # Skip any extension blocks before the image
+    while data[offset] == 0x21:
+        offset += 2
+        while data[offset]:
+            offset += data[offset] + 1
+        offset += 1
+
+    descriptor = bytearray(data[offset:offset + 10])
+    offset += 10
+    if descriptor[9] & 0x80:
+        # The frame already has a local colour table
+        local_size = 3 * 2 ** ((descriptor[9] & 0x07) + 1)
+        table = data[offset:offset + local_size]
+        offset += local_size
+    elif table:
+        descriptor[9] |= 0x80 | table_bits
+
+    # LZW minimum code size, then data sub-blocks up to the zero length terminator
+    start = offset
+    offset += 1
+    while data[offset]:
+        offset += data[offset] + 1
+    return bytes(descriptor), table, data[start:offset + 1]
+
+
+class StreamingGifWriter(animation.AbstractMovieWriter):
+    """ Writes an animated GIF frame by frame, in fixed memory
+
+    ----------
+    fps: A float
+        Frames per second - GIF frame durations are whole hundredths of a second
+    loop: An integer
+        Number of times the animation plays, 0 for forever
+    colours: An integer
+        Palette size of each frame, up to 256
+    quantize: A string
+        Pillow's palette method - "fastoctree" (default, several times faster) or "mediancut" (closest colours)
+    """
+
+    def __init__(self, fps=5, loop=0, colours=256, quantize='fastoctree', metadata=None, codec=None, bitrate=None):
+        super().__init__(fps=fps, metadata=metadata, codec=codec, bitrate=bitrate)
+        self.loop = loop
+        self.colours = colours
+        self.quantize = quantize
+
+    @classmethod
+    def isAvailable(cls):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi=dpi)
+        self._file = open(outfile, 'wb')
+        self._buffer = io.BytesIO()
+        self._previous = None
+        self.frames = 0
+        self.bytes = 0
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes += len(data)
+
+    def _write_header(self, width, height):
+        # GIF89a, logical screen without a global colour table, then the looping extension
+        self._write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0x70, 0, 0))
+        self._write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', self.loop) + b'\x00')
+
+    def grab_frame(self, **savefig_kwargs):
+        from PIL import Image
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self.fig.savefig(self._buffer, **{**savefig_kwargs, 'format': 'rgba', 'dpi': self.dpi})
+        width, height = self.frame_size
+        rgb = np.frombuffer(self._buffer.getbuffer(), dtype=np.uint8).reshape(height, width, 4)[:, :, :3]
+
+        if self._previous is None:
+            self._write_header(width, height)
+            self._previous = np.empty_like(rgb)
+            top, bottom, left, right = 0, height, 0, width
+        else:
+            changed = (rgb != self._previous).any(axis=2)
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+            else:
+                # Nothing changed - a single pixel frame keeps the timing
+                top, bottom, left, right = 0, 1, 0, 1
+        self._previous[top:bottom, left:right] = rgb[top:bottom, left:right]
+
+        crop = Image.fromarray(np.ascontiguousarray(rgb[top:bottom, left:right]))
+        frame = crop.quantize(self.colours, method=Image.Quantize[self.quantize.upper()])
+        encoded = io.BytesIO()
+        frame.save(encoded, format='GIF')
+        descriptor, table, image = _gif_blocks(encoded.getvalue())
+
+        # Graphic control extension with the frame duration, then the image at its offset in the frame
+        delay = int(round(100 / self.fps))
+        self._write(b'!\xf9\x04' + struct.pack('<BHBB', DISPOSAL_KEEP << 2, delay, 0, 0))
+        self._write(descriptor[:1] + struct.pack('<HH', left, top) + descriptor[5:] + table + image)
+        self.frames += 1
+
+    def finish(self):
+        self._write(b';')
+        self._file.close()
+        self._buffer = None
+        self._previous = None
+
+
+animation.writers.register('streaming_gif')(StreamingGifWriter)
@@ -0,0 +1,358 @@
+"""Lazy query over Hawkeye deliveries - filters, column selection and the usual preparation compiled into one pass.
+
+Every plot starts with the same preparation of the raw Hawkeye data: flip pitchX and stumpsX, drop the deliveries with
+tracking disabled, split the delivery string, filter e.g. on rightHandedBat, then pull out the xy and values arrays.
+Done step by step with pandas, each step materialises another full DataFrame. A DeliveryQuery only records the steps,
+and runs them when the arrays are asked for:
+
+    - Only the columns the filters and outputs refer to are parsed
+    - A CSV is read in chunks and every filter is applied to each chunk as soon as it is parsed, so only the matching
+      rows of the requested columns are ever copied out of it - the tracking and plain column filters first, then the
+      delivery string is split for the rows still left, and only if innings or over is used
+    - The X flip is applied once, in place, to the output array
+    - On a delivery store the filters run on the memory-mapped columns (dictionary columns by their integer codes) and
+      each output is gathered with a single fancy index
+
+    query = DeliveryQuery('data/ssmith_ashes_2019.csv').where(rightHandedBat=True, ballSpeed=(36.1, None))
+    xy, runs = query.arrays('batterRuns')
+    pitch_heatmap(xy, runs, ...)
+
+Queries are immutable, where and select return a new query, so a base query can be shared and narrowed.
+
+"""
+
+import os
+
+import numpy as np
+
+from utilities.delivery_store import COORD_COLUMNS, DeliveryStore, _split_delivery
+
+# Rows of a CSV parsed at a time - bounds the memory of a scan however large the file
+CHUNK_ROWS = 100000
+
+# Columns derived from the delivery string "innings.over.ball" (ball is already its own column)
+DELIVERY_COLUMNS = ('innings', 'over')
+
+# Hawkeye columns that decide whether a delivery was tracked
+TRACKING_COLUMNS = ('pitchX', 'pitchY', 'ballSpeed')
+
+# Hawkeye X columns measured from the bowler's view, negated for plotting
+FLIPPED_COLUMNS = tuple(x_col for x_col, _, flip, _ in COORD_COLUMNS.values() if flip)
+
+
+def _condition_mask(values, condition, encode=None):
+    # Boolean mask of the values meeting a where condition, encode maps a value to its integer code when the values
+    # are the codes of a dictionary-encoded column
+    if callable(condition):
+        return np.asarray(condition(values), dtype=bool)
+
+    if isinstance(condition, tuple):
+        if any(isinstance(bound, str) for bound in condition):
+            # A chunk of a string column with only missing values is parsed as float NaNs
+            values = np.asarray(values, dtype=object)
+        if values.dtype != object:
+            return _range_mask(values, *condition)
+
+        # Strings are compared with the bounds as they are, missing values are never in range
+        import pandas as pd
+
+        known = np.asarray(pd.notna(values))
+        keep = np.zeros(len(values), dtype=bool)
+        keep[known] = _range_mask(values[known], *condition)
+        return keep
+
+    if isinstance(condition, (list, set, frozenset)):
+        condition = [encode(value) for value in condition] if encode else list(condition)
+        return np.isin(values, condition)
+
+    return np.asarray(values == (encode(condition) if encode else condition), dtype=bool)
+
+
+def _range_mask(values, lo, hi):
+    keep = np.ones(len(values), dtype=bool)
+    if lo is not None:
+        keep &= values >= lo
+    if hi is not None:
+        keep &= values <= hi
+    return keep
+
+
+def _encode(store, name, value):
+    # Code of a value in a dictionary-encoded store column, -2 (matches nothing) if it never occurs, -1 for None
+    if value is None:
+        return -1
+    code = store.code_of(name, value)
+    return -2 if code == -1 else code
+
+
+def _decode(store, name, codes):
+    return np.array(store.dictionary(name) + [None], dtype=object)[codes]  # -1 indexes the trailing None
+
+
+class DeliveryQuery:
+    """ Lazy, chainable query over a Hawkeye CSV, a list of them, or a delivery store.
+
+    ----------
+    source: A string, a list of strings or a DeliveryStore
+        Hawkeye CSV file(s), read in the order given, or a delivery store (or its directory)
+    coords: A string
+        "pitch", "stumps" or "field" - the co-ordinates returned as xy
+    tracked: Boolean
+        Keep only deliveries with ball tracking enabled (pitchX and pitchY present, ballSpeed not -1) and with the
+        chosen co-ordinates present
+    chunksize: An integer
+        Rows of a CSV parsed at a time
+
+    Column names are the Hawkeye ones, plus innings and over split from the delivery string. pitchX and stumpsX are
+    always in plotting orientation, i.e. already flipped, in filters as well as in the outputs.
+    """
+
+    def __init__(self, source, coords='pitch', tracked=True, chunksize=CHUNK_ROWS):
+        if coords + 'XY' not in COORD_COLUMNS:
+            raise ValueError('coords must be one of pitch, stumps or field')
+
+        self.source = source
+        self.coords = coords
+        self.tracked = tracked
+        self.chunksize = chunksize
+        self.filters = ()
+        self.columns = ()
+
+    def _copy(self, filters=None, columns=None):
+        query = DeliveryQuery(self.source, self.coords, self.tracked, self.chunksize)
+        query.filters = self.filters if filters is None else filters
+        query.columns = self.columns if columns is None else columns
+        return query
+
+    def where(self, filters=None, **conditions):
+        """ Narrows the query - every condition, of this and earlier calls, must hold
+
+        ----------
+        filters: A dict
+            Column name to condition, for names that are not valid keywords
+        conditions:
+            Column name to condition:
+            a scalar - equal to the value e.g. rightHandedBat=False
+            a (low, high) tuple - between the bounds inclusive, either can be None e.g. ballSpeed=(36.1, None) -
+            strings compare alphabetically and missing values are never in range
+            a list or set - any of the values e.g. bowlingStyle=["OFF_SPIN", "LEG_SPIN"]
+            a callable - given a column's values, returns a boolean mask
+
+        Returns
+        -------
+        DeliveryQuery"""
+
+        added = tuple({**(filters or {}), **conditions}.items())
+        return self._copy(filters=self.filters + added)
+
+    def select(self, *columns):
+        """ Adds columns to the outputs of collect
+
+        Returns
+        -------
+        DeliveryQuery"""
+
+        return self._copy(columns=self.columns + tuple(c for c in columns if c not in self.columns))
+
+    def plan(self):
+        """ How the query will run - the columns read from the source and the filters in the order applied
+
+        Returns
+        -------
+        dict with source ("csv" or "store"), read (column names), filters, derived (columns split from the delivery
+        string) and flipped (X columns negated)"""
+
+        x_col, y_col, _, _ = COORD_COLUMNS[self.coords + 'XY']
+        wanted = [name for name, _ in self.filters] + list(self.columns) + [x_col, y_col]
+        derived = [name for name in DELIVERY_COLUMNS if name in wanted]
+
+        read = [x_col, y_col]
+        if self.tracked:
+            read += [name for name in TRACKING_COLUMNS if name not in read]
+        read += [name for name in wanted if name not in read and name not in DELIVERY_COLUMNS]
+        if derived:
+            read.append('delivery')
+
+        # Derived columns only exist after the split, so their filters go last
+        filters = ([name for name, _ in self.filters if name not in DELIVERY_COLUMNS] +
+                   [name for name, _ in self.filters if name in DELIVERY_COLUMNS])
+
+        return {'source': 'store' if self._store() is not None else 'csv',
+                'read': read,
+                'filters': (['tracked'] if self.tracked else []) + filters,
+                'derived': derived,
+                'flipped': [name for name in read if name in FLIPPED_COLUMNS]}
+
+    def xy(self):
+        """ Runs the query
+
+        Returns
+        -------
+        (n, 2) numpy array of co-ordinates, X flipped for plotting - the xy argument of the plot templates"""
+
+        return self._run()[0]
+
+    def arrays(self, value):
+        """ Runs the query
+
+        ----------
+        value: A string
+            The column returned as values, e.g. batterRuns
+
+        Returns
+        -------
+        (xy, values) - the xy and values arguments of the plot templates"""
+
+        xy, columns = self.select(value)._run()
+        return xy, columns[value]
+
+    def collect(self):
+        """ Runs the query
+
+        Returns
+        -------
+        dict of selected column name to 1d numpy array"""
+
+        return self._run()[1]
+
+    def __len__(self):
+        return len(self.xy())
+
+    def _store(self):
+        if isinstance(self.source, DeliveryStore):
+            return self.source
+        if isinstance(self.source, (str, os.PathLike)) and os.path.isdir(self.source):
+            return DeliveryStore(self.source)
+        return None
+
+    def _run(self):
+        store = self._store()
+        if store is not None:
+            return self._run_store(store)
+
+        paths = [self.source] if isinstance(self.source, (str, os.PathLike)) else list(self.source)
+        return self._run_csv(paths)
+
+    def _run_store(self, store):
+        xy_all = {'pitch': store.pitch_xy, 'stumps': store.stumps_xy, 'field': store.field_xy}[self.coords]
+        if xy_all is None:
+            raise KeyError(COORD_COLUMNS[self.coords + 'XY'][0])
+
+        keep = store.tracked() if self.tracked else np.ones(len(store), dtype=bool)
+        if self.tracked and self.coords != 'pitch':
+            keep &= np.isfinite(xy_all).all(axis=1)
+
+        for name, condition in self.filters:
+            if name in store and store.meta['columns'][name]['kind'] == 'dict':
+                # Comparing integer codes is much faster than comparing decoded strings
+                if callable(condition):
+                    keep &= _condition_mask(_decode(store, name, store.codes(name)), condition)
+                elif isinstance(condition, tuple):
+                    # The range is tested once per distinct string, then matched by code
+                    in_range = _condition_mask(np.array(store.dictionary(name), dtype=object), condition)
+                    keep &= np.isin(store.codes(name), np.flatnonzero(in_range))
+                else:
+                    keep &= _condition_mask(store.codes(name), condition, lambda value: _encode(store, name, value))
+            else:
+                keep &= _condition_mask(store.column(name), condition)
+
+        rows = np.flatnonzero(keep)
+        xy = xy_all[rows]
+
+        columns = {}
+        for name in self.columns:
+            if name in store and store.meta['columns'][name]['kind'] == 'dict':
+                columns[name] = _decode(store, name, store.codes(name)[rows])
+            else:
+                columns[name] = np.asarray(store.column(name))[rows]
+        return xy, columns
+
+    def _run_csv(self, paths):
+        import pandas as pd
+
+        plan = self.plan()
+        x_col, y_col, _, _ = COORD_COLUMNS[self.coords + 'XY']
+        plain = [(name, condition) for name, condition in self.filters if name not in DELIVERY_COLUMNS]
+        derived = [(name, condition) for name, condition in self.filters if name in DELIVERY_COLUMNS]
+
+        xy_parts = []
+        column_parts = {name: [] for name in self.columns if name not in (x_col, y_col)}
+
+        for path in paths:
+            # Checked against the header first, so a missing column is a KeyError as it is for a store
+            header = pd.read_csv(path, encoding='utf-8-sig', nrows=0).columns
+            for name in plan['read']:
+                if name not in header:
+                    raise KeyError(name)
+
+            with pd.read_csv(path, encoding='utf-8-sig', usecols=plan['read'], chunksize=self.chunksize) as reader:
+                for chunk in reader:
+                    xy_part, parts = self._scan_chunk(chunk, x_col, y_col, plain, derived, plan['derived'])
+                    xy_parts.append(xy_part)
+                    for name, part in parts.items():
+                        column_parts[name].append(part)
+
+        xy = xy_parts[0] if len(xy_parts) == 1 else np.concatenate(xy_parts)
+
+        # Hawkeye Data has Y co-ord as meters from stumps towards bowler, so X is flipped for plotting
+        if x_col in FLIPPED_COLUMNS:
+            np.negative(xy[:, 0], out=xy[:, 0])
+
+        columns = {}
+        for name in self.columns:
+            if name in (x_col, y_col):
+                columns[name] = xy[:, 0 if name == x_col else 1]
+                continue
+
+            parts = column_parts[name]
+            columns[name] = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            if name in FLIPPED_COLUMNS:
+                np.negative(columns[name], out=columns[name])
+
+        return xy, columns
+
+    def _scan_chunk(self, chunk, x_col, y_col, plain, derived, split):
+        x = chunk[x_col].to_numpy(dtype=float)
+        y = chunk[y_col].to_numpy(dtype=float)
+
+        keep = np.ones(len(chunk), dtype=bool)
+        if self.tracked:
+            keep &= ~(np.isnan(x) | np.isnan(y)) & (chunk['ballSpeed'].to_numpy() != -1)
+            if x_col != 'pitchX':
+                keep &= chunk['pitchX'].notna().to_numpy() & chunk['pitchY'].notna().to_numpy()
+
+        for name, condition in plain:
+            values = chunk[name].to_numpy()
+            if name in FLIPPED_COLUMNS:
+                values = -values
+            keep &= _condition_mask(values, condition)
+
+        rows = np.flatnonzero(keep)
+
+        derived_values = {}
+        if split:
+            # Only the rows left after the cheaper filters are split
+            if len(rows):
+                innings, over = _split_delivery(chunk['delivery'].iloc[rows])
+                derived_values = {'innings': innings.to_numpy(), 'over': over.to_numpy()}
+            else:
+                derived_values = {'innings': np.empty(0, dtype=np.int64), 'over': np.empty(0, dtype=np.int64)}
+
+            passed = np.ones(len(rows), dtype=bool)
+            for name, condition in derived:
+                passed &= _condition_mask(derived_values[name], condition)
+            rows = rows[passed]
+            derived_values = {name: values[passed] for name, values in derived_values.items()}
+
+        xy = np.empty((len(rows), 2))
+        np.take(x, rows, out=xy[:, 0])
+        np.take(y, rows, out=xy[:, 1])
+
+        # The co-ordinate columns themselves are returned as views of xy
+        parts = {}
+        for name in self.columns:
+            if name in derived_values:
+                parts[name] = derived_values[name]
+            elif name not in (x_col, y_col):
+                parts[name] = chunk[name].to_numpy()[rows]
+        return xy, parts
@@ -0,0 +1,299 @@
+"""Columnar, memory-mapped store for Hawkeye ball-by-ball data.
+
+A Hawkeye CSV (or a list of them) is converted once with build_store into a directory holding one .npy file per
+column and a meta.json describing the row count, dtypes and string dictionaries. open_store maps the columns back
+read-only, so the pitch and stumps co-ordinates can be passed straight to the plot templates without re-parsing.
+
+Layout decisions:
+    - Co-ordinates are float32 and stored as (n, 2) arrays (pitchXY, stumpsXY, fieldXY) with the Hawkeye X flip
+      already applied to pitch and stumps, so store.pitch_xy is the xy argument the plot templates expect
+    - Missing co-ordinates (tracking disabled) are NaN, ballSpeed keeps the Hawkeye -1 sentinel
+    - Names, bowling styles, dismissals and extras are dictionary-encoded, -1 is the null code
+    - rightHandedBat and rightArmedBowl are bit-packed. A boolean column with missing values also gets a bit-packed
+      validity mask (<name>.valid.npy, "valid" in its meta entry) and decodes the missing values to None
+    - The delivery string "innings.over.ball" is split into integer innings and over columns (ball already exists)
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+# pandas is only needed to parse CSVs and build DataFrames, so it is imported in those functions - opening a store
+# and reading columns needs numpy alone
+
+STORE_VERSION = 1
+META_FILE = 'meta.json'
+VALID_SUFFIX = '.valid'
+
+INT_COLUMNS = {'matchId': 'int32',
+               'innings': 'int8',
+               'over': 'int16',
+               'ball': 'int8',
+               'batterId': 'int32',
+               'nonStrikerId': 'int32',
+               'bowlerId': 'int32',
+               'runs': 'int16',
+               'batterRuns': 'int16',
+               'bowlerRuns': 'int16'}
+
+FLOAT_COLUMNS = {'ballSpeed': 'float32'}
+
+BOOL_COLUMNS = ['rightHandedBat', 'rightArmedBowl']
+
+DICT_COLUMNS = ['batter', 'nonStriker', 'bowler', 'bowlingStyle', 'dismissalDetails', 'extras']
+
+# Stored name: (x column, y column, flip x, required)
+COORD_COLUMNS = {'pitchXY': ('pitchX', 'pitchY', True, True),
+                 'stumpsXY': ('stumpsX', 'stumpsY', True, True),
+                 'fieldXY': ('fieldX', 'fieldY', False, False)}
+
+
+def read_hawkeye_csv(path):
+    """ Reads a single Hawkeye CSV, stripping the UTF-8 BOM that precedes the matchId header
+
+    ----------
+    path: A string
+        Path to the CSV file
+
+    Returns
+    -------
+    pandas.DataFrame"""
+    import pandas as pd
+
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+
+def _split_delivery(delivery):
+    # "1.20.1" -> innings 1, over 20 (ball is already its own column)
+    parts = delivery.astype(str).str.split('.', n=2, expand=True)
+    return parts[0].astype('int64'), parts[1].astype('int64')
+
+
+def _code_dtype(n_values):
+    return 'int16' if n_values < np.iinfo(np.int16).max else 'int32'
+
+
+def build_store(csv_paths, store_path):
+    """ Converts one or more Hawkeye CSV files into a columnar store directory
+
+    ----------
+    csv_paths: A string or a list of strings
+        The Hawkeye CSV file(s) to convert - rows are concatenated in the order given
+    store_path: A string
+        The directory to write the store to - created if it does not exist, existing columns are overwritten
+
+    Returns
+    -------
+    DeliveryStore opened on the new store"""
+    import pandas as pd
+
+    if isinstance(csv_paths, (str, os.PathLike)):
+        csv_paths = [csv_paths]
+
+    df = pd.concat([read_hawkeye_csv(path) for path in csv_paths], ignore_index=True)
+
+    os.makedirs(store_path, exist_ok=True)
+
+    meta = {'version': STORE_VERSION,
+            'rows': len(df),
+            'flipped': True,
+            'columns': {}}
+
+    def save(name, array, kind, **extra):
+        np.save(os.path.join(store_path, name + '.npy'), np.ascontiguousarray(array))
+        meta['columns'][name] = dict(kind=kind, **extra)
+
+    df['innings'], df['over'] = _split_delivery(df['delivery'])
+
+    for name, dtype in INT_COLUMNS.items():
+        save(name, df[name].to_numpy(dtype=dtype), 'int')
+
+    for name, dtype in FLOAT_COLUMNS.items():
+        save(name, df[name].to_numpy(dtype=dtype), 'float')
+
+    for name in BOOL_COLUMNS:
+        known = df[name].notna().to_numpy()
+        save(name, np.packbits(df[name].to_numpy(dtype=bool) & known), 'bool')
+        if not known.all():
+            np.save(os.path.join(store_path, name + VALID_SUFFIX + '.npy'), np.packbits(known))
+            meta['columns'][name]['valid'] = True
+
+    for name in DICT_COLUMNS:
+        codes, uniques = pd.factorize(df[name])
+        save(name, codes.astype(_code_dtype(len(uniques))), 'dict', dictionary=[str(u) for u in uniques])
+
+    for name, (x_col, y_col, flip, required) in COORD_COLUMNS.items():
+        if x_col not in df.columns:
+            if required:
+                raise ValueError('Hawkeye data is missing required column {0}'.format(x_col))
+            continue
+
+        xy = df[[x_col, y_col]].to_numpy(dtype='float32')
+        if flip:
+            # Hawkeye Data has Y co-ord as meters from stumps towards bowler, so X is flipped for plotting
+            xy[:, 0] = -xy[:, 0]
+        save(name, xy, 'coords', source=[x_col, y_col])
+
+    with open(os.path.join(store_path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+    return DeliveryStore(store_path)
+
+
+def open_store(store_path):
+    """ Opens a store written by build_store with every column memory-mapped read-only
+
+    ----------
+    store_path: A string
+        The store directory
+
+    Returns
+    -------
+    DeliveryStore"""
+
+    return DeliveryStore(store_path)
+
+
+class DeliveryStore:
+    """ Read-only view over a columnar delivery store.
+
+    Numeric and co-ordinate columns are returned as memory-mapped arrays (no copy), bit-packed booleans are unpacked
+    and dictionary columns are decoded on access. Use codes() and dictionary() to filter on strings without decoding.
+    """
+
+    def __init__(self, store_path):
+        with open(os.path.join(store_path, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError('Unsupported delivery store version {0}'.format(self.meta['version']))
+
+        self.path = store_path
+        self.rows = self.meta['rows']
+        self._arrays = {name: np.load(os.path.join(store_path, name + '.npy'), mmap_mode='r')
+                        for name in self.meta['columns']}
+        self._valid = {name: np.load(os.path.join(store_path, name + VALID_SUFFIX + '.npy'), mmap_mode='r')
+                       for name, column in self.meta['columns'].items() if column.get('valid')}
+        self._indexes = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.meta['columns']
+
+    @property
+    def columns(self):
+        return list(self.meta['columns'])
+
+    @property
+    def pitch_xy(self):
+        """(n, 2) float32 pitching co-ordinates, X already flipped for plotting"""
+        return self._arrays['pitchXY']
+
+    @property
+    def stumps_xy(self):
+        """(n, 2) float32 co-ordinates at the stumps, X already flipped for plotting"""
+        return self._arrays['stumpsXY']
+
+    @property
+    def field_xy(self):
+        """(n, 2) float32 fielding co-ordinates, or None if the source files had none"""
+        return self._arrays.get('fieldXY')
+
+    def codes(self, name):
+        """ Integer codes of a dictionary-encoded column, -1 is null """
+        self._check_kind(name, 'dict')
+        return self._arrays[name]
+
+    def dictionary(self, name):
+        """ List of the distinct strings of a dictionary-encoded column, indexed by code """
+        self._check_kind(name, 'dict')
+        return self.meta['columns'][name]['dictionary']
+
+    def code_of(self, name, value):
+        """ Code of a string in a dictionary-encoded column, -1 if the value never occurs """
+        dictionary = self.dictionary(name)
+        return dictionary.index(value) if value in dictionary else -1
+
+    def column(self, name):
+        """ Returns a column as a numpy array
+
+        ----------
+        name: A string
+            Any stored column name - pitchX, pitchY, stumpsX, stumpsY, fieldX and fieldY are also accepted and
+            returned as views of the co-ordinate arrays
+
+        Returns
+        -------
+        numpy.ndarray - dictionary columns, and boolean columns with missing values, as object arrays with None for
+        missing"""
+
+        for stored, (x_col, y_col, _, _) in COORD_COLUMNS.items():
+            if name in (x_col, y_col) and stored in self._arrays:
+                return self._arrays[stored][:, 0 if name == x_col else 1]
+
+        if name not in self.meta['columns']:
+            raise KeyError(name)
+
+        kind = self.meta['columns'][name]['kind']
+        array = self._arrays[name]
+
+        if kind == 'bool':
+            values = np.unpackbits(array, count=self.rows).astype(bool)
+            if name in self._valid:
+                values = values.astype(object)
+                values[~self.valid(name)] = None
+            return values
+
+        if kind == 'dict':
+            lookup = np.array(self.dictionary(name) + [None], dtype=object)
+            return lookup[array]  # -1 indexes the trailing None
+
+        return array
+
+    def valid(self, name):
+        """ Boolean mask of the rows where a boolean column is known - all True unless the column has missing values """
+        self._check_kind(name, 'bool')
+        if name not in self._valid:
+            return np.ones(self.rows, dtype=bool)
+        return np.unpackbits(self._valid[name], count=self.rows).astype(bool)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def tracked(self):
+        """ Boolean mask of deliveries with ball tracking enabled """
+        return np.isfinite(self.pitch_xy).all(axis=1) & (self._arrays['ballSpeed'] != -1)
+
+    def spatial_index(self, coords='pitch', cell_size=None):
+        """ Grid index over the pitch ("pitch") or stumps ("stumps") co-ordinates for rectangle, radius and nearest
+        queries, with every store column available as a query filter - built on first use and kept with the store
+
+        Returns
+        -------
+        analysis.spatial.SpatialIndex"""
+        from analysis.spatial import CELL_SIZE, SpatialIndex
+
+        cell_size = CELL_SIZE if cell_size is None else cell_size
+        if (coords, cell_size) not in self._indexes:
+            xy = {'pitch': self.pitch_xy, 'stumps': self.stumps_xy}[coords]
+            self._indexes[coords, cell_size] = SpatialIndex(xy, cell_size=cell_size, attributes=self)
+        return self._indexes[coords, cell_size]
+
+    def to_dataframe(self, columns=None):
+        """ Materialises the selected columns (default all) as a pandas DataFrame using the original column names """
+        import pandas as pd
+
+        if columns is None:
+            columns = []
+            for name in self.meta['columns']:
+                columns.extend(self.meta['columns'][name].get('source', [name]))
+
+        return pd.DataFrame({name: self.column(name) for name in columns})
+
+    def _check_kind(self, name, kind):
+        if self.meta['columns'].get(name, {}).get('kind') != kind:
+            raise KeyError('{0} is not a {1} column'.format(name, kind))
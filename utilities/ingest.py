@@ -0,0 +1,386 @@
+"""Bulk ingest of a directory of per-match Hawkeye CSVs into one delivery store.
+
+build_store concatenates its CSVs in memory, which is fine for a series but not for hundreds of match files. ingest
+instead streams them into the store layout of utilities.delivery_store, so the result opens with open_store and works
+with DeliveryQuery and the spatial index:
+
+    - Files are parsed by a pool of threads (the pandas parser releases the GIL), at most workers + PREFETCH files
+      ahead of the writer, and written in sorted file order so the output does not depend on thread timing
+    - Each file is normalised on its own thread: the UTF-8 BOM and stray whitespace are stripped from the header,
+      columns are cast to the store dtypes, TRUE/FALSE and true/false alike become booleans, X co-ordinates are
+      flipped for plotting and the delivery string is split into innings and over
+    - Schemas are unioned as the files arrive. A column first seen part way through (e.g. fieldX/fieldY, only in some
+      files) is backfilled for the rows already written, and a column a file lacks is filled for that file - with
+      typed nulls: NaN for floats and co-ordinates, -1 for integers, the null code for strings and the validity
+      mask for booleans (decoded to None, never False). Columns the store does not know are kept too, as floats if numeric and dictionary-encoded strings otherwise
+    - Deliveries are deduplicated on (matchId, delivery), keeping the first in file order. Rows whose matchId or
+      delivery string is missing, unparseable or too large for the deduplication key are rejected and counted
+    - Columns are appended to one part file each and only assembled into the .npy files at the end, so memory is
+      bounded by the files in flight plus an 8 byte key per delivery for deduplication
+
+    python -m utilities.ingest data/matches/ --out data/matches.store --workers 4
+
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utilities.delivery_store import (STORE_VERSION, META_FILE, VALID_SUFFIX, INT_COLUMNS, FLOAT_COLUMNS, BOOL_COLUMNS,
+                                      DICT_COLUMNS, COORD_COLUMNS, DeliveryStore, _code_dtype)
+
+# Files parsed ahead of the writer in addition to one per worker - bounds the memory held by parsed files
+PREFETCH = 2
+
+# Rows copied at a time when the part files are assembled into the store
+COPY_ROWS = 1 << 20
+
+# Columns every file must have - the rest are unioned with nulls
+REQUIRED_COLUMNS = ['matchId', 'delivery', 'ball', 'ballSpeed'] + \
+    [col for x_col, y_col, _, required in COORD_COLUMNS.values() if required for col in (x_col, y_col)]
+
+# Typed null per store kind, for columns a file lacks - booleans are written as uint8 with 2 as the null until the
+# store's validity mask is built
+NULLS = {'int': -1, 'float': np.nan, 'coords': np.nan, 'bool': 2, 'dict': -1}
+
+# Bit widths of the delivery string parts in the deduplication key - matchId gets the rest of a non-negative int64
+INNINGS_BITS, OVER_BITS, BALL_BITS = 4, 10, 7
+MATCH_BITS = 63 - INNINGS_BITS - OVER_BITS - BALL_BITS
+
+TRUE_STRINGS = {'true', 't', '1', 'yes', 'y'}
+
+
+def _normalise(path):
+    # Parses and normalises one file to {column: (kind, array)} plus deduplication keys, on a worker thread
+    import pandas as pd
+
+    df = pd.read_csv(path, encoding='utf-8-sig', low_memory=False)
+    df.columns = df.columns.str.replace('\ufeff', '', regex=False).str.strip()
+
+    missing = [name for name in REQUIRED_COLUMNS if name not in df.columns]
+    if missing:
+        raise ValueError('{0} is missing required column(s) {1}'.format(path, ', '.join(missing)))
+
+    if len(df):
+        parts = df['delivery'].astype(str).str.split('.', n=2, expand=True).reindex(columns=[0, 1, 2])
+        key_parts = [pd.to_numeric(parts[i], errors='coerce').to_numpy(dtype=np.float64) for i in range(3)]
+    else:
+        key_parts = [np.zeros(0) for _ in range(3)]
+    key_parts.insert(0, pd.to_numeric(df['matchId'], errors='coerce').to_numpy(dtype=np.float64))
+
+    # A key part that is missing, fractional or too wide for its bits would merge distinct deliveries, so those rows
+    # get the key -1 and are rejected
+    keyed = np.ones(len(df), dtype=bool)
+    for part, bits in zip(key_parts, (MATCH_BITS, INNINGS_BITS, OVER_BITS, BALL_BITS)):
+        with np.errstate(invalid='ignore'):
+            keyed &= (part >= 0) & (part < 1 << bits) & (part == np.floor(part))
+
+    match, innings, over, ball = (np.where(keyed, part, 0).astype(np.int64) for part in key_parts)
+    keys = np.where(keyed, (((match << INNINGS_BITS | innings) << OVER_BITS | over) << BALL_BITS) | ball, -1)
+
+    columns = {'innings': ('int', innings), 'over': ('int', over)}
+
+    for name in INT_COLUMNS:
+        if name in df.columns:
+            columns[name] = ('int', pd.to_numeric(df[name], errors='coerce').fillna(-1).to_numpy(dtype=np.int64))
+
+    for name in FLOAT_COLUMNS:
+        if name in df.columns:
+            columns[name] = ('float', pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64))
+
+    for name in BOOL_COLUMNS:
+        if name in df.columns:
+            values = df[name]
+            known = values.notna().to_numpy()
+            if values.dtype != bool:
+                values = values.astype(str).str.strip().str.lower().isin(TRUE_STRINGS)
+            columns[name] = ('bool', np.where(known, values.to_numpy(dtype=bool), NULLS['bool']).astype(np.uint8))
+
+    for name in DICT_COLUMNS:
+        if name in df.columns:
+            columns[name] = ('dict', df[name].to_numpy(dtype=object))
+
+    for name, (x_col, y_col, flip, _) in COORD_COLUMNS.items():
+        if x_col in df.columns and y_col in df.columns:
+            xy = np.column_stack([pd.to_numeric(df[x_col], errors='coerce'),
+                                  pd.to_numeric(df[y_col], errors='coerce')]).astype(np.float32)
+            if flip:
+                # Hawkeye Data has Y co-ord as meters from stumps towards bowler, so X is flipped for plotting
+                xy[:, 0] = -xy[:, 0]
+            columns[name] = ('coords', xy)
+
+    known = set(REQUIRED_COLUMNS) | set(columns) | {c for x_col, y_col, _, _ in COORD_COLUMNS.values()
+                                                   for c in (x_col, y_col)}
+    for name in df.columns:
+        if name not in known:
+            values = df[name]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                columns[name] = ('float', values.to_numpy(dtype=np.float64))
+            else:
+                columns[name] = ('dict', values.to_numpy(dtype=object))
+
+    return columns, keys, os.path.getsize(path)
+
+
+class _ColumnWriter:
+    # Appends one column to a part file, rows in their final order
+
+    DTYPES = {'int': np.int64, 'float': np.float64, 'coords': np.float32, 'bool': np.uint8, 'dict': np.int32}
+
+    def __init__(self, store_path, name, kind, rows_before):
+        self.name = name
+        self.kind = kind
+        self.dtype = np.dtype(self.DTYPES[kind])
+        self.width = 2 if kind == 'coords' else 1
+        self.part = os.path.join(store_path, name + '.part')
+        self.file = open(self.part, 'wb')
+        self.dictionary = {}
+        self.rows = 0
+        self.nulls = 0
+        self.write_nulls(rows_before)
+
+    def write_nulls(self, n):
+        if n:
+            shape = (n, self.width) if self.width > 1 else n
+            self._append(np.full(shape, NULLS[self.kind], dtype=self.dtype))
+            self.nulls += n
+
+    def write(self, kind, values):
+        if self.kind == 'dict':
+            values = self._encode(values)
+        elif kind == 'dict':
+            # A string column of one file landing in a numeric column of the store, unparseable values become null
+            import pandas as pd
+            values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+            if self.kind == 'int':
+                values = np.where(np.isnan(values), -1, values)
+        elif self.kind == 'bool':
+            self.nulls += int(np.count_nonzero(values == NULLS['bool']))
+        self._append(np.asarray(values).astype(self.dtype, copy=False))
+
+    def _encode(self, values):
+        import pandas as pd
+
+        values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values)
+        lookup = np.empty(len(uniques) + 1, dtype=np.int32)
+        lookup[-1] = -1  # factorize's -1 null code indexes the trailing slot
+        for i, value in enumerate(uniques):
+            lookup[i] = self.dictionary.setdefault(str(value), len(self.dictionary))
+        return lookup[codes]
+
+    def _append(self, array):
+        array.tofile(self.file)
+        self.rows += len(array)
+
+    def finish(self, store_path):
+        """ Assembles the part file into the store's .npy file, returning the column's meta entry """
+        self.file.close()
+        source = np.memmap(self.part, dtype=self.dtype, mode='r',
+                           shape=(self.rows, self.width) if self.width > 1 else (self.rows,)) if self.rows else \
+            np.zeros((0, self.width) if self.width > 1 else 0, dtype=self.dtype)
+
+        meta = {'kind': self.kind}
+        if self.kind == 'bool':
+            dtype, shape = np.uint8, ((self.rows + 7) // 8,)
+        elif self.kind == 'dict':
+            dtype, shape = _code_dtype(len(self.dictionary)), (self.rows,)
+            meta['dictionary'] = list(self.dictionary)
+        elif self.kind == 'int':
+            dtype, shape = INT_COLUMNS.get(self.name, 'int64'), (self.rows,)
+        elif self.kind == 'float':
+            dtype, shape = FLOAT_COLUMNS.get(self.name, 'float64'), (self.rows,)
+        else:
+            dtype, shape = np.float32, source.shape
+            meta['source'] = list(COORD_COLUMNS[self.name][:2])
+
+        target = np.lib.format.open_memmap(os.path.join(store_path, self.name + '.npy'), mode='w+', dtype=dtype,
+                                           shape=shape)
+        valid = None
+        if self.kind == 'bool' and self.nulls:
+            meta['valid'] = True
+            valid = np.lib.format.open_memmap(os.path.join(store_path, self.name + VALID_SUFFIX + '.npy'), mode='w+',
+                                              dtype=np.uint8, shape=shape)
+
+        for start in range(0, self.rows, COPY_ROWS):  # a multiple of 8, so bools pack block by block
+            block = source[start:start + COPY_ROWS]
+            if self.kind == 'bool':
+                packed = slice(start // 8, start // 8 + (len(block) + 7) // 8)
+                target[packed] = np.packbits(block == 1)
+                if valid is not None:
+                    valid[packed] = np.packbits(block != NULLS['bool'])
+            else:
+                target[start:start + len(block)] = block
+        target.flush()
+        if valid is not None:
+            valid.flush()
+        del target, valid, source
+
+        os.remove(self.part)
+        return meta
+
+
+class _KeySet:
+    # Sorted int64 deduplication keys of the deliveries written so far
+
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.int64)
+
+    def first_unseen(self, keys):
+        """ Positions of the keys seen neither before nor earlier in keys, ascending, and records them """
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        candidates = keys[first]
+
+        seen = np.zeros(len(candidates), dtype=bool)
+        if len(self.keys):
+            at = np.minimum(np.searchsorted(self.keys, candidates), len(self.keys) - 1)
+            seen = self.keys[at] == candidates
+
+        new = first[~seen]
+        # Merged into place rather than re-sorting every key seen so far
+        added = np.sort(keys[new])
+        self.keys = np.insert(self.keys, np.searchsorted(self.keys, added), added)
+        return new
+
+
+def match_files(source):
+    """ The Hawkeye CSVs of a directory (sorted), a glob pattern or a list of paths """
+    if isinstance(source, (str, os.PathLike)):
+        source = os.fspath(source)
+        if os.path.isdir(source):
+            return sorted(glob.glob(os.path.join(source, '*.csv')))
+        return sorted(glob.glob(source)) if glob.has_magic(source) else [source]
+    return list(source)
+
+
+def ingest(source, store_path, workers=4, verbose=False):
+    """ Streams many Hawkeye CSVs into a single delivery store, unioning their schemas and removing duplicate
+    deliveries
+
+    ----------
+    source: A string or a list of strings
+        A directory of CSVs, a glob pattern, or the files themselves - read in sorted (or the given) order
+    store_path: A string
+        The store directory - created if it does not exist, existing columns are overwritten
+    workers: An integer
+        Files parsed concurrently
+    verbose: Boolean
+        Print a line per file
+
+    Returns
+    -------
+    (DeliveryStore, report) - the report is a dict with files, rows_read, rows (written), duplicates, rejected (rows
+    without a valid matchId and delivery string), bytes (CSV bytes read), seconds, rows_per_second, bytes_per_second and backfilled (column name to null rows written for it because
+    some files lacked it)"""
+
+    paths = match_files(source)
+    if not paths:
+        raise ValueError('No Hawkeye CSV files found in {0}'.format(source))
+
+    os.makedirs(store_path, exist_ok=True)
+
+    writers = {}
+    backfilled = {}
+    seen = _KeySet()
+    rows = rows_read = rejected = n_bytes = 0
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            queue = iter(paths)
+
+            def submit():
+                path = next(queue, None)
+                if path is not None:
+                    pending.append((path, pool.submit(_normalise, path)))
+
+            for _ in range(workers + PREFETCH):
+                submit()
+
+            while pending:
+                path, future = pending.pop(0)
+                columns, keys, size = future.result()
+                submit()
+
+                keyed = np.flatnonzero(keys >= 0)
+                keep = keyed[seen.first_unseen(keys[keyed])]
+                n = len(keep)
+
+                for name, (kind, values) in columns.items():
+                    if name not in writers:
+                        writers[name] = _ColumnWriter(store_path, name, kind, rows)
+                        if rows:
+                            backfilled[name] = backfilled.get(name, 0) + rows
+                    writers[name].write(kind, values[keep])
+
+                for name, writer in writers.items():
+                    if name not in columns:
+                        writer.write_nulls(n)
+                        backfilled[name] = backfilled.get(name, 0) + n
+
+                rows += n
+                rows_read += len(keys)
+                rejected += len(keys) - len(keyed)
+                n_bytes += size
+
+                if verbose:
+                    print('{0}: {1} deliveries, {2} duplicates, {3} rejected'.format(
+                        os.path.basename(path), n, len(keyed) - n, len(keys) - len(keyed)))
+    except BaseException:
+        # Leave no part files behind - the store's existing columns and meta are untouched until the end
+        for writer in writers.values():
+            writer.file.close()
+            os.remove(writer.part)
+        raise
+
+    meta = {'version': STORE_VERSION,
+            'rows': rows,
+            'flipped': True,
+            'columns': {name: writer.finish(store_path) for name, writer in writers.items()}}
+
+    with open(os.path.join(store_path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+    seconds = time.perf_counter() - start
+    report = {'files': len(paths),
+              'rows_read': rows_read,
+              'rows': rows,
+              'duplicates': rows_read - rejected - rows,
+              'rejected': rejected,
+              'bytes': n_bytes,
+              'seconds': seconds,
+              'rows_per_second': rows_read / seconds,
+              'bytes_per_second': n_bytes / seconds,
+              'backfilled': backfilled}
+
+    return DeliveryStore(store_path), report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest a directory of Hawkeye CSVs into one delivery store')
+    parser.add_argument('source', help='Directory of Hawkeye CSVs, a glob pattern or a single file')
+    parser.add_argument('--out', required=True, help='Delivery store directory')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    _, report = ingest(args.source, args.out, workers=args.workers, verbose=args.verbose)
+
+    print('{files} files, {rows:,} deliveries ({duplicates:,} duplicates dropped) in {seconds:.2f}s - '
+          '{rows_per_second:,.0f} rows/s, {mb_per_second:.1f} MB/s'.format(
+              mb_per_second=report['bytes_per_second'] / 1e6, **report))
+    if report['rejected']:
+        print('{rejected:,} rows rejected for a missing or invalid matchId or delivery string'.format(**report))
+    for name, n in report['backfilled'].items():
+        print('{0}: {1:,} null rows for files without it'.format(name, n))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Per-stage timing and profiling hooks shared by the pitch views and plot templates.
+
+The templates wrap each stage (aggregation, kde, colour shading, wicket, titles...) in a named span. While no collector
+is registered span() returns a shared no-op context, so the instrumentation can be left in place in production. Once a
+collector is registered every span produces a record:
+
+    {'name': 'pitch_heatmap.aggregate',   # dotted stage name
+     'parent': 'pitch_heatmap',           # enclosing span, None at the top level
+     'depth': 1,
+     'seconds': 0.0012,                   # wall time
+     'artists': 0,                        # artists added to the watched figure/axis, None if nothing was watched
+     'peak_bytes': 183500}                # peak traced memory above the start of the span, None unless requested
+
+Records are passed to every registered callback as each span ends, so nested stages arrive before their parent:
+
+    from utilities.instrumentation import Collector
+
+    with Collector() as profile:
+        pitch_heatmap(xy, values)
+        plt.gcf().savefig('heatmap.png')
+    print(profile.summary())
+
+"""
+
+import functools
+import threading
+import time
+import tracemalloc
+
+# Registered (callback, memory) pairs - span() only does any work while this is non-empty
+_collectors = []
+
+_local = threading.local()
+
+
+class _NullSpan:
+    """ The span returned while instrumentation is disabled - does nothing """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, obj):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def count_artists(obj):
+    """ Number of artists directly on an axis, or on a figure and all of its axes """
+
+    children = obj.get_children()
+    axes = getattr(obj, 'axes', None)
+    if isinstance(axes, list):
+        # A figure - its axes are among its children, count their artists too
+        return len(children) + sum(len(ax.get_children()) for ax in axes)
+    return len(children)
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Span:
+
+    def __init__(self, name, target, memory):
+        self.name = name
+        self.target = target
+        self.memory = memory
+        self._artists_start = None
+        self._child_peak = 0
+        self._started_tracing = False
+
+    def watch(self, obj):
+        """ Counts the artists added to obj from now until the span ends - for a figure created inside the span """
+        self.target = obj
+        self._artists_start = count_artists(obj)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+
+        if self.target is not None:
+            self._artists_start = count_artists(self.target)
+
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._memory_start, self._peak_before = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+
+        peak_bytes = None
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._child_peak)
+            peak_bytes = peak - self._memory_start
+            if self.parent is not None:
+                # reset_peak() above cleared the peak the parent will read, so hand it up explicitly
+                self.parent._child_peak = max(self.parent._child_peak, self._peak_before, peak)
+            if self._started_tracing:
+                tracemalloc.stop()
+
+        _stack().pop()
+
+        record = {'name': self.name,
+                  'parent': self.parent.name if self.parent is not None else None,
+                  'depth': len(_stack()),
+                  'seconds': seconds,
+                  'artists': count_artists(self.target) - self._artists_start if self.target is not None else None,
+                  'peak_bytes': peak_bytes}
+
+        for callback, _ in list(_collectors):
+            callback(record)
+        return False
+
+
+def span(name, target=None):
+    """ A timing span for one stage, used as a context manager
+
+    ----------
+    name: A string
+        The stage name, dotted by template e.g. "pitch_densitymap.density"
+    target: A matplotlib figure or axis
+        Optional - the artists added to it during the span are counted. Use span.watch() for a figure that is created
+        inside the span
+
+    Returns
+    -------
+    The shared no-op NULL_SPAN when no collector is registered, otherwise a recording span"""
+
+    if not _collectors:
+        return NULL_SPAN
+    return _Span(name, target, any(memory for _, memory in _collectors))
+
+
+def profiled(name):
+    """ Decorator wrapping every call of a function in a span - the whole-template span the stage spans nest under """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _collectors:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def draw_figure(fig, name='draw'):
+    """ Renders a figure on its canvas inside a span, to time matplotlib's (3D projection and depth sort) draw separately
+    from building the figure and encoding the output file """
+
+    with span(name, fig):
+        fig.canvas.draw()
+
+
+def enabled():
+    """ True while at least one collector is registered """
+    return bool(_collectors)
+
+
+def add_collector(callback, memory=False):
+    """ Registers a callback receiving every span record
+
+    ----------
+    callback: A callable
+        Called with each record dict as its span ends, e.g. to forward it to a metrics pipeline
+    memory: Boolean
+        Also capture peak memory per span with tracemalloc - this slows the instrumented code down noticeably"""
+
+    _collectors.append((callback, memory))
+
+
+def remove_collector(callback):
+    """ Unregisters a callback added with add_collector """
+
+    for i, (registered, _) in enumerate(_collectors):
+        if registered is callback:
+            del _collectors[i]
+            return
+
+
+class Collector:
+    """ Collects span records in a list - registered for the duration of a with block, or with add_collector
+
+    ----------
+    memory: Boolean
+        Also capture peak memory per span, see add_collector
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def __enter__(self):
+        add_collector(self, memory=self.memory)
+        return self
+
+    def __exit__(self, *exc):
+        remove_collector(self)
+        return False
+
+    def summary(self):
+        """ Totals per stage name, in the order the stages first finished
+
+        Returns
+        -------
+        dict of name to {'calls', 'seconds', 'artists', 'peak_bytes'} - artists summed, peak_bytes the maximum"""
+
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['name'], {'calls': 0, 'seconds': 0.0, 'artists': None, 'peak_bytes': None})
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            if record['artists'] is not None:
+                total['artists'] = (total['artists'] or 0) + record['artists']
+            if record['peak_bytes'] is not None:
+                total['peak_bytes'] = max(total['peak_bytes'] or 0, record['peak_bytes'])
+        return totals
+
+    def report(self):
+        """ The records as an indented text table, nested stages under their parent """
+
+        lines = []
+        # Records arrive children first - put each parent back in front of its children
+        for record in _call_order(self.records):
+            artists = '' if record['artists'] is None else '{0:>6} artists'.format(record['artists'])
+            memory = '' if record['peak_bytes'] is None else '{0:>10.1f} KiB peak'.format(record['peak_bytes'] / 1024)
+            lines.append('{0:<44}{1:>10.1f} ms{2}{3}'.format('  ' * record['depth'] + record['name'],
+                                                             record['seconds'] * 1000, artists, memory))
+        return '\n'.join(lines)
+
+
+def _call_order(records):
+    # Each record arrives after the records of its nested spans, so gather the preceding deeper runs under it
+    pending = []
+    for record in records:
+        children = []
+        while pending and pending[-1][0] > record['depth']:
+            children = pending.pop()[1] + children
+        pending.append((record['depth'], [record] + children))
+    return [record for _, group in pending for record in group]
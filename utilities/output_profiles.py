@@ -0,0 +1,116 @@
+"""Output profiles for saving pitch maps - which format, and which layers are rasterized at what resolution.
+
+Saved as SVG or PDF, every density surface facet, zone quad and trajectory segment is written as its own vector path,
+so a densitymap is hundreds of KB to MB that a browser or CMS then has to parse. The templates flag those data layers
+with utilities.plotting_utils.mark_data_layer, and a profile can rasterize just them into a single embedded image while
+the wicket markings, ruler labels, legend and add_title_axis titles stay as vectors:
+
+    "web"     SVG, data layers rasterized at 100 dpi - small and quick to load, text stays sharp and selectable
+    "print"   PDF, data layers rasterized at 300 dpi
+    "vector"  SVG with every layer as vectors - the full output, for editing
+    "png"     PNG at 100 dpi
+
+    report = save_figure(plt.gcf(), 'smith', profile='web')    # writes smith.svg
+    reports = save_profiles(plt.gcf(), 'smith')                 # every profile, for comparison
+
+"""
+
+import os
+import time
+
+# format, dpi (of the rasterized layers for vector formats) and whether data layers are rasterized
+PROFILES = {'web': {'format': 'svg', 'dpi': 100, 'rasterize': True},
+            'print': {'format': 'pdf', 'dpi': 300, 'rasterize': True},
+            'vector': {'format': 'svg', 'dpi': 100, 'rasterize': False},
+            'png': {'format': 'png', 'dpi': 100, 'rasterize': False}}
+
+
+def data_layers(fig):
+    """ The artists of a figure flagged with mark_data_layer
+
+    Returns
+    -------
+    list of matplotlib artists"""
+
+    return fig.findobj(lambda artist: getattr(artist, 'pitch_data_layer', False))
+
+
+def save_figure(fig, path, profile='web', dpi=None, **savefig_kwargs):
+    """ Saves a figure with an output profile, timing the save
+
+    ----------
+    fig: A matplotlib.figure.Figure
+        e.g. plt.gcf() after a template call
+    path: A string or file-like object
+        The output - the profile's extension is added to a path without one
+    profile: A string
+        One of PROFILES
+    dpi: A float
+        Overrides the profile's dpi - the raster layer resolution for SVG and PDF
+    savefig_kwargs:
+        Passed on to savefig
+
+    Returns
+    -------
+    dict with profile, path, format, dpi, rasterized (number of data layers rasterized), seconds (savefig wall time)
+    and bytes (output size)"""
+
+    if profile not in PROFILES:
+        raise ValueError('profile must be one of {0}'.format(', '.join(PROFILES)))
+    settings = PROFILES[profile]
+    dpi = settings['dpi'] if dpi is None else dpi
+
+    if isinstance(path, str) and not os.path.splitext(path)[1]:
+        path = '{0}.{1}'.format(path, settings['format'])
+
+    layers = data_layers(fig) if settings['rasterize'] else []
+    previous = [artist.get_rasterized() for artist in layers]
+    for artist in layers:
+        artist.set_rasterized(True)
+
+    start = time.perf_counter()
+    try:
+        fig.savefig(path, format=settings['format'], dpi=dpi, **savefig_kwargs)
+    finally:
+        for artist, rasterized in zip(layers, previous):
+            artist.set_rasterized(rasterized)
+    seconds = time.perf_counter() - start
+
+    if isinstance(path, str):
+        size = os.path.getsize(path)
+    else:
+        size = path.tell() if hasattr(path, 'tell') else None
+
+    return {'profile': profile,
+            'path': path if isinstance(path, str) else None,
+            'format': settings['format'],
+            'dpi': dpi,
+            'rasterized': len(layers),
+            'seconds': seconds,
+            'bytes': size}
+
+
+def save_profiles(fig, path, profiles=tuple(PROFILES), verbose=True):
+    """ Saves a figure once per profile, e.g. to compare their size and save time
+
+    ----------
+    fig: A matplotlib.figure.Figure
+    path: A string
+        The output path without extension - profiles sharing a format are saved as <path>_<profile>.<format>
+    profiles: A sequence of strings
+        The profiles to save
+    verbose: Boolean
+        Print a line per profile
+
+    Returns
+    -------
+    list of save_figure reports"""
+
+    reports = []
+    for profile in profiles:
+        report = save_figure(fig, '{0}_{1}'.format(path, profile), profile)
+        reports.append(report)
+        if verbose:
+            print('{profile:>7}: {bytes:>10,} bytes in {seconds:.3f}s - {format} ({rasterized} data layers rasterized '
+                  'at {dpi} dpi)'.format(**report))
+    return reports
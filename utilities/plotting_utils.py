@@ -5,6 +5,9 @@ from matplotlib.text import TextPath
 from matplotlib.transforms import Affine2D
 import mpl_toolkits.mplot3d.art3d as art3d
 import matplotlib.font_manager as fm
+import matplotlib.pyplot as plt
+import numpy as np
+from pitch_views.wicket_2d import PitchAxes
 
 
 def text3d(ax, xyz, s, zdir="z", size=None, angle=0, usetex=False, facecolor='black', edgecolor='black', **kwargs):
@@ -41,9 +44,9 @@ def text3d(ax, xyz, s, zdir="z", size=None, angle=0, usetex=False, facecolor='bl
     art3d.pathpatch_2d_to_3d(p1, z=z1, zdir=zdir)
 
 
-def add_title_axis(fig, title, subtitle_1, subtitle_2, fp, title_colour='black', subtitle_colour='grey'):
+def add_title_axis(fig, title, subtitle_1, subtitle_2, fp, title_colour='black', subtitle_colour='grey',
+                   rect=(0, 0.85, 1, 0.15)):
     # Add an inset axis for the plot title for nicer (to me at least) behaviour on the 3D axis
-    rect = [0, 0.85, 1, 0.15]
     ax_title = fig.add_axes(rect, anchor='NW', facecolor=None)
 
     # Remove axis markings
@@ -78,7 +81,157 @@ def add_title_axis(fig, title, subtitle_1, subtitle_2, fp, title_colour='black',
                   c=subtitle_colour)
 
 
+def quad_verts(x_left, x_right, y_bottom, y_top, z=0):
+    """ Builds the vertices of many flat rectangles at once, for a single Poly3DCollection
 
+    ----------
+    x_left, x_right, y_bottom, y_top: 1d arrays (or scalars, broadcast)
+        The rectangle bounds
+    z: A float
+        The height of the rectangles
 
+    Returns
+    -------
+    numpy.ndarray of shape (n, 4, 3) - corners ordered (left, bottom), (right, bottom), (right, top), (left, top)"""
 
+    x_left, x_right, y_bottom, y_top = np.broadcast_arrays(*[np.atleast_1d(np.asarray(a, dtype=float))
+                                                             for a in (x_left, x_right, y_bottom, y_top)])
 
+    verts = np.empty((len(x_left), 4, 3))
+    verts[:, :, 0] = np.column_stack([x_left, x_right, x_right, x_left])
+    verts[:, :, 1] = np.column_stack([y_bottom, y_bottom, y_top, y_top])
+    verts[:, :, 2] = z
+    return verts
+
+
+def alpha_fade(colours, thresholds):
+    """ Sets the alpha of an RGBA colour array from the luminance of each colour, in place, for the whole array at once
+
+    Luminance is the mean of the RGB channels. Each cell takes the alpha of the highest threshold its luminance
+    reaches, cells below the lowest threshold are left unchanged.
+
+    ----------
+    colours: An array of shape (..., 4)
+        RGBA colours, e.g. the output of a colormap
+    thresholds: A sequence of (luminance, alpha) pairs
+        e.g. ((0.87, 0.25), (0.92, 0)) fades near-white cells to 0.25 alpha and white cells out entirely
+
+    Returns
+    -------
+    The colours array"""
+
+    levels, alphas = zip(*sorted(thresholds))
+    luminance = colours[..., :3].mean(axis=-1)
+
+    # Index of the highest threshold reached, -1 if none
+    level = np.searchsorted(np.asarray(levels), luminance, side='right') - 1
+    reached = level >= 0
+    colours[..., 3][reached] = np.asarray(alphas)[level[reached]]
+    return colours
+
+
+def add_polygons(ax, verts, **kwargs):
+    """ Adds flat polygons (n, k, 3) as a single collection, to a 3D axis or a PitchAxes
+
+    Returns
+    -------
+    The collection"""
+
+    if isinstance(ax, PitchAxes):
+        return ax.add_polygons(verts, **kwargs)
+    return ax.add_collection3d(art3d.Poly3DCollection(verts, **kwargs))
+
+
+def add_lines(ax, segments, **kwargs):
+    """ Adds 3D line segments (n, k, 3) as a single collection, to a 3D axis or a PitchAxes
+
+    Returns
+    -------
+    The collection"""
+
+    if isinstance(ax, PitchAxes):
+        return ax.add_lines(segments, **kwargs)
+    return ax.add_collection3d(art3d.Line3DCollection(segments, **kwargs))
+
+
+def mark_data_layer(artist):
+    """ Flags an artist as a data layer - zones, a density surface, trajectories - which output profiles may rasterize
+    while the wicket, labels and titles stay vectors, see utilities.output_profiles
+
+    Returns
+    -------
+    The artist"""
+
+    artist.pitch_data_layer = True
+    return artist
+
+
+def new_pitch_figure(renderer='3d'):
+    """ Creates the 8x5 figure and front-view axis shared by the pitch map templates
+
+    ----------
+    renderer: A string
+        "3d" - an mplot3d axis, for plot_wicket_3d
+        "2d" - a PitchAxes, for pitch_views.wicket_2d.plot_wicket_2d
+
+    Returns
+    -------
+    (matplotlib.figure.Figure, 3D axis or PitchAxes)"""
+
+    fig = plt.figure()
+    fig.set_size_inches(8, 5)
+    fig.subplots_adjust(left=0,
+                        right=1,
+                        bottom=-0.2,
+                        top=2)  # Get rid of some excess whitespace - adjust to taste
+
+    if renderer == '2d':
+        ax = fig.add_subplot(projection=PitchAxes.name)
+    else:
+        ax = plt.gca(projection='3d')
+    return fig, ax
+
+
+def add_highlight(ax, xy, colour='#ffb000', edge_colour='#080a2e', size=5):
+    """ Marks selected deliveries (e.g. the result of a SpatialIndex query) on a pitch map as a single line artist
+
+    A marker-only Line3D is used rather than a scatter, as mplot3d depth-sorts collections (so a scatter on the pitch
+    floor can end up behind the zones) while lines are drawn by zorder on top of them.
+
+    ----------
+    ax: A 3D axis or PitchAxes
+        The pitch map axis
+    xy: A 2d array
+        The x and y coordinates of the selected deliveries, in plotting orientation
+    colour, edge_colour: Any valid matplotlib colours
+        Marker fill and edge colours
+    size: A float
+        Marker size in points
+
+    Returns
+    -------
+    The Line3D artist"""
+
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    line, = ax.plot(xy[:, 0], xy[:, 1], np.zeros(len(xy)), linestyle='none', marker='o', markersize=size,
+                    markerfacecolor=colour, markeredgecolor=edge_colour, markeredgewidth=0.8, alpha=0.9, zorder=100)
+    return line
+
+
+def set_highlight(ax, line, xy):
+    """ Moves the markers of an add_highlight line to other deliveries, e.g. each frame of an animation
+
+    ----------
+    ax: A 3D axis or PitchAxes
+        The axis the line was added to
+    line: The add_highlight line
+    xy: A 2d array
+        The x and y coordinates of the deliveries to mark, in plotting orientation"""
+
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    z = np.zeros(len(xy))
+    if isinstance(ax, PitchAxes):
+        projected, _ = ax.project(np.column_stack([xy, z]))
+        line.set_data(projected[:, 0], projected[:, 1])
+    else:
+        line.set_data_3d(xy[:, 0], xy[:, 1], z)
@@ -0,0 +1,55 @@
+"""Registry of the bundled resources (fonts) shared by the pitch views and plot templates.
+
+Paths are resolved relative to the repository rather than the working directory, and each font is registered with
+matplotlib's font manager and turned into a FontProperties only once per process.
+
+"""
+
+import os
+from functools import lru_cache
+
+import matplotlib.font_manager as fm
+
+RESOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_DIR = os.path.join(RESOURCE_ROOT, 'fonts')
+
+# The font used for titles, legends and ruler labels throughout the templates
+TITLE_FONT = 'AlumniSans-SemiBold'
+
+
+def font_path(name=TITLE_FONT):
+    """ Absolute path of a bundled font, by file name with or without the .ttf extension """
+
+    if not name.endswith('.ttf'):
+        name = name + '.ttf'
+    return os.path.join(FONT_DIR, name)
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """ Adds every bundled font to matplotlib's font manager (once), so they can also be used by family name
+
+    Returns
+    -------
+    list of the registered font paths"""
+
+    paths = sorted(os.path.join(FONT_DIR, f) for f in os.listdir(FONT_DIR) if f.endswith('.ttf'))
+    for path in paths:
+        fm.fontManager.addfont(path)
+    return paths
+
+
+@lru_cache(maxsize=None)
+def font_properties(name=TITLE_FONT):
+    """ Shared FontProperties for a bundled font - matplotlib copies it into each Text, so it is safe to reuse
+
+    ----------
+    name: A string
+        The font file name, with or without the .ttf extension
+
+    Returns
+    -------
+    matplotlib.font_manager.FontProperties"""
+
+    register_fonts()
+    return fm.FontProperties(fname=font_path(name))